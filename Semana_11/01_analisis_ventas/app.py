@@ -8,12 +8,12 @@
 # - pandas: DataFrames, groupby, pivot_table, describe, filtros
 # - numpy: arrays, calculos numericos eficientes
 # - matplotlib: graficos de barras, lineas, pastel
-# - scipy: regresion lineal para prediccion
+# - numpy.linalg.lstsq: regresion lineal (minimos cuadrados) para prediccion
 # - Flask + SQLAlchemy: backend web con base de datos
 # - Autenticacion con sesiones y roles (Semana 9)
 #
 # COMO EJECUTAR:
-# 1. pip install flask sqlalchemy werkzeug pandas numpy matplotlib scipy
+# 1. pip install flask sqlalchemy werkzeug pandas numpy matplotlib
 # 2. python app.py
 # 3. Abre: http://localhost:5013
 #
@@ -22,11 +22,25 @@
 # ============================================================================
 
 import os
+import base64
+import cProfile
+import csv
 import json
+import hashlib
+import multiprocessing
+import pstats
 import random
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from functools import wraps
-from io import BytesIO
+from io import BytesIO, StringIO
 
 # ============================================================================
 # IMPORTS DE CIENCIA DE DATOS
@@ -34,11 +48,11 @@ from io import BytesIO
 # pandas  → Manipulacion de datos tabulares (DataFrames)
 # numpy   → Calculos numericos eficientes (arrays, operaciones matematicas)
 # matplotlib → Generacion de graficos (barras, lineas, pastel, etc.)
-# scipy   → Funciones estadisticas avanzadas (regresion lineal)
 # ============================================================================
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 
 # matplotlib.use('Agg') DEBE llamarse ANTES de importar pyplot.
 # 'Agg' es un backend que renderiza graficos a archivos/memoria sin necesitar
@@ -48,14 +62,20 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
-from scipy.stats import linregress
-
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    flash, session, Response, make_response
+    flash, session, Response, stream_with_context, jsonify,
+    g, has_request_context, before_render_template, template_rendered
+)
+from sqlalchemy import (
+    create_engine, event, inspect, select, insert, update, delete, func, and_, or_, tuple_,
+    Column, Integer, String, Float, Date, DateTime, Text, UniqueConstraint, Index, cast,
+    literal_column
 )
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
+from werkzeug.http import is_resource_modified
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # ============================================================================
@@ -69,11 +89,13 @@ app.secret_key = 'analisis-ventas-secreto-cambiar-en-produccion'
 # BASE DE DATOS - SQLite
 # ============================================================================
 # Usamos SQLite para simplicidad. El archivo se crea automaticamente.
+# La variable de entorno VENTAS_DATABASE_URL permite apuntar a otra base
+# (por ejemplo, una base grande para los benchmarks).
 # ============================================================================
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, 'ventas.db')
-DATABASE_URL = f'sqlite:///{DATABASE_PATH}'
+DATABASE_URL = os.environ.get('VENTAS_DATABASE_URL', f'sqlite:///{DATABASE_PATH}')
 
 engine = create_engine(DATABASE_URL, echo=False)
 Base = declarative_base()
@@ -81,6 +103,190 @@ session_factory = sessionmaker(bind=engine)
 Session = scoped_session(session_factory)
 
 
+# ============================================================================
+# MEDICION DE TIEMPOS POR PETICION
+# ============================================================================
+# Para saber si una peticion lenta se va en la base de datos, en pandas, en
+# matplotlib o en Jinja, cada peticion se divide en tramos con nombre:
+#
+#   db         → consultas SQL (eventos del engine)
+#   dataframe  → obtener_dataframe / cargar_dataframe
+#   calculos   → calcular_kpis, calcular_estadisticas, pronosticos...
+#   graficos   → generar_grafico_* / renderizar_graficos
+#   plantilla  → render_template (señales de Flask)
+#
+# Los tramos se anidan y cada uno cuenta solo su tiempo propio (sin el de
+# sus tramos internos), asi la suma de los tramos nunca supera el total.
+#
+# Con los tiempos de cada peticion:
+# - se agrega el header Server-Timing (lo muestran las herramientas de
+#   desarrollo del navegador, pestaña Network → Timing)
+# - se guardan las ultimas MUESTRAS_TIEMPOS peticiones de cada ruta para el
+#   resumen de /admin/tiempos
+#
+# ?profile=1 (solo administradores) ejecuta la peticion con cProfile y
+# responde el reporte de cProfile en lugar de la pagina.
+# ============================================================================
+
+SERVER_TIMING = os.environ.get('VENTAS_SERVER_TIMING', '1') == '1'
+MUESTRAS_TIEMPOS = 1000
+
+# endpoint → deque de (total, {tramo: segundos}) de las ultimas peticiones
+_tiempos_rutas = {}
+_candado_tiempos = threading.Lock()
+
+
+def _midiendo():
+    """True si la peticion actual se esta midiendo (fuera de peticiones, no)."""
+    return has_request_context() and 'tramos' in g
+
+
+def _abrir_tramo(nombre):
+    if _midiendo():
+        g.pila_tramos.append([nombre, time.perf_counter(), 0.0])
+
+
+def _cerrar_tramo():
+    if not _midiendo() or not g.pila_tramos:
+        return
+    nombre, inicio, internos = g.pila_tramos.pop()
+    duracion = time.perf_counter() - inicio
+    g.tramos[nombre] = g.tramos.get(nombre, 0.0) + duracion - internos
+    if g.pila_tramos:
+        # El tramo que lo contiene no debe contar este tiempo como propio
+        g.pila_tramos[-1][2] += duracion
+
+
+@contextmanager
+def tramo(nombre):
+    """
+    Mide un tramo de la peticion actual. Ejemplo:
+
+        with tramo('calculos'):
+            resultado = calculo_lento()
+    """
+    _abrir_tramo(nombre)
+    try:
+        yield
+    finally:
+        _cerrar_tramo()
+
+
+def medido(nombre):
+    """Decorador: cada llamada a la funcion es un tramo `nombre`."""
+    def decorador(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _midiendo():
+                return f(*args, **kwargs)
+            with tramo(nombre):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _inicio_consulta(conexion, cursor, sentencia, parametros, contexto, executemany):
+    _abrir_tramo('db')
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _fin_consulta(conexion, cursor, sentencia, parametros, contexto, executemany):
+    _cerrar_tramo()
+
+
+@event.listens_for(engine, 'handle_error')
+def _error_consulta(contexto):
+    _cerrar_tramo()
+
+
+@before_render_template.connect_via(app)
+def _inicio_plantilla(emisor, template, context, **extra):
+    _abrir_tramo('plantilla')
+
+
+@template_rendered.connect_via(app)
+def _fin_plantilla(emisor, template, context, **extra):
+    _cerrar_tramo()
+
+
+@app.before_request
+def _iniciar_medicion():
+    g.tramos = {}
+    g.pila_tramos = []
+    g.inicio_peticion = time.perf_counter()
+    g.perfil = None
+    if request.args.get('profile') == '1' and 'usuario_id' in session:
+        db = Session()
+        usuario = db.query(Usuario).get(session['usuario_id'])
+        db.close()
+        if usuario and usuario.es_admin:
+            g.perfil = cProfile.Profile()
+            g.perfil.enable()
+
+
+@app.after_request
+def _terminar_medicion(respuesta):
+    if 'tramos' not in g:
+        return respuesta
+    total = time.perf_counter() - g.inicio_peticion
+    tramos = dict(g.tramos)
+
+    if g.perfil is not None:
+        g.perfil.disable()
+        salida = StringIO()
+        estadisticas = pstats.Stats(g.perfil, stream=salida)
+        estadisticas.sort_stats('cumulative').print_stats(40)
+        g.perfil = None
+        return Response(salida.getvalue(), mimetype='text/plain')
+
+    if request.endpoint and request.endpoint != 'static':
+        with _candado_tiempos:
+            muestras = _tiempos_rutas.setdefault(request.endpoint, deque(maxlen=MUESTRAS_TIEMPOS))
+            muestras.append((total, tramos))
+
+    if SERVER_TIMING:
+        partes = [f'{nombre};dur={segundos * 1000:.1f}' for nombre, segundos in sorted(tramos.items())]
+        partes.append(f'total;dur={total * 1000:.1f}')
+        respuesta.headers['Server-Timing'] = ', '.join(partes)
+    return respuesta
+
+
+def resumen_tiempos():
+    """
+    Resumen de las ultimas peticiones de cada ruta: cantidad, percentiles
+    en ms, histograma de duraciones y promedio de cada tramo.
+    """
+    limites_ms = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+    with _candado_tiempos:
+        copia = {ruta: list(muestras) for ruta, muestras in _tiempos_rutas.items()}
+
+    resumen = {}
+    for ruta, muestras in sorted(copia.items()):
+        totales = np.array([total for total, _ in muestras]) * 1000
+        conteos = np.bincount(np.searchsorted(limites_ms, totales, side='right'),
+                              minlength=len(limites_ms) + 1)
+        etiquetas = [f'<{limite}' for limite in limites_ms] + [f'>={limites_ms[-1]}']
+        tramos = {}
+        for _, por_tramo in muestras:
+            for nombre, segundos in por_tramo.items():
+                tramos[nombre] = tramos.get(nombre, 0.0) + segundos
+        resumen[ruta] = {
+            'peticiones': len(muestras),
+            'ms': {
+                'media': round(float(totales.mean()), 1),
+                'p50': round(float(np.percentile(totales, 50)), 1),
+                'p90': round(float(np.percentile(totales, 90)), 1),
+                'p99': round(float(np.percentile(totales, 99)), 1),
+                'max': round(float(totales.max()), 1),
+            },
+            'histograma_ms': dict(zip(etiquetas, conteos.tolist())),
+            'tramos_ms_promedio': {nombre: round(segundos * 1000 / len(muestras), 1)
+                                   for nombre, segundos in sorted(tramos.items())},
+        }
+    return resumen
+
+
 # ============================================================================
 # MODELOS DE LA BASE DE DATOS
 # ============================================================================
@@ -106,8 +312,18 @@ class Venta(Base):
     Modelo de venta.
     Cada registro representa una transaccion de venta con producto,
     categoria, cantidad, precio y datos geograficos.
+
+    Indices: los filtros del dashboard son por rango de fechas, solo o
+    junto con una categoria o una region. Con (categoria, fecha) y
+    (region, fecha) la base salta directo a las filas del filtro, y los
+    SELECT DISTINCT categoria/region se responden leyendo solo el indice.
     """
     __tablename__ = 'ds_ventas'
+    __table_args__ = (
+        Index('ix_ventas_fecha', 'fecha'),
+        Index('ix_ventas_categoria_fecha', 'categoria', 'fecha'),
+        Index('ix_ventas_region_fecha', 'region', 'fecha'),
+    )
 
     id = Column(Integer, primary_key=True)
     fecha = Column(DateTime, nullable=False)
@@ -128,6 +344,33 @@ class Venta(Base):
         return f'${self.total:,.2f}'
 
 
+class ResumenVenta(Base):
+    """
+    Totales de ventas pre-agregados (rollup) por dia y por mes.
+
+    Cada fila suma las ventas de un periodo para un producto o un cliente
+    (segun `dimension`), dentro de una categoria y una region. Se mantiene
+    al dia automaticamente (ver actualizar_resumenes).
+    """
+    __tablename__ = 'ds_resumen_ventas'
+    __table_args__ = (
+        UniqueConstraint('granularidad', 'periodo', 'dimension', 'valor',
+                         'categoria', 'region', name='uq_resumen_ventas'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    granularidad = Column(String(3), nullable=False)   # 'dia' o 'mes'
+    periodo = Column(Date, nullable=False)             # dia, o primer dia del mes
+    dimension = Column(String(10), nullable=False)     # 'producto' o 'cliente'
+    valor = Column(String(100), nullable=False)        # nombre del producto/cliente
+    categoria = Column(String(50), nullable=False)
+    region = Column(String(50), nullable=False)
+    num_ventas = Column(Integer, nullable=False, default=0)
+    cantidad = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    total_cuadrados = Column(Float, nullable=False, default=0)  # para la desviacion
+
+
 class Reporte(Base):
     """Modelo para reportes generados y guardados."""
     __tablename__ = 'ds_reportes'
@@ -154,6 +397,10 @@ class Reporte(Base):
 # Crear todas las tablas
 Base.metadata.create_all(engine)
 
+# create_all no agrega indices nuevos a tablas que ya existian
+for indice in Venta.__table__.indexes:
+    indice.create(engine, checkfirst=True)
+
 
 # ============================================================================
 # GENERACION DE DATOS DE EJEMPLO
@@ -165,6 +412,68 @@ Base.metadata.create_all(engine)
 # (reproducibilidad), lo cual es importante para depuracion y pruebas.
 # ============================================================================
 
+# Catalogo de productos por categoria.
+# Cada categoria tiene productos con rangos de precio realistas
+CATALOGO_PRODUCTOS = {
+    'Electronica': [
+        ('Laptop HP', 800, 1500),
+        ('Mouse Inalambrico', 15, 45),
+        ('Teclado Mecanico', 50, 150),
+        ('Monitor 24"', 200, 500),
+        ('Audifonos Bluetooth', 25, 120),
+        ('Tablet Samsung', 250, 600),
+        ('Cargador USB-C', 10, 30),
+        ('Webcam HD', 30, 80),
+    ],
+    'Ropa': [
+        ('Camiseta Basica', 10, 30),
+        ('Jeans Slim', 35, 80),
+        ('Chaqueta Deportiva', 45, 120),
+        ('Zapatillas Running', 50, 150),
+        ('Gorra Ajustable', 8, 25),
+        ('Sudadera Con Capucha', 30, 70),
+    ],
+    'Alimentos': [
+        ('Cafe Premium 500g', 8, 20),
+        ('Aceite de Oliva 1L', 6, 15),
+        ('Chocolate Artesanal', 5, 18),
+        ('Te Verde Organico', 4, 12),
+        ('Miel Natural 500g', 7, 16),
+        ('Frutos Secos Mix', 6, 14),
+    ],
+    'Hogar': [
+        ('Lampara LED', 15, 60),
+        ('Juego de Sabanas', 25, 80),
+        ('Organizador Escritorio', 12, 35),
+        ('Cafetera Electrica', 30, 90),
+        ('Set de Toallas', 18, 50),
+        ('Reloj de Pared', 10, 40),
+    ],
+    'Deportes': [
+        ('Pelota de Futbol', 15, 50),
+        ('Mancuernas 5kg', 20, 60),
+        ('Colchoneta Yoga', 12, 40),
+        ('Botella Deportiva', 8, 25),
+        ('Banda Elastica Set', 10, 30),
+        ('Guantes de Boxeo', 25, 70),
+    ],
+}
+
+REGIONES = ['Norte', 'Sur', 'Centro', 'Este', 'Oeste']
+
+# Nombres de clientes ficticios
+NOMBRES_CLIENTES = [
+    'Carlos Garcia', 'Maria Lopez', 'Juan Martinez', 'Ana Rodriguez',
+    'Pedro Sanchez', 'Laura Fernandez', 'Diego Torres', 'Sofia Ramirez',
+    'Andres Morales', 'Valentina Castro', 'Luis Herrera', 'Camila Diaz',
+    'Ricardo Vargas', 'Isabella Flores', 'Fernando Mendoza', 'Gabriela Ruiz',
+    'Miguel Ortega', 'Daniela Paredes', 'Alejandro Silva', 'Paula Navarro',
+    'Roberto Reyes', 'Natalia Guerrero', 'Jorge Perez', 'Elena Romero',
+    'David Jimenez', 'Carolina Molina', 'Santiago Acosta', 'Lucia Medina',
+    'Oscar Cardenas', 'Mariana Soto',
+]
+
+
 def generar_datos_ejemplo():
     """Genera datos de ejemplo: usuario admin + 500 ventas realistas."""
     db = Session()
@@ -185,67 +494,6 @@ def generar_datos_ejemplo():
         )
         db.add(admin)
 
-    # --- Catalogo de productos por categoria ---
-    # Cada categoria tiene productos con rangos de precio realistas
-    catalogo = {
-        'Electronica': [
-            ('Laptop HP', 800, 1500),
-            ('Mouse Inalambrico', 15, 45),
-            ('Teclado Mecanico', 50, 150),
-            ('Monitor 24"', 200, 500),
-            ('Audifonos Bluetooth', 25, 120),
-            ('Tablet Samsung', 250, 600),
-            ('Cargador USB-C', 10, 30),
-            ('Webcam HD', 30, 80),
-        ],
-        'Ropa': [
-            ('Camiseta Basica', 10, 30),
-            ('Jeans Slim', 35, 80),
-            ('Chaqueta Deportiva', 45, 120),
-            ('Zapatillas Running', 50, 150),
-            ('Gorra Ajustable', 8, 25),
-            ('Sudadera Con Capucha', 30, 70),
-        ],
-        'Alimentos': [
-            ('Cafe Premium 500g', 8, 20),
-            ('Aceite de Oliva 1L', 6, 15),
-            ('Chocolate Artesanal', 5, 18),
-            ('Te Verde Organico', 4, 12),
-            ('Miel Natural 500g', 7, 16),
-            ('Frutos Secos Mix', 6, 14),
-        ],
-        'Hogar': [
-            ('Lampara LED', 15, 60),
-            ('Juego de Sabanas', 25, 80),
-            ('Organizador Escritorio', 12, 35),
-            ('Cafetera Electrica', 30, 90),
-            ('Set de Toallas', 18, 50),
-            ('Reloj de Pared', 10, 40),
-        ],
-        'Deportes': [
-            ('Pelota de Futbol', 15, 50),
-            ('Mancuernas 5kg', 20, 60),
-            ('Colchoneta Yoga', 12, 40),
-            ('Botella Deportiva', 8, 25),
-            ('Banda Elastica Set', 10, 30),
-            ('Guantes de Boxeo', 25, 70),
-        ],
-    }
-
-    regiones = ['Norte', 'Sur', 'Centro', 'Este', 'Oeste']
-
-    # Nombres de clientes ficticios
-    nombres = [
-        'Carlos Garcia', 'Maria Lopez', 'Juan Martinez', 'Ana Rodriguez',
-        'Pedro Sanchez', 'Laura Fernandez', 'Diego Torres', 'Sofia Ramirez',
-        'Andres Morales', 'Valentina Castro', 'Luis Herrera', 'Camila Diaz',
-        'Ricardo Vargas', 'Isabella Flores', 'Fernando Mendoza', 'Gabriela Ruiz',
-        'Miguel Ortega', 'Daniela Paredes', 'Alejandro Silva', 'Paula Navarro',
-        'Roberto Reyes', 'Natalia Guerrero', 'Jorge Perez', 'Elena Romero',
-        'David Jimenez', 'Carolina Molina', 'Santiago Acosta', 'Lucia Medina',
-        'Oscar Cardenas', 'Mariana Soto',
-    ]
-
     random.seed(42)  # Semilla para reproducibilidad
 
     # Fecha inicial: 1 de enero de 2024
@@ -257,8 +505,8 @@ def generar_datos_ejemplo():
     ventas = []
     for _ in range(550):
         # Seleccionar categoria y producto aleatorio
-        categoria = random.choice(list(catalogo.keys()))
-        producto_info = random.choice(catalogo[categoria])
+        categoria = random.choice(list(CATALOGO_PRODUCTOS.keys()))
+        producto_info = random.choice(CATALOGO_PRODUCTOS[categoria])
         nombre_producto, precio_min, precio_max = producto_info
 
         # Generar precio y cantidad
@@ -271,8 +519,8 @@ def generar_datos_ejemplo():
         fecha = fecha_inicio + timedelta(days=dias_offset)
 
         # Region y cliente aleatorios
-        region = random.choice(regiones)
-        cliente = random.choice(nombres)
+        region = random.choice(REGIONES)
+        cliente = random.choice(NOMBRES_CLIENTES)
 
         venta = Venta(
             fecha=fecha,
@@ -292,6 +540,95 @@ def generar_datos_ejemplo():
     print(f'[INFO] Se generaron {len(ventas)} registros de venta de ejemplo.')
 
 
+# ----------------------------------------------------------------------------
+# Generacion masiva (benchmarks y pruebas de carga)
+# ----------------------------------------------------------------------------
+# Para saber donde se rompe el dashboard hacen falta millones de ventas. Aqui
+# los valores se sortean con numpy por lotes y cada lote se inserta con un
+# solo executemany (insert de SQLAlchemy Core con una lista de filas), en
+# lugar de crear un objeto Venta por fila.
+#
+# Datos realistas: la popularidad de productos, clientes y regiones sigue la
+# ley de Zipf (peso 1 / puesto^sesgo: unos pocos concentran muchas ventas) y
+# las ventas crecen en el tiempo, con un pico en noviembre y diciembre.
+# ----------------------------------------------------------------------------
+
+def _pesos_zipf(rng, cantidad, sesgo):
+    """Probabilidades 1/puesto^sesgo, asignadas en orden aleatorio."""
+    pesos = 1.0 / np.arange(1, cantidad + 1) ** sesgo
+    rng.shuffle(pesos)
+    return pesos / pesos.sum()
+
+
+def generar_ventas_masivas(cantidad, semilla=42, sesgo=1.0, num_clientes=5_000,
+                           fecha_inicio=datetime(2024, 1, 1), fecha_fin=datetime(2025, 12, 31),
+                           tamano_lote=50_000):
+    """
+    Inserta `cantidad` ventas sinteticas con inserts masivos.
+
+    Parametros:
+        cantidad: Ventas a generar
+        semilla: Misma semilla → mismos datos (reproducible)
+        sesgo: 0 = todos igual de probables; 1 o mas = pocos productos,
+            clientes y regiones concentran la mayoria de las ventas
+        num_clientes: Cantidad de clientes distintos
+        fecha_inicio, fecha_fin: Rango de fechas de las ventas
+        tamano_lote: Filas por executemany (y por transaccion)
+
+    Al final reconstruye los resumenes (una sola agregacion en SQL).
+    Retorna la cantidad de ventas insertadas.
+    """
+    rng = np.random.default_rng(semilla)
+
+    productos = [(nombre, categoria, minimo, maximo)
+                 for categoria, lista in CATALOGO_PRODUCTOS.items()
+                 for nombre, minimo, maximo in lista]
+    nombres_productos = np.array([p[0] for p in productos], dtype=object)
+    categorias = np.array([p[1] for p in productos], dtype=object)
+    precio_min = np.array([p[2] for p in productos], dtype=float)
+    precio_max = np.array([p[3] for p in productos], dtype=float)
+    regiones = np.array(REGIONES, dtype=object)
+    clientes = np.array([f'{NOMBRES_CLIENTES[i % len(NOMBRES_CLIENTES)]} {i // len(NOMBRES_CLIENTES) + 1}'
+                         for i in range(num_clientes)], dtype=object)
+
+    prob_productos = _pesos_zipf(rng, len(productos), sesgo)
+    prob_regiones = _pesos_zipf(rng, len(regiones), sesgo / 2)
+    prob_clientes = _pesos_zipf(rng, len(clientes), sesgo)
+
+    # Dias: tendencia creciente (+50% al final del rango) y pico de fin de año
+    dias = pd.date_range(fecha_inicio, fecha_fin, freq='D')
+    prob_dias = (1 + 0.5 * np.arange(len(dias)) / len(dias)) * np.where(dias.month >= 11, 1.5, 1.0)
+    prob_dias /= prob_dias.sum()
+
+    columnas = ['fecha', 'producto', 'categoria', 'cantidad',
+                'precio_unitario', 'total', 'region', 'cliente']
+    tabla = Venta.__table__
+    for desde in range(0, cantidad, tamano_lote):
+        n = min(tamano_lote, cantidad - desde)
+        producto = rng.choice(len(productos), size=n, p=prob_productos)
+        precio = np.round(precio_min[producto]
+                          + rng.random(n) * (precio_max[producto] - precio_min[producto]), 2)
+        unidades = rng.integers(1, 11, size=n)
+        fechas = (dias[rng.choice(len(dias), size=n, p=prob_dias)]
+                  + pd.to_timedelta(rng.integers(8 * 3600, 22 * 3600, size=n), unit='s'))
+
+        valores = [
+            fechas.to_pydatetime().tolist(),
+            nombres_productos[producto].tolist(),
+            categorias[producto].tolist(),
+            unidades.tolist(),
+            precio.tolist(),
+            np.round(precio * unidades, 2).tolist(),
+            regiones[rng.choice(len(regiones), size=n, p=prob_regiones)].tolist(),
+            clientes[rng.choice(len(clientes), size=n, p=prob_clientes)].tolist(),
+        ]
+        with engine.begin() as conexion:
+            conexion.execute(insert(tabla), [dict(zip(columnas, fila)) for fila in zip(*valores)])
+
+    reconstruir_resumenes()
+    return cantidad
+
+
 # ============================================================================
 # DECORADORES DE AUTENTICACION
 # ============================================================================
@@ -363,9 +700,269 @@ def variables_globales():
 # y realizan los calculos estadisticos necesarios.
 # ============================================================================
 
-def obtener_dataframe(filtros=None):
+# Columnas de ventas que usa el analisis y su tipo en el DataFrame.
+# Las columnas de texto con pocos valores distintos se guardan como
+# 'category': pandas almacena cada texto una sola vez y un codigo entero
+# por fila, lo que reduce mucho la memoria y acelera los groupby.
+COLUMNAS_VENTAS = ['fecha', 'producto', 'categoria', 'cantidad',
+                   'precio_unitario', 'total', 'region', 'cliente']
+TIPOS_COLUMNAS = {
+    'fecha': 'datetime64[ns]',
+    'producto': 'category',
+    'categoria': 'category',
+    'cantidad': 'int64',
+    'precio_unitario': 'float64',
+    'total': 'float64',
+    'region': 'category',
+    'cliente': 'category',
+    'id': 'int64',
+}
+
+# Filas que se leen de la base de datos en cada bloque
+TAMANO_BLOQUE_LECTURA = 50_000
+
+
+def _condiciones_filtros(filtros):
+    """
+    Convierte el diccionario de filtros en condiciones SQL sobre ds_ventas.
+
+    Las fechas con formato invalido se ignoran (igual que antes).
+    """
+    tabla = Venta.__table__
+    condiciones = []
+    if not filtros:
+        return condiciones
+
+    if filtros.get('fecha_inicio'):
+        try:
+            fi = datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d')
+            condiciones.append(tabla.c.fecha >= fi)
+        except ValueError:
+            pass
+    if filtros.get('fecha_fin'):
+        try:
+            ff = datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d')
+            ff = ff.replace(hour=23, minute=59, second=59)
+            condiciones.append(tabla.c.fecha <= ff)
+        except ValueError:
+            pass
+    if filtros.get('categoria'):
+        condiciones.append(tabla.c.categoria == filtros['categoria'])
+    if filtros.get('region'):
+        condiciones.append(tabla.c.region == filtros['region'])
+    if filtros.get('hasta_id') is not None:
+        condiciones.append(tabla.c.id <= filtros['hasta_id'])
+    return condiciones
+
+
+def valores_distintos(campo):
+    """Valores distintos de una columna de ds_ventas, ordenados (ej: categorias)."""
+    columna = Venta.__table__.c[campo]
+    with engine.connect() as conexion:
+        return list(conexion.execute(select(columna).distinct().order_by(columna)).scalars())
+
+
+def _columna_desde_filas(nombre, valores):
+    """Convierte los valores de una columna de un bloque a un array tipado."""
+    tipo = TIPOS_COLUMNAS[nombre]
+    if tipo == 'category':
+        return pd.Categorical(valores)
+    return np.array(valores, dtype=tipo)
+
+
+def _unir_bloques(nombre, bloques):
+    """Une los arrays de una columna leidos bloque a bloque."""
+    if len(bloques) == 1:
+        return bloques[0]
+    if TIPOS_COLUMNAS[nombre] == 'category':
+        # Cada bloque tiene sus propias categorias; union_categoricals
+        # las combina sin pasar por texto (concat daria tipo object).
+        return union_categoricals(bloques)
+    return np.concatenate(bloques)
+
+
+def consulta_ventas(filtros=None, columnas=None):
+    """SELECT de las columnas pedidas de ds_ventas con los filtros aplicados."""
+    tabla = Venta.__table__
+    columnas = columnas or COLUMNAS_VENTAS
+    return select(*[tabla.c[c] for c in columnas]).where(*_condiciones_filtros(filtros))
+
+
+def ultimo_id_venta():
+    """Id mas alto de ds_ventas (0 si no hay ventas)."""
+    with engine.connect() as conexion:
+        return conexion.execute(select(func.max(Venta.id))).scalar() or 0
+
+
+def firma_ventas():
+    """
+    (id mas alto, cantidad de ventas) de ds_ventas. Cambia con cualquier
+    alta o baja, la haga este proceso u otro.
+    """
+    tabla = Venta.__table__
+    with engine.connect() as conexion:
+        maximo, cantidad = conexion.execute(
+            select(func.max(tabla.c.id), func.count()).select_from(tabla)
+        ).one()
+    return maximo or 0, cantidad
+
+
+def ids_no_leidos(ids, marca):
+    """
+    Ids entre 1 y `marca` que no estan en `ids` (los leidos): ventas
+    borradas o de transacciones que aun no confirmaban. En PostgreSQL o
+    MySQL un id menor puede confirmarse despues que uno mayor, asi que la
+    marca sola no alcanza para saber que ventas ya se leyeron.
+    """
+    ids = np.sort(np.asarray(ids, dtype=np.int64))
+    bordes = np.concatenate(([0], ids, [marca + 1]))
+    faltantes = set()
+    for i in np.flatnonzero(np.diff(bordes) > 1):
+        faltantes.update(range(int(bordes[i]) + 1, int(bordes[i + 1])))
+    return faltantes
+
+
+def ventas_no_leidas(ventas, marca, faltantes):
+    """
+    Filas de `ventas` que una lectura hasta `marca` no incluyo: las de id
+    mayor a la marca o entre los `faltantes` (ver ids_no_leidos). Sin
+    columna id no se puede saber y se retornan todas.
+    """
+    if 'id' not in ventas:
+        return ventas
+    ids = ventas['id']
+    return ventas[(ids > marca) | ids.isin(faltantes)]
+
+
+# ----------------------------------------------------------------------------
+# Paginacion por clave (keyset)
+# ----------------------------------------------------------------------------
+# Con OFFSET la base de datos igual recorre y descarta todas las filas de
+# las paginas anteriores. Con keyset, cada pagina continua desde la clave
+# (valor de la columna de orden, id) de la ultima fila mostrada:
+#
+#   WHERE (total, id) > (120.5, 8812) ORDER BY total, id LIMIT 51
+#
+# El id desempata filas con el mismo valor. La clave viaja en la URL como
+# un "cursor" opaco (JSON en base64).
+# ----------------------------------------------------------------------------
+
+FILAS_POR_PAGINA = 50
+
+
+def _codificar_cursor(valor, id_venta):
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    texto = json.dumps([valor, id_venta], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii')
+
+
+def _decodificar_cursor(cursor, orden):
+    """Clave (valor, id) de un cursor; None si falta o no es valido."""
+    if not cursor:
+        return None
+    try:
+        valor, id_venta = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if orden == 'fecha':
+            valor = datetime.fromisoformat(valor)
+        return valor, int(id_venta)
+    except (ValueError, TypeError):
+        return None
+
+
+def pagina_ventas(filtros=None, orden='fecha', descendente=True, despues=None, antes=None,
+                  tamano=FILAS_POR_PAGINA):
+    """
+    Una pagina de ventas filtradas, leida directamente con SQL.
+
+    Parametros:
+        filtros: Los mismos filtros que obtener_dataframe()
+        orden: Columna de COLUMNAS_VENTAS por la que se ordena
+        descendente: Orden de mayor a menor
+        despues: Cursor de la pagina siguiente (filas despues de esa clave)
+        antes: Cursor de la pagina anterior (filas antes de esa clave)
+        tamano: Filas por pagina
+
+    Retorna un diccionario con:
+    - filas: lista de diccionarios (id + COLUMNAS_VENTAS)
+    - siguiente / anterior: cursores de las paginas vecinas, o None
+    """
+    tabla = Venta.__table__
+    if orden not in COLUMNAS_VENTAS:
+        orden = 'fecha'
+    clave = tuple_(tabla.c[orden], tabla.c.id)
+    despues = _decodificar_cursor(despues, orden)
+    antes = _decodificar_cursor(antes, orden) if despues is None else None
+
+    # Hacia atras se recorre el orden invertido y luego se da vuelta
+    hacia_atras = antes is not None
+    invertir = descendente != hacia_atras
+    consulta = select(tabla.c.id, *[tabla.c[c] for c in COLUMNAS_VENTAS]).where(
+        *_condiciones_filtros(filtros))
+    cursor = antes if hacia_atras else despues
+    if cursor is not None:
+        consulta = consulta.where(clave < cursor if invertir else clave > cursor)
+    if invertir:
+        consulta = consulta.order_by(tabla.c[orden].desc(), tabla.c.id.desc())
+    else:
+        consulta = consulta.order_by(tabla.c[orden], tabla.c.id)
+
+    with engine.connect() as conexion:
+        filas = [dict(fila) for fila in conexion.execute(consulta.limit(tamano + 1)).mappings()]
+
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        filas.reverse()
+
+    siguiente = anterior = None
+    if filas:
+        primera, ultima = filas[0], filas[-1]
+        # Yendo hacia atras siempre hay pagina siguiente (de ahi se vino);
+        # las filas que sobraron indican si hay mas en la direccion recorrida
+        if hay_mas or hacia_atras:
+            siguiente = _codificar_cursor(ultima[orden], ultima['id'])
+        if (hay_mas and hacia_atras) or (despues is not None):
+            anterior = _codificar_cursor(primera[orden], primera['id'])
+    return {'filas': filas, 'siguiente': siguiente, 'anterior': anterior}
+
+
+def bloques_de_filas(consulta, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    """
+    Ejecuta la consulta y entrega las filas por bloques de `tamano_bloque`.
+
+    stream_results pide un cursor del lado del servidor en los motores que
+    lo soportan (PostgreSQL, MySQL); SQLite ya lee fila a fila. La conexion
+    queda abierta hasta terminar (o cerrar) el generador.
     """
-    Convierte todas las ventas de la base de datos a un DataFrame de pandas.
+    with engine.connect() as conexion:
+        resultado = conexion.execution_options(stream_results=True).execute(consulta)
+        while True:
+            filas = resultado.fetchmany(tamano_bloque)
+            if not filas:
+                break
+            yield filas
+
+
+def dataframe_vacio(columnas=None):
+    """DataFrame sin filas con las columnas y tipos de las ventas."""
+    columnas = columnas or COLUMNAS_VENTAS
+    return pd.DataFrame({c: pd.Series(dtype=TIPOS_COLUMNAS[c]) for c in columnas})
+
+
+@medido('dataframe')
+def cargar_dataframe(filtros=None, columnas=None):
+    """
+    Carga las ventas de la base de datos en un DataFrame de pandas.
+
+    Siempre consulta la base de datos; las rutas usan obtener_dataframe(),
+    que guarda el resultado en cache.
+
+    En lugar de crear un objeto Venta por fila (ORM), se hace un SELECT
+    solo de las columnas pedidas y las filas se leen por bloques con
+    fetchmany(): cada bloque se convierte directamente en arrays de numpy
+    (numeros y fechas) o en Categorical (textos). Asi nunca existen en
+    memoria todos los objetos Python de las filas a la vez.
 
     Parametros:
         filtros (dict): Diccionario opcional con filtros:
@@ -373,151 +970,1699 @@ def obtener_dataframe(filtros=None):
             - fecha_fin: str 'YYYY-MM-DD'
             - categoria: str
             - region: str
+            - hasta_id: int (solo ventas con id menor o igual)
+        columnas (list): Columnas a cargar (por defecto todas las de
+            COLUMNAS_VENTAS)
 
     Retorna:
         pd.DataFrame con columnas: fecha, producto, categoria, cantidad,
-        precio_unitario, total, region, cliente
+        precio_unitario, total, region, cliente (o las pedidas).
+        producto, categoria, region y cliente son de tipo 'category'.
     """
-    db = Session()
-    query = db.query(Venta)
+    columnas = list(columnas or COLUMNAS_VENTAS)
 
-    if filtros:
-        if filtros.get('fecha_inicio'):
-            try:
-                fi = datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d')
-                query = query.filter(Venta.fecha >= fi)
-            except ValueError:
+    bloques = {c: [] for c in columnas}
+    for filas in bloques_de_filas(consulta_ventas(filtros, columnas)):
+        for nombre, valores in zip(columnas, zip(*filas)):
+            bloques[nombre].append(_columna_desde_filas(nombre, valores))
+
+    if not bloques[columnas[0]]:
+        return dataframe_vacio(columnas)
+
+    return pd.DataFrame({c: _unir_bloques(c, bloques[c]) for c in columnas}, copy=False)
+
+
+# ============================================================================
+# CACHE DE DATAFRAMES
+# ============================================================================
+# Una vista del dashboard pide el mismo DataFrame varias veces: index() y
+# cada uno de los graficos /chart/*. En lugar de leer la tabla en cada
+# peticion, los DataFrames se guardan en memoria por filtros.
+#
+# - LRU: al superar el limite de memoria se descartan los menos usados.
+# - Version de datos: cada INSERT/UPDATE/DELETE sobre ds_ventas que este
+#   proceso confirma sube la version y las entradas anteriores dejan de valer.
+# - Caducidad: los cambios hechos por OTROS procesos no se detectan, asi
+#   que las entradas ademas vencen a los CACHE_DATAFRAMES_TTL segundos.
+# ============================================================================
+
+CACHE_DATAFRAMES_MB = int(os.environ.get('VENTAS_CACHE_MB', 256))
+CACHE_DATAFRAMES_TTL = int(os.environ.get('VENTAS_CACHE_TTL', 300))
+
+_version_ventas = 0
+_fecha_version_ventas = datetime.utcnow()
+_candado_version = threading.Lock()
+
+
+def version_ventas():
+    """Version actual de los datos de ds_ventas en este proceso."""
+    return _version_ventas
+
+
+def fecha_version_ventas():
+    """Momento (UTC) en que cambio por ultima vez la version de los datos."""
+    return _fecha_version_ventas
+
+
+def _subir_version_ventas():
+    """Invalida los datos derivados de ds_ventas (cache de DataFrames, etc.)."""
+    global _version_ventas, _fecha_version_ventas
+    with _candado_version:
+        _version_ventas += 1
+        _fecha_version_ventas = datetime.utcnow()
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _detectar_cambio_ventas(conexion, cursor, sentencia, parametros, contexto, executemany):
+    """
+    Marca la conexion al ejecutar un INSERT/UPDATE/DELETE sobre ds_ventas;
+    la version sube despues del commit (ver abajo).
+    """
+    inicio = sentencia.lstrip()[:6].upper()
+    if inicio in ('INSERT', 'UPDATE', 'DELETE') and 'ds_ventas' in sentencia:
+        conexion.info['modifico_ventas'] = True
+
+
+# ----------------------------------------------------------------------------
+# Despues del commit
+# ----------------------------------------------------------------------------
+# El evento 'commit' de SQLAlchemy se dispara ANTES de confirmar en la base:
+# una lectura concurrente todavia puede ver los datos viejos y guardarlos en
+# cache con la version nueva. Por eso en 'commit' los cambios solo se apartan
+# como "por confirmar" y se aplican cuando se sabe que el commit termino bien:
+# al empezar la siguiente transaccion de la conexion o al devolverla al pool.
+# Si el commit falla (handle_error) se descartan.
+# ----------------------------------------------------------------------------
+
+@event.listens_for(engine, 'commit')
+def _confirmar_cambio_ventas(conexion):
+    """Aparta los cambios de la transaccion hasta que el commit termine."""
+    if conexion.info.pop('modifico_ventas', False):
+        conexion.info['ventas_por_confirmar'] = True
+    pendientes = conexion.info.pop('kpis_pendientes', [])
+    if pendientes:
+        conexion.info.setdefault('kpis_por_confirmar', []).extend(pendientes)
+
+
+def _aplicar_cambios_confirmados(info):
+    """
+    Sube la version si el ultimo commit de la conexion cambio ds_ventas y
+    suma a los KPIs y a la muestra las ventas que confirmo.
+    """
+    if info.pop('ventas_por_confirmar', False):
+        _subir_version_ventas()
+    for ventas, signo in info.pop('kpis_por_confirmar', []):
+        motor_kpis.registrar(ventas, signo)
+        motor_aproximado.registrar(ventas, signo)
+
+
+@event.listens_for(engine, 'begin')
+def _aplicar_al_empezar(conexion):
+    _aplicar_cambios_confirmados(conexion.info)
+
+
+@event.listens_for(engine, 'checkin')
+def _aplicar_al_devolver(conexion_dbapi, registro):
+    _aplicar_cambios_confirmados(registro.info)
+
+
+@event.listens_for(engine, 'handle_error')
+def _descartar_commit_fallido(contexto):
+    """Si falla el commit, lo apartado en 'commit' nunca llego a la base."""
+    if contexto.connection is not None:
+        contexto.connection.info.pop('ventas_por_confirmar', None)
+        contexto.connection.info.pop('kpis_por_confirmar', None)
+
+
+@event.listens_for(engine, 'rollback')
+def _descartar_cambio_ventas(conexion):
+    """Olvida la marca de cambio si la transaccion se revierte."""
+    conexion.info.pop('modifico_ventas', None)
+    conexion.info.pop('kpis_pendientes', None)
+
+
+class CacheLRU:
+    """
+    Cache LRU con limite de memoria para valores derivados de ds_ventas.
+
+    Cada entrada recuerda la version de los datos con la que se calculo y
+    deja de valer cuando la version cambia o cuando supera `ttl` segundos.
+
+    Si varios hilos piden a la vez una clave que no esta en cache (el
+    navegador carga los graficos en paralelo), solo el primero la calcula
+    y los demas esperan su resultado.
+
+    Parametros:
+        limite_bytes: Memoria maxima que ocupan las entradas
+        ttl: Segundos de validez de cada entrada
+        medir: Funcion que retorna el tamano en bytes de un valor
+    """
+
+    def __init__(self, limite_bytes, ttl, medir):
+        self.limite_bytes = limite_bytes
+        self.ttl = ttl
+        self.medir = medir
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()  # clave -> (valor, bytes, version, creado)
+        self._bytes = 0
+        self._candado = threading.Lock()
+        self._cargando = {}  # clave -> candado de la carga en curso
+
+    def _vigente(self, clave, version):
+        """Retorna el valor de la clave si sigue valido (con el candado tomado)."""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        valor, tamano, version_entrada, creado = entrada
+        if version_entrada != version or time.monotonic() - creado > self.ttl:
+            del self._entradas[clave]
+            self._bytes -= tamano
+            return None
+        self._entradas.move_to_end(clave)
+        return valor
+
+    def obtener(self, clave, cargar):
+        """Retorna el valor de la clave, llamando a cargar() si no esta."""
+        while True:
+            version = version_ventas()
+            with self._candado:
+                valor = self._vigente(clave, version)
+                if valor is not None:
+                    self.aciertos += 1
+                    return valor
+                candado_carga = self._cargando.get(clave)
+                if candado_carga is None:
+                    candado_carga = self._cargando[clave] = threading.Lock()
+                    candado_carga.acquire()
+                    break
+            # Otro hilo ya esta cargando esta clave: esperar y reintentar
+            with candado_carga:
                 pass
-        if filtros.get('fecha_fin'):
+
+        try:
+            self.fallos += 1
+            valor = cargar()
+            self._guardar(clave, version, valor)
+            return valor
+        finally:
+            with self._candado:
+                del self._cargando[clave]
+            candado_carga.release()
+
+    def _guardar(self, clave, version, valor):
+        tamano = int(self.medir(valor))
+        if tamano > self.limite_bytes:
+            return
+        with self._candado:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._entradas[clave] = (valor, tamano, version, time.monotonic())
+            self._bytes += tamano
+            while self._bytes > self.limite_bytes:
+                _, (_, tamano_viejo, _, _) = self._entradas.popitem(last=False)
+                self._bytes -= tamano_viejo
+
+    def limpiar(self):
+        with self._candado:
+            self._entradas.clear()
+            self._bytes = 0
+
+
+cache_dataframes = CacheLRU(
+    CACHE_DATAFRAMES_MB * 1024 * 1024,
+    CACHE_DATAFRAMES_TTL,
+    medir=lambda df: df.memory_usage(deep=True).sum(),
+)
+
+
+def normalizar_filtros(filtros):
+    """
+    Convierte los filtros en una tupla ordenada sin valores vacios, para
+    que None, {} y {'categoria': ''} den la misma clave de cache.
+    """
+    if not filtros:
+        return ()
+    return tuple(sorted(
+        (clave, str(valor).strip())
+        for clave, valor in filtros.items()
+        if valor and str(valor).strip()
+    ))
+
+
+@medido('dataframe')
+def obtener_dataframe(filtros=None, columnas=None):
+    """
+    Retorna el DataFrame de ventas con los filtros dados, desde la cache
+    si ya se cargo con los mismos filtros y los datos no cambiaron.
+
+    El DataFrame es compartido entre peticiones: NO se debe modificar
+    (usar df.copy() antes de agregar columnas).
+
+    Parametros y retorno: igual que cargar_dataframe().
+    """
+    columnas = tuple(columnas or COLUMNAS_VENTAS)
+    clave = (normalizar_filtros(filtros), columnas)
+    return cache_dataframes.obtener(clave, lambda: cargar_dataframe(filtros, columnas))
+
+
+# ============================================================================
+# RESUMENES PRE-AGREGADOS (ROLLUPS)
+# ============================================================================
+# Los graficos y KPIs solo necesitan sumas por mes, categoria, region,
+# producto o cliente. En lugar de agrupar todas las transacciones en cada
+# peticion, ds_resumen_ventas guarda esas sumas ya calculadas por dia y por
+# mes, y se actualiza cada vez que se inserta, modifica o borra una venta.
+#
+# Para un rango de fechas se usan los meses completos del rango y solo los
+# dias sueltos de los bordes, asi el costo depende de la cantidad de meses
+# y no de la cantidad de ventas.
+# ============================================================================
+
+CLAVE_RESUMEN = ['granularidad', 'periodo', 'dimension', 'valor', 'categoria', 'region']
+METRICAS_RESUMEN = ['num_ventas', 'cantidad', 'total', 'total_cuadrados']
+
+
+def _agregados_resumen(ventas):
+    """
+    Agrupa ventas (DataFrame con fecha, producto, categoria, cantidad,
+    total, region y cliente) en filas de ds_resumen_ventas.
+    """
+    ventas = ventas.assign(
+        num_ventas=1,
+        total_cuadrados=ventas['total'] ** 2,
+        dia=ventas['fecha'].dt.normalize(),
+        mes=ventas['fecha'].dt.to_period('M').dt.to_timestamp(),
+    )
+    partes = []
+    for granularidad in ('dia', 'mes'):
+        for dimension in ('producto', 'cliente'):
+            grupos = ventas.groupby([granularidad, dimension, 'categoria', 'region'], observed=True)
+            parte = grupos[METRICAS_RESUMEN].sum().reset_index()
+            parte = parte.rename(columns={granularidad: 'periodo', dimension: 'valor'})
+            parte['granularidad'] = granularidad
+            parte['dimension'] = dimension
+            partes.append(parte)
+
+    agregados = pd.concat(partes, ignore_index=True)
+    agregados['periodo'] = agregados['periodo'].dt.date
+    for columna in ('valor', 'categoria', 'region'):
+        agregados[columna] = agregados[columna].astype(str)
+    return agregados
+
+
+def _insertar_o_sumar(conexion, tabla):
+    """
+    INSERT que, si la fila del resumen ya existe, suma las metricas en la
+    misma sentencia (ON CONFLICT / ON DUPLICATE KEY). Asi dos transacciones
+    que agregan la primera venta de un periodo no chocan con la restriccion
+    unica. Retorna None si el motor no lo soporta.
+    """
+    motor = conexion.dialect.name
+    if motor in ('sqlite', 'postgresql'):
+        dialecto = sqlite if motor == 'sqlite' else postgresql
+        sentencia = dialecto.insert(tabla)
+        return sentencia.on_conflict_do_update(
+            index_elements=CLAVE_RESUMEN,
+            set_={m: tabla.c[m] + sentencia.excluded[m] for m in METRICAS_RESUMEN},
+        )
+    if motor in ('mysql', 'mariadb'):
+        sentencia = mysql.insert(tabla)
+        return sentencia.on_duplicate_key_update(
+            {m: tabla.c[m] + sentencia.inserted[m] for m in METRICAS_RESUMEN}
+        )
+    return None
+
+
+def actualizar_resumenes(conexion, ventas, signo=1):
+    """
+    Suma (signo=1) o resta (signo=-1) ventas en ds_resumen_ventas.
+
+    Se usa automaticamente al hacer commit de ventas con la sesion del ORM.
+    Quien inserte ventas con SQLAlchemy Core (insert masivo) debe llamarla
+    con la misma conexion para mantener los resumenes al dia.
+    """
+    if ventas.empty:
+        return
+    # El motor de KPIs aplica estas ventas cuando la transaccion se confirma
+    conexion.info.setdefault('kpis_pendientes', []).append((ventas, signo))
+    tabla = ResumenVenta.__table__
+    filas = _agregados_resumen(ventas).to_dict('records')
+
+    sentencia = _insertar_o_sumar(conexion, tabla) if signo > 0 else None
+    if sentencia is not None:
+        conexion.execute(sentencia, filas)
+        return
+
+    for fila in filas:
+        clave = [tabla.c[c] == fila[c] for c in CLAVE_RESUMEN]
+        cambios = {m: tabla.c[m] + signo * fila[m] for m in METRICAS_RESUMEN}
+        resultado = conexion.execute(update(tabla).where(*clave).values(**cambios))
+        if resultado.rowcount == 0 and signo > 0:
             try:
-                ff = datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d')
-                ff = ff.replace(hour=23, minute=59, second=59)
-                query = query.filter(Venta.fecha <= ff)
-            except ValueError:
-                pass
-        if filtros.get('categoria'):
-            query = query.filter(Venta.categoria == filtros['categoria'])
-        if filtros.get('region'):
-            query = query.filter(Venta.region == filtros['region'])
+                with conexion.begin_nested():
+                    conexion.execute(insert(tabla).values(**fila))
+            except IntegrityError:
+                # Otra transaccion inserto la misma fila despues del UPDATE
+                conexion.execute(update(tabla).where(*clave).values(**cambios))
+
+    if signo < 0:
+        conexion.execute(delete(tabla).where(tabla.c.num_ventas <= 0))
+
+
+def _ventas_a_dataframe(ventas, anteriores=False):
+    """DataFrame con los valores de objetos Venta (o los previos a su modificacion)."""
+    columnas = ['id', 'fecha', 'producto', 'categoria', 'cantidad', 'total', 'region', 'cliente']
+    filas = []
+    for venta in ventas:
+        estado = inspect(venta)
+        fila = {}
+        for columna in columnas:
+            historial = estado.attrs[columna].history
+            if anteriores and historial.deleted:
+                fila[columna] = historial.deleted[0]
+            else:
+                fila[columna] = getattr(venta, columna)
+        filas.append(fila)
+    df = pd.DataFrame(filas, columns=columnas)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+@event.listens_for(session_factory, 'after_flush')
+def _mantener_resumenes(sesion, contexto):
+    """
+    Actualiza los resumenes en la misma transaccion en que se guardan las
+    ventas, asi nunca quedan desfasados respecto a ds_ventas.
+    """
+    nuevas = [o for o in sesion.new if isinstance(o, Venta)]
+    borradas = [o for o in sesion.deleted if isinstance(o, Venta)]
+    modificadas = [o for o in sesion.dirty
+                   if isinstance(o, Venta) and sesion.is_modified(o)]
+    if not (nuevas or borradas or modificadas):
+        return
+
+    conexion = sesion.connection()
+    if borradas or modificadas:
+        actualizar_resumenes(conexion, _ventas_a_dataframe(borradas + modificadas, anteriores=True), signo=-1)
+    if nuevas or modificadas:
+        actualizar_resumenes(conexion, _ventas_a_dataframe(nuevas + modificadas))
+
+
+def _truncar_fecha(columna, granularidad):
+    """
+    Expresion SQL que trunca una fecha al dia o al primer dia del mes.
+    Retorna None si el motor de base de datos no esta soportado.
+
+    Los textos van como literal_column (no como parametros) para que la
+    expresion del SELECT y la del GROUP BY sean identicas.
+    """
+    motor = engine.dialect.name
+    if granularidad == 'dia' and motor in ('sqlite', 'mysql', 'mariadb'):
+        return func.date(columna)
+    if motor == 'sqlite':
+        return func.date(columna, literal_column("'start of month'"))
+    if motor == 'postgresql':
+        unidad = 'day' if granularidad == 'dia' else 'month'
+        return cast(func.date_trunc(literal_column(f"'{unidad}'"), columna), Date)
+    if motor in ('mysql', 'mariadb'):
+        return func.str_to_date(func.date_format(columna, literal_column("'%Y-%m-01'")),
+                                literal_column("'%Y-%m-%d'"))
+    return None
+
+
+def _insertar_resumenes_sql(conexion):
+    """
+    Llena ds_resumen_ventas con INSERT ... SELECT ... GROUP BY: la base de
+    datos agrupa las ventas y ninguna fila viaja a Python.
+    Retorna False si el motor no sabe truncar fechas (ver _truncar_fecha).
+    """
+    ventas = Venta.__table__
+    tabla = ResumenVenta.__table__
+    consultas = []
+    for granularidad in ('dia', 'mes'):
+        periodo = _truncar_fecha(ventas.c.fecha, granularidad)
+        if periodo is None:
+            return False
+        for dimension in ('producto', 'cliente'):
+            valor = ventas.c[dimension]
+            consultas.append(
+                select(
+                    literal_column(f"'{granularidad}'"), periodo,
+                    literal_column(f"'{dimension}'"), valor,
+                    ventas.c.categoria, ventas.c.region,
+                    func.count(), func.sum(ventas.c.cantidad), func.sum(ventas.c.total),
+                    func.sum(ventas.c.total * ventas.c.total),
+                ).group_by(periodo, valor, ventas.c.categoria, ventas.c.region)
+            )
+
+    columnas = ['granularidad', 'periodo', 'dimension', 'valor', 'categoria', 'region',
+                'num_ventas', 'cantidad', 'total', 'total_cuadrados']
+    for consulta in consultas:
+        conexion.execute(insert(tabla).from_select(columnas, consulta))
+    return True
+
+
+def reconstruir_resumenes():
+    """Recalcula ds_resumen_ventas completo desde ds_ventas."""
+    tabla = ResumenVenta.__table__
+    with engine.begin() as conexion:
+        conexion.execute(delete(tabla))
+        if not _insertar_resumenes_sql(conexion):
+            # Otros motores: se agrupa con pandas
+            ventas = cargar_dataframe(columnas=['fecha', 'producto', 'categoria', 'cantidad',
+                                                'total', 'region', 'cliente'])
+            if not ventas.empty:
+                conexion.execute(insert(tabla), _agregados_resumen(ventas).to_dict('records'))
+    # Los resultados en cache se calcularon con los resumenes anteriores
+    _subir_version_ventas()
+    motor_kpis.invalidar()
+    motor_aproximado.invalidar()
+
+
+def asegurar_resumenes():
+    """Construye los resumenes si hay ventas pero la tabla esta vacia."""
+    db = Session()
+    faltan = db.query(ResumenVenta.id).first() is None and db.query(Venta.id).first() is not None
+    db.close()
+    if faltan:
+        reconstruir_resumenes()
+        print('[INFO] Se construyeron los resumenes de ventas.')
+
+
+def _parsear_fecha(texto):
+    """Convierte 'YYYY-MM-DD' en date; None si falta o es invalida."""
+    if not texto:
+        return None
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _primer_dia_mes_siguiente(fecha):
+    return (fecha.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _condicion_periodos(filtros):
+    """
+    Condicion sobre (granularidad, periodo) que cubre el rango de fechas:
+    filas mensuales para los meses completos y diarias para los bordes.
+    """
+    tabla = ResumenVenta.__table__
+    inicio = _parsear_fecha((filtros or {}).get('fecha_inicio'))
+    fin = _parsear_fecha((filtros or {}).get('fecha_fin'))
+    if inicio is None and fin is None:
+        return tabla.c.granularidad == 'mes'
+
+    # Rango [inicio, fin_excl) y meses completos [mes_ini, mes_fin_excl)
+    fin_excl = fin + timedelta(days=1) if fin else None
+    mes_ini = None
+    if inicio:
+        mes_ini = inicio if inicio.day == 1 else _primer_dia_mes_siguiente(inicio)
+    mes_fin_excl = fin_excl.replace(day=1) if fin_excl else None
+
+    def dias(desde, hasta):
+        partes = [tabla.c.granularidad == 'dia']
+        if desde:
+            partes.append(tabla.c.periodo >= desde)
+        if hasta:
+            partes.append(tabla.c.periodo < hasta)
+        return and_(*partes)
+
+    if mes_ini and mes_fin_excl and mes_ini >= mes_fin_excl:
+        # El rango no contiene ningun mes completo
+        return dias(inicio, fin_excl)
+
+    meses = [tabla.c.granularidad == 'mes']
+    if mes_ini:
+        meses.append(tabla.c.periodo >= mes_ini)
+    if mes_fin_excl:
+        meses.append(tabla.c.periodo < mes_fin_excl)
+    condiciones = [and_(*meses)]
+    if inicio and inicio < mes_ini:
+        condiciones.append(dias(inicio, mes_ini))
+    if fin_excl and mes_fin_excl < fin_excl:
+        condiciones.append(dias(mes_fin_excl, fin_excl))
+    return or_(*condiciones)
+
+
+def _columna_resumen(agrupar_por):
+    tabla = ResumenVenta.__table__
+    return {
+        'mes': tabla.c.periodo,
+        'categoria': tabla.c.categoria,
+        'region': tabla.c.region,
+        'producto': tabla.c.valor,
+        'cliente': tabla.c.valor,
+    }.get(agrupar_por)
+
+
+def _condiciones_resumen(agrupar_por, filtros):
+    tabla = ResumenVenta.__table__
+    # Las filas por producto y por cliente suman lo mismo; se usan las de
+    # cliente solo cuando se agrupa por cliente.
+    dimension = 'cliente' if agrupar_por == 'cliente' else 'producto'
+    condiciones = [tabla.c.dimension == dimension, _condicion_periodos(filtros)]
+    if filtros and filtros.get('categoria'):
+        condiciones.append(tabla.c.categoria == filtros['categoria'])
+    if filtros and filtros.get('region'):
+        condiciones.append(tabla.c.region == filtros['region'])
+    return condiciones
+
+
+def _consultar_resumen(agrupar_por, filtros):
+    tabla = ResumenVenta.__table__
+    columna_grupo = _columna_resumen(agrupar_por)
+    condiciones = _condiciones_resumen(agrupar_por, filtros)
+
+    metricas = [func.coalesce(func.sum(tabla.c[m]), 0).label(m) for m in METRICAS_RESUMEN]
+    if columna_grupo is None:
+        consulta = select(*metricas).where(*condiciones)
+    else:
+        consulta = (select(columna_grupo.label('grupo'), *metricas)
+                    .where(*condiciones).group_by(columna_grupo))
+
+    with engine.connect() as conexion:
+        filas = conexion.execute(consulta).all()
+
+    if columna_grupo is None:
+        return pd.DataFrame(filas, columns=METRICAS_RESUMEN)
+
+    resumen = pd.DataFrame(filas, columns=['grupo'] + METRICAS_RESUMEN)
+    if agrupar_por == 'mes':
+        # Los dias de los bordes se suman a su mes
+        resumen['grupo'] = pd.to_datetime(resumen['grupo']).dt.to_period('M')
+        return resumen.groupby('grupo').sum().sort_index()
+    return resumen.set_index('grupo')
+
+
+def resumen_ventas(agrupar_por=None, filtros=None):
+    """
+    Totales de ventas desde ds_resumen_ventas.
+
+    Parametros:
+        agrupar_por: 'mes', 'categoria', 'region', 'producto', 'cliente'
+            o None para el total general
+        filtros: Los mismos filtros que obtener_dataframe()
+
+    Retorna:
+        DataFrame con num_ventas, cantidad, total y total_cuadrados,
+        indexado por grupo (Period mensual si agrupar_por='mes'), o de una
+        sola fila si agrupar_por es None.
+    """
+    clave = ('resumen', agrupar_por, normalizar_filtros(filtros))
+    return cache_dataframes.obtener(clave, lambda: _consultar_resumen(agrupar_por, filtros))
+
+
+def ventas_mensuales(filtros=None):
+    """Serie con el total de ventas de cada mes (indice: Period mensual)."""
+    return resumen_ventas('mes', filtros)['total']
+
+
+def totales_por(campo, filtros=None):
+    """Serie con el total de ventas por categoria, region, producto o cliente."""
+    return resumen_ventas(campo, filtros)['total']
+
+
+def _consultar_matriz_mensual(segmento, filtros):
+    tabla = ResumenVenta.__table__
+    columna = _columna_resumen(segmento)
+    consulta = (select(tabla.c.periodo, columna, func.sum(tabla.c.total))
+                .where(*_condiciones_resumen(segmento, filtros))
+                .group_by(tabla.c.periodo, columna))
+    with engine.connect() as conexion:
+        filas = conexion.execute(consulta).all()
+    if not filas:
+        return pd.DataFrame(dtype=float)
+
+    resumen = pd.DataFrame(filas, columns=['mes', 'grupo', 'total'])
+    # Los dias de los bordes se suman a su mes
+    resumen['mes'] = pd.to_datetime(resumen['mes']).dt.to_period('M')
+    matriz = resumen.pivot_table(index='grupo', columns='mes', values='total',
+                                 aggfunc='sum', fill_value=0.0)
+    # Los meses sin ventas de ningun segmento tambien cuentan (con 0)
+    meses = pd.period_range(matriz.columns.min(), matriz.columns.max(), freq='M')
+    return matriz.reindex(columns=meses, fill_value=0.0)
+
+
+def matriz_mensual(segmento, filtros=None):
+    """
+    Total de ventas por mes de cada segmento, como matriz.
+
+    Parametros:
+        segmento: 'categoria', 'region', 'producto' o 'cliente'
+        filtros: Los mismos filtros que obtener_dataframe()
+
+    Retorna:
+        DataFrame (segmentos × meses): una fila por segmento y una columna
+        por mes (Period mensual, sin huecos); 0 donde no hubo ventas.
+    """
+    clave = ('matriz_mensual', segmento, normalizar_filtros(filtros))
+    return cache_dataframes.obtener(clave, lambda: _consultar_matriz_mensual(segmento, filtros))
+
+
+# ============================================================================
+# MOTOR INCREMENTAL DE KPIS
+# ============================================================================
+# Los KPIs del dashboard principal (sin filtros) se mantienen en memoria y
+# se actualizan con cada venta confirmada, sin volver a leer el historico:
+#
+# - total y cantidad de ventas: sumas acumuladas
+# - producto/categoria/region/cliente top: totales por clave y el maximo
+#   actual (al insertar solo puede subir la clave que cambio)
+# - mediana: algoritmo P² (Jain y Chlamtac, 1985), que estima un cuantil
+#   con 5 marcadores, sin guardar los valores
+#
+# El motor se construye leyendo las ventas la primera vez que se pide. Si
+# se borran o modifican ventas (algo que P² no puede deshacer) se marca
+# para reconstruirse en el siguiente pedido.
+#
+# Los cambios hechos por otros procesos no pasan por registrar(): en cada
+# pedido se compara el id mas alto y la cantidad de ventas de la base
+# (firma_ventas) con los del motor y, si no coinciden, se reconstruye.
+# Las modificaciones que no cambian ninguno de los dos se ven al vencer el
+# estado, a los CACHE_DATAFRAMES_TTL segundos (como la cache de DataFrames).
+# ============================================================================
+
+class CuantilP2:
+    """
+    Estimador de un cuantil en flujo con el algoritmo P².
+
+    Usa memoria constante y O(1) por valor. Con menos de 5 valores el
+    resultado es exacto.
+
+    Ejemplo:
+        mediana = CuantilP2(0.5)
+        for valor in valores:
+            mediana.agregar(valor)
+        mediana.valor()
+    """
+
+    def __init__(self, p=0.5):
+        self.p = p
+        self.n = 0
+        self._iniciales = []
+        self.alturas = []      # q: valor estimado en cada marcador
+        self.posiciones = []   # n: posicion real de cada marcador (desde 1)
+        self.deseadas = []     # n': posicion ideal de cada marcador
+        self.incrementos = [0, p / 2, p, (1 + p) / 2, 1]
+
+    @classmethod
+    def desde_valores(cls, valores, p=0.5):
+        """
+        Crea el estimador a partir de todos los valores de una vez, ubicando
+        los marcadores en los cuantiles exactos (en lugar de agregarlos uno
+        a uno).
+        """
+        estimador = cls(p)
+        valores = np.asarray(valores, dtype=float)
+        if len(valores) <= 5:
+            for valor in valores:
+                estimador.agregar(float(valor))
+            return estimador
+
+        n = len(valores)
+        estimador.n = n
+        estimador.deseadas = [1 + (n - 1) * inc for inc in estimador.incrementos]
+        estimador.posiciones = [int(round(d)) for d in estimador.deseadas]
+        ordenados = np.partition(valores, [pos - 1 for pos in estimador.posiciones])
+        estimador.alturas = [float(ordenados[pos - 1]) for pos in estimador.posiciones]
+        return estimador
+
+    def agregar(self, x):
+        self.n += 1
+        if self.n <= 5:
+            self._iniciales.append(x)
+            if self.n == 5:
+                self.alturas = sorted(self._iniciales)
+                self.posiciones = [1, 2, 3, 4, 5]
+                self.deseadas = [1 + 4 * inc for inc in self.incrementos]
+            return
+
+        q = self.alturas
+        # Celda k donde cae x (y ajuste de los extremos)
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while not q[k] <= x < q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            self.posiciones[i] += 1
+        for i in range(5):
+            self.deseadas[i] += self.incrementos[i]
+
+        # Ajustar los marcadores centrales que se alejaron de su posicion ideal
+        n = self.posiciones
+        for i in (1, 2, 3):
+            d = self.deseadas[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidato = self._parabolica(i, d)
+                if q[i - 1] < candidato < q[i + 1]:
+                    q[i] = candidato
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def _parabolica(self, i, d):
+        q, n = self.alturas, self.posiciones
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def valor(self):
+        """Estimacion actual del cuantil (0 si no hay valores)."""
+        if self.n == 0:
+            return 0
+        if self.n < 5:
+            return float(np.quantile(self._iniciales, self.p))
+        return self.alturas[2]
+
+
+class MotorKPIs:
+    """Mantiene los KPIs generales actualizados venta a venta."""
+
+    DIMENSIONES = ('producto', 'categoria', 'region', 'cliente')
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._listo = False
+
+    def _reconstruir(self):
+        """
+        Calcula todo el estado leyendo las ventas (con el candado tomado).
+
+        Solo se leen las ventas hasta la marca (el id mas alto al empezar) y
+        se recuerdan los ids menores que faltaron: las demas llegan por
+        registrar(), y si ademas se leyeran aqui quedarian contadas dos veces.
+        """
+        self._marca = ultimo_id_venta()
+        self._construido = time.monotonic()
+        df = cargar_dataframe({'hasta_id': self._marca},
+                              columnas=list(self.DIMENSIONES) + ['total', 'id'])
+        self._faltantes = ids_no_leidos(df['id'].to_numpy(), self._marca)
+        self._maximo = int(df['id'].max()) if len(df) else 0
+        self.total = float(df['total'].sum())
+        self.num_ventas = len(df)
+        self.totales = {
+            d: df.groupby(d, observed=True)['total'].sum().to_dict()
+            for d in self.DIMENSIONES
+        }
+        self.tops = {
+            d: max(totales, key=totales.get) if totales else None
+            for d, totales in self.totales.items()
+        }
+        self.mediana = CuantilP2.desde_valores(df['total'].to_numpy())
+        self._listo = True
+
+    def registrar(self, ventas, signo=1):
+        """
+        Aplica ventas confirmadas: insertadas (signo=1) o borradas (signo=-1).
+
+        Parametros:
+            ventas: DataFrame con producto, categoria, region, cliente y total
+                (y opcionalmente id, para saltar las que ya se leyeron)
+        """
+        with self._candado:
+            if not self._listo:
+                # Se construira completo la proxima vez que se pida
+                return
+            if signo < 0:
+                self._listo = False
+                return
+            ventas = ventas_no_leidas(ventas, self._marca, self._faltantes)
+            if 'id' not in ventas:
+                self._maximo = None     # no se sabe: kpis() reconstruira
+            elif len(ventas) and self._maximo is not None:
+                self._maximo = max(self._maximo, int(ventas['id'].max()))
+
+            for fila in ventas[list(self.DIMENSIONES) + ['total']].itertuples(index=False):
+                total = float(fila.total)
+                self.total += total
+                self.num_ventas += 1
+                self.mediana.agregar(total)
+                for dimension in self.DIMENSIONES:
+                    totales = self.totales[dimension]
+                    clave = getattr(fila, dimension)
+                    totales[clave] = totales.get(clave, 0) + total
+                    top = self.tops[dimension]
+                    if top is None or totales[clave] > totales[top]:
+                        self.tops[dimension] = clave
+
+    def invalidar(self):
+        """Fuerza a reconstruir el estado desde la base de datos."""
+        with self._candado:
+            self._listo = False
+
+    def kpis(self):
+        """KPIs generales (ver calcular_kpis); solo lee ventas si hay que reconstruir."""
+        firma = firma_ventas()
+        with self._candado:
+            if self._listo and (firma != (self._maximo, self.num_ventas)
+                                or time.monotonic() - self._construido > CACHE_DATAFRAMES_TTL):
+                # Otro proceso cambio las ventas (o el estado vencio)
+                self._listo = False
+            if not self._listo:
+                self._reconstruir()
+            if self.num_ventas == 0:
+                return {
+                    'total_ventas': 0, 'num_transacciones': 0,
+                    'ticket_promedio': 0, 'ticket_mediana': 0,
+                    'producto_top': 'N/A', 'categoria_top': 'N/A',
+                    'region_top': 'N/A', 'cliente_top': 'N/A',
+                }
+            return {
+                'total_ventas': round(self.total, 2),
+                'num_transacciones': self.num_ventas,
+                'ticket_promedio': round(self.total / self.num_ventas, 2),
+                'ticket_mediana': round(self.mediana.valor(), 2),
+                'producto_top': self.tops['producto'],
+                'categoria_top': self.tops['categoria'],
+                'region_top': self.tops['region'],
+                'cliente_top': self.tops['cliente'],
+            }
+
+
+motor_kpis = MotorKPIs()
+
+
+@medido('calculos')
+def calcular_kpis(filtros=None, mediana=None):
+    """
+    Calcula los KPIs (Key Performance Indicators) principales.
+
+    Los KPIs son metricas clave que resumen el estado del negocio
+    de un vistazo. Son esenciales en cualquier dashboard.
+
+    Sin filtros, los KPIs salen del motor incremental (motor_kpis) sin
+    leer ventas. Con filtros, las sumas y los "top" salen de los resumenes
+    pre-agregados; solo la mediana necesita las transacciones (y carga
+    unicamente la columna total). En modo aproximado la mediana ya
+    estimada se pasa en `mediana` y no se lee ninguna venta.
+
+    Retorna un diccionario con:
+    - total_ventas: Suma de todos los totales
+    - num_transacciones: Cantidad de registros
+    - ticket_promedio: Promedio de total por transaccion (media)
+    - ticket_mediana: Mediana del total (menos afectada por extremos)
+    - producto_top: Producto con mas ventas totales
+    - categoria_top: Categoria con mas ventas totales
+    - region_top: Region con mas ventas totales
+    - cliente_top: Cliente que mas ha gastado
+    """
+    if not normalizar_filtros(filtros):
+        kpis = motor_kpis.kpis()
+        if mediana is not None and kpis['num_transacciones']:
+            kpis['ticket_mediana'] = round(mediana, 2)
+        return kpis
+
+    general = resumen_ventas(None, filtros).iloc[0]
+    num_transacciones = int(general['num_ventas'])
+
+    if num_transacciones == 0:
+        return {
+            'total_ventas': 0, 'num_transacciones': 0,
+            'ticket_promedio': 0, 'ticket_mediana': 0,
+            'producto_top': 'N/A', 'categoria_top': 'N/A',
+            'region_top': 'N/A', 'cliente_top': 'N/A',
+        }
+
+    if mediana is None:
+        mediana = obtener_dataframe(filtros, columnas=['total'])['total'].median()
+
+    return {
+        'total_ventas': round(general['total'], 2),
+        'num_transacciones': num_transacciones,
+        'ticket_promedio': round(general['total'] / num_transacciones, 2),
+        'ticket_mediana': round(mediana, 2),
+        'producto_top': totales_por('producto', filtros).idxmax(),
+        'categoria_top': totales_por('categoria', filtros).idxmax(),
+        'region_top': totales_por('region', filtros).idxmax(),
+        'cliente_top': totales_por('cliente', filtros).idxmax(),
+    }
+
+
+@medido('calculos')
+def calcular_estadisticas(df):
+    """
+    Calcula estadisticas descriptivas completas.
+
+    Incluye:
+    - describe(): Resumen automatico (count, mean, std, min, 25%, 50%, 75%, max)
+    - Correlacion entre cantidad y total
+    - Desviacion estandar
+    - Coeficiente de variacion
+    """
+    if df.empty:
+        return {
+            'descripcion': {},
+            'correlacion_cantidad_total': 0,
+            'desviacion_total': 0,
+            'coeficiente_variacion': 0,
+            'por_categoria': {},
+            'por_region': {},
+        }
+
+    desc = df[['cantidad', 'precio_unitario', 'total']].describe().round(2)
+
+    correlacion = df['cantidad'].corr(df['total'])
+
+    por_cat = df.groupby('categoria', observed=True)['total'].agg(['sum', 'mean', 'median', 'std', 'count']).round(2)
+    por_reg = df.groupby('region', observed=True)['total'].agg(['sum', 'mean', 'median', 'std', 'count']).round(2)
+
+    return {
+        'descripcion': desc.to_dict(),
+        'correlacion_cantidad_total': round(correlacion, 4),
+        'desviacion_total': round(df['total'].std(), 2),
+        'coeficiente_variacion': round(df['total'].std() / df['total'].mean() * 100, 2) if df['total'].mean() != 0 else 0,
+        'por_categoria': por_cat.to_dict('index'),
+        'por_region': por_reg.to_dict('index'),
+    }
+
+
+# ============================================================================
+# MODO APROXIMADO: MUESTRA ESTRATIFICADA Y SKETCHES
+# ============================================================================
+# Con decenas de millones de ventas, las medianas, describe() y los groupby
+# de calcular_estadisticas tardan segundos por cada combinacion de filtros.
+# El modo aproximado (?aproximado=1 en /analisis/filtros) responde al
+# instante:
+#
+# - lo que los resumenes dan exacto y barato (conteos, sumas, promedios y
+#   desviaciones, general y por categoria/region) se sigue tomando de ahi
+# - medianas, cuantiles y correlacion salen de una muestra estratificada:
+#   hasta VENTAS_MUESTRA_ESTRATO ventas de cada (categoria, region). Cada
+#   venta recibe una clave aleatoria y el estrato guarda las de clave mas
+#   baja (reservorio por claves: una venta nueva entra si su clave es menor
+#   que la mayor guardada). Cada venta de la muestra representa N_h / n_h
+#   ventas de su estrato.
+# - sin filtro de fechas, la mediana sale de un sketch de cuantiles y los
+#   clientes/productos distintos de un HyperLogLog (uno por estrato; se
+#   combinan para los filtros de categoria y region)
+#
+# Junto a cada valor estimado se informa su margen de error al 95%.
+#
+# La muestra y los sketches se construyen leyendo las ventas una vez y se
+# actualizan con cada venta confirmada (despues del commit, igual que
+# motor_kpis). Borrar o modificar ventas no se puede deshacer en la
+# muestra, y los cambios de otros procesos no llegan por el commit (se
+# detectan con firma_ventas, como en motor_kpis): en ambos casos se
+# reconstruye en segundo plano y mientras tanto se responde con la
+# anterior. Mientras se ve la estimacion, los valores exactos se
+# calculan en el pool de reportes (ver resultado_exacto).
+# ============================================================================
+
+TAMANO_MUESTRA_ESTRATO = int(os.environ.get('VENTAS_MUESTRA_ESTRATO', 5_000))
+Z_95 = 1.96
+
+
+class SketchCuantiles:
+    """
+    Sketch de cuantiles con error relativo acotado (cubetas logaritmicas,
+    como DDSketch).
+
+    Cada valor x > 0 se cuenta en la cubeta ceil(log_gamma(x)), con
+    gamma = (1 + a) / (1 - a). Todo valor de una cubeta esta a menos de
+    a * x del punto medio de la cubeta, asi que el cuantil estimado difiere
+    del real en menos de `error_relativo`. A diferencia de CuantilP2, se
+    pueden combinar sketches de varios estratos.
+    """
+
+    def __init__(self, error_relativo=0.01):
+        self.error_relativo = error_relativo
+        self.gamma = (1 + error_relativo) / (1 - error_relativo)
+        self._log_gamma = np.log(self.gamma)
+        self.cubetas = {}
+        self.no_positivos = 0
+        self.n = 0
+
+    def agregar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        positivos = valores[valores > 0]
+        indices = np.ceil(np.log(positivos) / self._log_gamma).astype(np.int64)
+        for indice, conteo in zip(*[a.tolist() for a in np.unique(indices, return_counts=True)]):
+            self.cubetas[indice] = self.cubetas.get(indice, 0) + conteo
+        self.no_positivos += len(valores) - len(positivos)
+        self.n += len(valores)
+
+    def combinar(self, otro):
+        for indice, conteo in otro.cubetas.items():
+            self.cubetas[indice] = self.cubetas.get(indice, 0) + conteo
+        self.no_positivos += otro.no_positivos
+        self.n += otro.n
+        return self
+
+    def cuantil(self, p):
+        """Valor del cuantil p (0 a 1); None si no hay valores."""
+        if self.n == 0:
+            return None
+        rango = p * (self.n - 1)
+        acumulado = self.no_positivos
+        if rango < acumulado:
+            return 0.0
+        for indice in sorted(self.cubetas):
+            acumulado += self.cubetas[indice]
+            if acumulado > rango:
+                break
+        return float(2 * self.gamma ** indice / (self.gamma + 1))
+
+
+def _longitud_bits(valores):
+    """Cantidad de bits significativos de cada entero de un array uint64."""
+    valores = valores.copy()
+    longitud = np.zeros(len(valores), dtype=np.int64)
+    for desplazamiento in (32, 16, 8, 4, 2, 1):
+        grandes = valores >= np.uint64(1 << desplazamiento)
+        longitud[grandes] += desplazamiento
+        valores[grandes] = valores[grandes] >> np.uint64(desplazamiento)
+    return longitud + (valores > 0)
+
+
+class HyperLogLog:
+    """
+    Cuenta valores distintos con memoria fija (2^precision bytes).
+
+    Cada valor se convierte en un hash de 64 bits: los primeros `precision`
+    bits eligen un registro, que guarda la racha mas larga de ceros
+    iniciales vista en el resto (+1). Con muchos valores distintos es
+    probable ver rachas largas. Dos sketches se combinan con el maximo
+    registro a registro.
+
+    Error estandar relativo: 1.04 / sqrt(2^precision), ~1.6% con 12.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registros = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def error_relativo(self):
+        return 1.04 / np.sqrt(len(self.registros))
+
+    def agregar(self, valores):
+        hashes = pd.util.hash_array(np.asarray(valores, dtype=object))
+        bits_resto = 64 - self.precision
+        indices = (hashes >> np.uint64(bits_resto)).astype(np.intp)
+        resto = hashes & np.uint64((1 << bits_resto) - 1)
+        rachas = (bits_resto + 1 - _longitud_bits(resto)).astype(np.uint8)
+        np.maximum.at(self.registros, indices, rachas)
+
+    def combinar(self, otro):
+        np.maximum(self.registros, otro.registros, out=self.registros)
+        return self
+
+    def estimar(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimacion = alfa * m * m / np.sum(np.exp2(-self.registros.astype(float)))
+        vacios = int(np.count_nonzero(self.registros == 0))
+        if estimacion <= 2.5 * m and vacios:
+            # Pocos valores: conteo lineal de registros vacios (mas preciso)
+            estimacion = m * np.log(m / vacios)
+        return float(estimacion)
+
+
+class MotorAproximado:
+    """Muestra estratificada y sketches de las ventas, al dia venta a venta."""
+
+    ESTRATO = ['categoria', 'region']
+    COLUMNAS = ['fecha', 'producto', 'categoria', 'cantidad', 'precio_unitario',
+                'total', 'region', 'cliente']
+
+    def __init__(self, tamano_estrato=TAMANO_MUESTRA_ESTRATO):
+        self.tamano_estrato = tamano_estrato
+        self._rng = np.random.default_rng()
+        self._candado = threading.Lock()
+        self._candado_construccion = threading.Lock()
+        self._estado = None          # se construye en el primer pedido
+        self._pendientes = None      # ventas insertadas durante una reconstruccion
+        self._generacion = 0         # sube con cada invalidacion
+        self._desactualizado = False
+        self._reconstruyendo = False
+
+    # ------------------------------------------------------------------
+    # Construccion y actualizacion
+    # ------------------------------------------------------------------
+
+    def _estado_vacio(self):
+        return {
+            'muestra': None,     # DataFrame: columnas de la muestra + clave
+            'poblacion': {},     # estrato → ventas reales (N_h)
+            'tamanos': {},       # estrato → ventas en la muestra (n_h)
+            'umbral': {},        # estrato → clave maxima para entrar
+            'cuantiles': {},     # estrato → SketchCuantiles del total
+            'clientes': {},      # estrato → HyperLogLog
+            'productos': {},     # estrato → HyperLogLog
+            'marca': 0,          # id mas alto al empezar la lectura
+            'faltantes': set(),  # ids hasta la marca que la lectura no vio
+            'maximo': 0,         # id mas alto incluido (None si no se sabe)
+            'construido': time.monotonic(),
+        }
+
+    def _agregar(self, estado, ventas):
+        """Suma un bloque de ventas insertadas a la muestra y a los sketches."""
+        if 'precio_unitario' in ventas:
+            precio = ventas['precio_unitario'].to_numpy(dtype=float)
+        else:
+            # Las ventas que llegan desde los resumenes no traen el precio
+            precio = ventas['total'].to_numpy(dtype=float) / ventas['cantidad'].to_numpy(dtype=float)
+        nuevas = pd.DataFrame({
+            'fecha': pd.to_datetime(ventas['fecha']).to_numpy(),
+            'cantidad': ventas['cantidad'].to_numpy(dtype=float),
+            'precio_unitario': precio,
+            'total': ventas['total'].to_numpy(dtype=float),
+            'categoria': np.asarray(ventas['categoria'], dtype=object),
+            'region': np.asarray(ventas['region'], dtype=object),
+            'clave': self._rng.random(len(ventas)),
+        })
+
+        clientes = np.asarray(ventas['cliente'], dtype=object)
+        productos = np.asarray(ventas['producto'], dtype=object)
+        totales = nuevas['total'].to_numpy()
+        umbrales = np.ones(len(nuevas))
+        for estrato, filas in nuevas.groupby(self.ESTRATO).indices.items():
+            if estrato not in estado['poblacion']:
+                estado['poblacion'][estrato] = 0
+                estado['cuantiles'][estrato] = SketchCuantiles()
+                estado['clientes'][estrato] = HyperLogLog()
+                estado['productos'][estrato] = HyperLogLog()
+            estado['poblacion'][estrato] += len(filas)
+            estado['cuantiles'][estrato].agregar(totales[filas])
+            estado['clientes'][estrato].agregar(clientes[filas])
+            estado['productos'][estrato].agregar(productos[filas])
+            umbrales[filas] = estado['umbral'].get(estrato, 1.0)
+
+        # Reservorio: solo pueden entrar las ventas con clave menor al
+        # umbral de su estrato; de cada estrato quedan las de clave mas baja
+        candidatas = nuevas[nuevas['clave'].to_numpy() < umbrales]
+        if candidatas.empty:
+            return
+        if estado['muestra'] is not None:
+            candidatas = pd.concat([estado['muestra'], candidatas], ignore_index=True)
+        muestra = (candidatas.sort_values('clave')
+                   .groupby(self.ESTRATO, sort=False).head(self.tamano_estrato)
+                   .reset_index(drop=True))
+        claves = muestra.groupby(self.ESTRATO)['clave'].agg(['max', 'count'])
+        estado['tamanos'] = claves['count'].to_dict()
+        estado['umbral'] = {
+            estrato: maximo if cantidad >= self.tamano_estrato else 1.0
+            for estrato, maximo, cantidad in zip(claves.index, claves['max'], claves['count'])
+        }
+        # Se reemplaza (no se modifica): quien ya la leyo sigue con la anterior
+        estado['muestra'] = muestra
+
+    def _reconstruir(self):
+        """
+        Lee todas las ventas por bloques y reemplaza el estado (con
+        _candado_construccion tomado). Las ventas confirmadas mientras tanto
+        se guardan en _pendientes y se aplican al final.
+
+        La lectura llega solo hasta la marca (el id mas alto al empezar) y
+        recuerda los ids menores que no vio; de ahi en adelante solo se
+        aplican las ventas que la lectura no incluyo (ver ventas_no_leidas):
+        una venta que se confirma justo al empezar queda en una de las dos,
+        no en ambas.
+        """
+        with self._candado:
+            generacion = self._generacion
+            self._pendientes = []
+        marca = ultimo_id_venta()
+
+        estado = self._estado_vacio()
+        estado['marca'] = marca
+        columnas = self.COLUMNAS + ['id']
+        ids = []
+        for filas in bloques_de_filas(consulta_ventas({'hasta_id': marca}, columnas)):
+            bloque = pd.DataFrame(filas, columns=columnas)
+            ids.append(bloque['id'].to_numpy(dtype=np.int64))
+            self._agregar(estado, bloque)
+        ids = np.concatenate(ids) if ids else np.array([], dtype=np.int64)
+        estado['faltantes'] = ids_no_leidos(ids, marca)
+        estado['maximo'] = int(ids.max()) if len(ids) else 0
+
+        with self._candado:
+            for ventas in self._pendientes:
+                ventas = ventas_no_leidas(ventas, marca, estado['faltantes'])
+                if not ventas.empty:
+                    self._agregar(estado, ventas)
+                    self._anotar_maximo(estado, ventas)
+            self._pendientes = None
+            self._estado = estado
+            self._desactualizado = generacion != self._generacion
+
+    @staticmethod
+    def _anotar_maximo(estado, ventas):
+        """Actualiza el id mas alto incluido en el estado."""
+        if 'id' not in ventas:
+            estado['maximo'] = None     # no se sabe: se reconstruira
+        elif estado['maximo'] is not None:
+            estado['maximo'] = max(estado['maximo'], int(ventas['id'].max()))
+
+    def _vigente(self, estado, firma):
+        """
+        Si el estado describe las ventas de la base: otros procesos no pasan
+        por registrar(), asi que se compara con firma_ventas() y ademas el
+        estado vence a los CACHE_DATAFRAMES_TTL segundos.
+        """
+        poblacion = sum(estado['poblacion'].values())
+        return (firma == (estado['maximo'], poblacion)
+                and time.monotonic() - estado['construido'] <= CACHE_DATAFRAMES_TTL)
+
+    def _reconstruir_en_segundo_plano(self):
+        try:
+            while True:
+                with self._candado_construccion:
+                    self._reconstruir()
+                with self._candado:
+                    if not self._desactualizado:
+                        return
+        finally:
+            with self._candado:
+                self._reconstruyendo = False
+
+    def _estado_actual(self):
+        """
+        Estado para responder; lo construye si es el primer pedido. Si las
+        ventas cambiaron por fuera de este proceso se reconstruye en segundo
+        plano y mientras tanto se responde con el anterior.
+        """
+        firma = firma_ventas()
+        with self._candado:
+            estado = self._estado
+            if estado is not None and not self._desactualizado and not self._vigente(estado, firma):
+                self._generacion += 1
+                self._desactualizado = True
+            lanzar = estado is not None and self._desactualizado and not self._reconstruyendo
+            if lanzar:
+                self._reconstruyendo = True
+        if lanzar:
+            threading.Thread(target=self._reconstruir_en_segundo_plano,
+                             name='muestra-ventas', daemon=True).start()
+        if estado is None:
+            with self._candado_construccion:
+                if self._estado is None:
+                    self._reconstruir()
+                estado = self._estado
+        return estado
+
+    def precalentar(self):
+        """Construye la muestra en segundo plano (al iniciar el servidor)."""
+        threading.Thread(target=self._estado_actual, name='muestra-ventas', daemon=True).start()
+
+    def registrar(self, ventas, signo=1):
+        """
+        Aplica ventas confirmadas: insertadas (signo=1) o borradas (signo=-1).
+
+        Parametros:
+            ventas: DataFrame con fecha, producto, categoria, cantidad,
+                total, region y cliente
+        """
+        if signo < 0:
+            self.invalidar()
+            return
+        with self._candado:
+            if self._pendientes is not None:
+                self._pendientes.append(ventas)
+            if self._estado is not None:
+                # El commit pudo terminar antes de la ultima lectura completa
+                nuevas = ventas_no_leidas(ventas, self._estado['marca'], self._estado['faltantes'])
+                if not nuevas.empty:
+                    self._agregar(self._estado, nuevas)
+                    self._anotar_maximo(self._estado, nuevas)
+
+    def invalidar(self):
+        """Marca la muestra para reconstruirse (en segundo plano) desde la base."""
+        with self._candado:
+            self._generacion += 1
+            self._desactualizado = True
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _estratos_filtrados(self, estado, filtros):
+        return [
+            estrato for estrato in estado['poblacion']
+            if all(not filtros.get(campo) or valor == filtros[campo]
+                   for campo, valor in zip(self.ESTRATO, estrato))
+        ]
+
+    def muestra(self, filtros=None):
+        """
+        Ventas de la muestra que cumplen los filtros, con la columna 'peso':
+        cuantas ventas reales representa cada una (N_h / n_h de su estrato).
+        """
+        filtros = filtros or {}
+        estado = self._estado_actual()
+        with self._candado:
+            muestra = estado['muestra']
+            pesos = pd.Series({
+                estrato: estado['poblacion'][estrato] / estado['tamanos'][estrato]
+                for estrato in self._estratos_filtrados(estado, filtros)
+                if estado['tamanos'].get(estrato)
+            }, dtype=float, name='peso')
+        if muestra is None or pesos.empty:
+            return pd.DataFrame(columns=['fecha', 'cantidad', 'precio_unitario', 'total',
+                                         'categoria', 'region', 'peso'])
+
+        muestra = muestra.join(pesos, on=self.ESTRATO, how='inner')
+        inicio = _parsear_fecha(filtros.get('fecha_inicio'))
+        fin = _parsear_fecha(filtros.get('fecha_fin'))
+        if inicio:
+            muestra = muestra[muestra['fecha'] >= pd.Timestamp(inicio)]
+        if fin:
+            muestra = muestra[muestra['fecha'] < pd.Timestamp(fin + timedelta(days=1))]
+        return muestra
+
+    def sketches(self, filtros=None):
+        """
+        (SketchCuantiles del total, HyperLogLog de clientes, HyperLogLog de
+        productos) de los estratos filtrados. None si se filtra por fechas:
+        los sketches no guardan la fecha de cada venta.
+        """
+        filtros = filtros or {}
+        if _parsear_fecha(filtros.get('fecha_inicio')) or _parsear_fecha(filtros.get('fecha_fin')):
+            return None
+        estado = self._estado_actual()
+        cuantiles, clientes, productos = SketchCuantiles(), HyperLogLog(), HyperLogLog()
+        with self._candado:
+            for estrato in self._estratos_filtrados(estado, filtros):
+                cuantiles.combinar(estado['cuantiles'][estrato])
+                clientes.combinar(estado['clientes'][estrato])
+                productos.combinar(estado['productos'][estrato])
+        return cuantiles, clientes, productos
+
+
+motor_aproximado = MotorAproximado()
+
+
+def _cuantiles_ponderados(valores, pesos, probabilidades):
+    """Cuantiles de valores donde cada uno cuenta `peso` veces."""
+    orden = np.argsort(valores)
+    valores, acumulado = valores[orden], np.cumsum(pesos[orden])
+    rangos = np.clip(probabilidades, 0, 1) * acumulado[-1]
+    return valores[np.minimum(np.searchsorted(acumulado, rangos), len(valores) - 1)]
+
+
+def _cuantil_con_margen(valores, pesos, p=0.5):
+    """
+    Cuantil p ponderado y su margen al 95%.
+
+    Con n_ef = (Σw)² / Σw² ventas "efectivas", el cuantil real esta entre
+    los cuantiles p ± 1.96·sqrt(p(1-p) / n_ef) de la muestra.
+    """
+    n_efectivo = pesos.sum() ** 2 / np.sum(pesos ** 2)
+    delta = Z_95 * np.sqrt(p * (1 - p) / n_efectivo)
+    bajo, valor, alto = _cuantiles_ponderados(valores, pesos, [p - delta, p, p + delta])
+    return float(valor), float(max(valor - bajo, alto - valor))
+
+
+def _correlacion_con_margen(x, y, pesos):
+    """Correlacion ponderada y su margen al 95% (transformacion z de Fisher)."""
+    w = pesos / pesos.sum()
+    dx, dy = x - w @ x, y - w @ y
+    denominador = np.sqrt((w @ (dx * dx)) * (w @ (dy * dy)))
+    if denominador == 0:
+        return 0.0, 0.0
+    r = float(np.clip(w @ (dx * dy) / denominador, -1, 1))
+    n_efectivo = 1 / np.sum(w ** 2)
+    if n_efectivo <= 3 or abs(r) == 1:
+        return r, 0.0
+    z, error = np.arctanh(r), Z_95 / np.sqrt(n_efectivo - 3)
+    return r, float(max(r - np.tanh(z - error), np.tanh(z + error) - r))
+
+
+def _describir_ponderado(muestra, num_ventas):
+    """describe() de cantidad, precio_unitario y total estimado con la muestra."""
+    pesos = muestra['peso'].to_numpy(dtype=float)
+    descripcion = {}
+    for columna in ('cantidad', 'precio_unitario', 'total'):
+        valores = muestra[columna].to_numpy(dtype=float)
+        media = np.average(valores, weights=pesos)
+        q1, q2, q3 = _cuantiles_ponderados(valores, pesos, [0.25, 0.5, 0.75])
+        descripcion[columna] = {
+            'count': num_ventas,
+            'mean': round(float(media), 2),
+            'std': round(float(np.sqrt(np.average((valores - media) ** 2, weights=pesos))), 2),
+            'min': round(float(valores.min()), 2),
+            '25%': round(float(q1), 2),
+            '50%': round(float(q2), 2),
+            '75%': round(float(q3), 2),
+            'max': round(float(valores.max()), 2),
+        }
+    return descripcion
+
+
+def _por_grupo_aproximado(campo, filtros, muestra):
+    """
+    Resumen por categoria o region: sumas, promedios, desviaciones y
+    conteos exactos (resumenes); medianas estimadas con la muestra.
+    Retorna (resumen como en calcular_estadisticas, margen de cada mediana).
+    """
+    resumen = resumen_ventas(campo, filtros)
+    resumen = resumen[resumen['num_ventas'] > 0].sort_index()
+    muestras = {grupo: datos for grupo, datos in muestra.groupby(campo)}
+
+    grupos, margenes = {}, {}
+    for grupo, fila in resumen.iterrows():
+        n = fila['num_ventas']
+        media = fila['total'] / n
+        varianza = (fila['total_cuadrados'] - fila['total'] * media) / (n - 1) if n > 1 else np.nan
+        datos = muestras.get(grupo)
+        if datos is not None and len(datos):
+            mediana, margen = _cuantil_con_margen(datos['total'].to_numpy(dtype=float),
+                                                  datos['peso'].to_numpy(dtype=float))
+        else:
+            mediana, margen = np.nan, None
+        grupos[grupo] = {
+            'sum': round(fila['total'], 2),
+            'mean': round(media, 2),
+            'median': round(mediana, 2),
+            'std': round(float(np.sqrt(max(varianza, 0))), 2) if n > 1 else np.nan,
+            'count': int(n),
+        }
+        margenes[grupo] = None if margen is None else round(margen, 2)
+    return grupos, margenes
+
+
+@medido('calculos')
+def estadisticas_aproximadas(filtros=None):
+    """
+    Estadisticas de calcular_estadisticas() estimadas sin leer las ventas
+    filtradas (ver MODO APROXIMADO).
+
+    Retorna None si la muestra no alcanza para estimar (aun no hay ventas
+    en los estratos filtrados), o un diccionario con:
+    - estadisticas: mismas claves que calcular_estadisticas()
+    - ticket_mediana: mediana del total estimada
+    - clientes_distintos / productos_distintos: estimados (None si se
+      filtra por fechas)
+    - errores: margen al 95% (±) de cada valor estimado
+    - tamano_muestra: ventas de la muestra usadas
+    """
+    general = resumen_ventas(None, filtros).iloc[0]
+    num_ventas = int(general['num_ventas'])
+    muestra = motor_aproximado.muestra(filtros)
+    if num_ventas < 2 or len(muestra) < 2:
+        return None
+
+    totales = muestra['total'].to_numpy(dtype=float)
+    pesos = muestra['peso'].to_numpy(dtype=float)
+    errores = {}
+
+    sketches = motor_aproximado.sketches(filtros)
+    clientes = productos = None
+    if sketches:
+        cuantiles, hll_clientes, hll_productos = sketches
+        mediana = cuantiles.cuantil(0.5)
+        errores['ticket_mediana'] = mediana * cuantiles.error_relativo
+        clientes = round(hll_clientes.estimar())
+        productos = round(hll_productos.estimar())
+        errores['clientes_distintos'] = round(clientes * Z_95 * hll_clientes.error_relativo)
+        errores['productos_distintos'] = round(productos * Z_95 * hll_productos.error_relativo)
+    else:
+        mediana, errores['ticket_mediana'] = _cuantil_con_margen(totales, pesos)
+
+    correlacion, errores['correlacion_cantidad_total'] = _correlacion_con_margen(
+        muestra['cantidad'].to_numpy(dtype=float), totales, pesos)
+
+    # Desviacion y coeficiente de variacion exactos, desde los resumenes
+    media = general['total'] / num_ventas
+    desviacion = np.sqrt(max((general['total_cuadrados'] - general['total'] * media)
+                             / (num_ventas - 1), 0))
+
+    descripcion = _describir_ponderado(muestra, num_ventas)
+    descripcion['total'].update(mean=round(media, 2), std=round(desviacion, 2))
+
+    por_categoria, errores['por_categoria'] = _por_grupo_aproximado('categoria', filtros, muestra)
+    por_region, errores['por_region'] = _por_grupo_aproximado('region', filtros, muestra)
+
+    errores['ticket_mediana'] = round(errores['ticket_mediana'], 2)
+    errores['correlacion_cantidad_total'] = round(errores['correlacion_cantidad_total'], 4)
+    return {
+        'estadisticas': {
+            'descripcion': descripcion,
+            'correlacion_cantidad_total': round(correlacion, 4),
+            'desviacion_total': round(desviacion, 2),
+            'coeficiente_variacion': round(desviacion / media * 100, 2) if media != 0 else 0,
+            'por_categoria': por_categoria,
+            'por_region': por_region,
+        },
+        'ticket_mediana': mediana,
+        'clientes_distintos': clientes,
+        'productos_distintos': productos,
+        'errores': errores,
+        'tamano_muestra': len(muestra),
+    }
+
+
+# ============================================================================
+# PRONOSTICO VECTORIZADO (MUCHAS SERIES A LA VEZ)
+# ============================================================================
+# Para predecir las ventas de cada categoria, region o producto no se ajusta
+# una regresion por serie en un bucle: todas las series comparten los mismos
+# meses, asi que comparten la misma matriz de diseno X (meses × terminos) y
+# un solo np.linalg.lstsq resuelve todas las columnas de Y (meses × series):
+#
+#   Y ≈ X @ B      B = coeficientes (terminos × series)
+#
+# Terminos del modelo:
+# - 1 y t (mes 0, 1, 2, ...): la recta de la regresion lineal simple
+# - con estacionalidad: sen/cos del mes del año (ciclos de 12 y 6 meses),
+#   para capturar temporadas altas y bajas. Se necesitan al menos
+#   MESES_MINIMOS_ESTACIONALIDAD meses de historia; con menos se ignora.
+# ============================================================================
 
-    ventas = query.all()
-    db.close()
+MESES_MINIMOS_ESTACIONALIDAD = 24
+SEGMENTOS_PRONOSTICO = ('categoria', 'region', 'producto', 'cliente')
 
-    if not ventas:
-        return pd.DataFrame(columns=[
-            'fecha', 'producto', 'categoria', 'cantidad',
-            'precio_unitario', 'total', 'region', 'cliente'
-        ])
-
-    # Convertir lista de objetos SQLAlchemy a lista de diccionarios,
-    # luego a DataFrame. Esta es la forma estandar de hacerlo.
-    datos = [{
-        'fecha': v.fecha,
-        'producto': v.producto,
-        'categoria': v.categoria,
-        'cantidad': v.cantidad,
-        'precio_unitario': v.precio_unitario,
-        'total': v.total,
-        'region': v.region,
-        'cliente': v.cliente,
-    } for v in ventas]
-
-    df = pd.DataFrame(datos)
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    return df
 
+def _matriz_diseno(t, mes_del_anio, estacionalidad):
+    """Columnas del modelo para los meses t (y su mes del año 1-12)."""
+    columnas = [np.ones(len(t)), t]
+    if estacionalidad:
+        angulo = 2 * np.pi * mes_del_anio / 12
+        for armonico in (1, 2):
+            columnas += [np.sin(armonico * angulo), np.cos(armonico * angulo)]
+    return np.column_stack(columnas)
 
-def calcular_kpis(df):
-    """
-    Calcula los KPIs (Key Performance Indicators) principales.
 
-    Los KPIs son metricas clave que resumen el estado del negocio
-    de un vistazo. Son esenciales en cualquier dashboard.
+@medido('calculos')
+def pronosticar(matriz, meses_futuro=3, estacionalidad=False):
+    """
+    Ajusta por minimos cuadrados todas las series de una matriz a la vez.
 
-    Retorna un diccionario con:
-    - total_ventas: Suma de todos los totales
-    - num_transacciones: Cantidad de registros
-    - ticket_promedio: Promedio de total por transaccion (media)
-    - ticket_mediana: Mediana del total (menos afectada por extremos)
-    - producto_top: Producto con mas ventas totales
-    - categoria_top: Categoria con mas ventas totales
-    - region_top: Region con mas ventas totales
-    - cliente_top: Cliente que mas ha gastado
+    Parametros:
+        matriz: DataFrame (series × meses) con columnas Period mensuales
+            consecutivas (ver matriz_mensual); necesita al menos 2 meses
+        meses_futuro: Cantidad de meses a predecir
+        estacionalidad: Agregar terminos estacionales al modelo
+
+    Retorna un diccionario de arrays, con una fila por serie:
+    - series, meses, meses_futuro: etiquetas
+    - ajuste: valores del modelo en los meses historicos (series × meses)
+    - predicciones: valores predichos, minimo 0 (series × meses_futuro)
+    - r_cuadrado, pendiente, intercepto: una por serie
+    - estacionalidad: si se usaron los terminos estacionales
     """
-    if df.empty:
-        return {
-            'total_ventas': 0, 'num_transacciones': 0,
-            'ticket_promedio': 0, 'ticket_mediana': 0,
-            'producto_top': 'N/A', 'categoria_top': 'N/A',
-            'region_top': 'N/A', 'cliente_top': 'N/A',
-        }
+    meses = matriz.columns
+    n = len(meses)
+    futuros = pd.period_range(meses[-1] + 1, periods=meses_futuro, freq='M')
+    estacionalidad = estacionalidad and n >= MESES_MINIMOS_ESTACIONALIDAD
+
+    t = np.arange(n + meses_futuro, dtype=float)
+    mes_del_anio = np.concatenate([meses.month, futuros.month]).astype(float)
+    x = _matriz_diseno(t, mes_del_anio, estacionalidad)
+    x_historico, x_futuro = x[:n], x[n:]
+
+    y = matriz.to_numpy(dtype=float).T                    # meses × series
+    coeficientes = np.linalg.lstsq(x_historico, y, rcond=None)[0]
+    ajuste = x_historico @ coeficientes
+    predicciones = np.maximum(x_futuro @ coeficientes, 0)
+
+    # R² = 1 - (error del modelo / variacion total), por serie
+    ss_residuos = ((y - ajuste) ** 2).sum(axis=0)
+    ss_total = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+    r_cuadrado = 1 - np.divide(ss_residuos, ss_total,
+                               out=np.ones_like(ss_total), where=ss_total > 0)
 
     return {
-        'total_ventas': round(df['total'].sum(), 2),
-        'num_transacciones': len(df),
-        'ticket_promedio': round(df['total'].mean(), 2),
-        'ticket_mediana': round(df['total'].median(), 2),
-        'producto_top': df.groupby('producto')['total'].sum().idxmax(),
-        'categoria_top': df.groupby('categoria')['total'].sum().idxmax(),
-        'region_top': df.groupby('region')['total'].sum().idxmax(),
-        'cliente_top': df.groupby('cliente')['total'].sum().idxmax(),
+        'series': matriz.index,
+        'meses': meses,
+        'meses_futuro': futuros,
+        'ajuste': ajuste.T,
+        'predicciones': predicciones.T,
+        'r_cuadrado': r_cuadrado,
+        'pendiente': coeficientes[1],
+        'intercepto': coeficientes[0],
+        'estacionalidad': estacionalidad,
     }
 
 
-def calcular_estadisticas(df):
+def pronostico_por_segmento(segmento, filtros=None, meses_futuro=3,
+                            estacionalidad=False, top_n=None):
     """
-    Calcula estadisticas descriptivas completas.
+    Pronostico de cada categoria, region, producto o cliente.
 
-    Incluye:
-    - describe(): Resumen automatico (count, mean, std, min, 25%, 50%, 75%, max)
-    - Correlacion entre cantidad y total
-    - Desviacion estandar
-    - Coeficiente de variacion
+    Retorna un diccionario con los meses predichos y la lista de
+    segmentos (nombre, R², pendiente y predicciones), ordenada de mayor a
+    menor venta predicha y limitada a `top_n` si se indica.
     """
-    if df.empty:
-        return {
-            'descripcion': {},
-            'correlacion_cantidad_total': 0,
-            'desviacion_total': 0,
-            'coeficiente_variacion': 0,
-            'por_categoria': {},
-            'por_region': {},
-        }
-
-    desc = df[['cantidad', 'precio_unitario', 'total']].describe().round(2)
-
-    correlacion = df['cantidad'].corr(df['total'])
+    matriz = matriz_mensual(segmento, filtros)
+    if matriz.shape[1] < 2:
+        return {'meses_futuro': [], 'segmentos': [], 'estacionalidad': False}
 
-    por_cat = df.groupby('categoria')['total'].agg(['sum', 'mean', 'median', 'std', 'count']).round(2)
-    por_reg = df.groupby('region')['total'].agg(['sum', 'mean', 'median', 'std', 'count']).round(2)
+    resultado = pronosticar(matriz, meses_futuro, estacionalidad)
+    orden = np.argsort(-resultado['predicciones'].sum(axis=1), kind='stable')[:top_n]
+    predicciones = resultado['predicciones'][orden].round(2)
+    r_cuadrado = resultado['r_cuadrado'][orden].round(4)
+    pendiente = resultado['pendiente'][orden].round(2)
 
     return {
-        'descripcion': desc.to_dict(),
-        'correlacion_cantidad_total': round(correlacion, 4),
-        'desviacion_total': round(df['total'].std(), 2),
-        'coeficiente_variacion': round(df['total'].std() / df['total'].mean() * 100, 2) if df['total'].mean() != 0 else 0,
-        'por_categoria': por_cat.to_dict('index'),
-        'por_region': por_reg.to_dict('index'),
+        'meses_futuro': [str(mes) for mes in resultado['meses_futuro']],
+        'segmentos': [
+            {'nombre': str(nombre), 'r_cuadrado': float(r2), 'pendiente': float(m),
+             'predicciones': fila.tolist()}
+            for nombre, r2, m, fila in zip(resultado['series'][orden], r_cuadrado,
+                                           pendiente, predicciones)
+        ],
+        'estacionalidad': resultado['estacionalidad'],
     }
 
 
-def calcular_prediccion(df, meses_futuro=3):
+@medido('calculos')
+def calcular_prediccion(mensual, meses_futuro=3, estacionalidad=False):
     """
     Realiza regresion lineal simple para predecir ventas futuras.
 
+    Parametros:
+        mensual: Serie con el total de ventas por mes (ver ventas_mensuales)
+        meses_futuro: Cantidad de meses a predecir
+        estacionalidad: Agregar terminos estacionales (ver pronosticar)
+
     Regresion lineal: y = slope * x + intercept
     - slope (pendiente): cuanto cambian las ventas por cada unidad de tiempo
     - intercept (intercepto): valor base de las ventas
-    - r_value: coeficiente de correlacion (-1 a 1)
-    - r_value**2 (R²): coeficiente de determinacion (0 a 1)
-      Indica que porcentaje de la variacion es explicada por el modelo
+    - R² (coeficiente de determinacion, 0 a 1): que porcentaje de la
+      variacion es explicada por el modelo
+
+    Es el caso de una sola serie de pronosticar().
 
     Retorna:
     - datos historicos mensuales
     - predicciones para los proximos meses
     - metricas del modelo (R², pendiente, etc.)
     """
-    if df.empty or len(df) < 3:
+    if mensual.empty:
         return {
             'historico': [],
             'predicciones': [],
@@ -525,13 +2670,9 @@ def calcular_prediccion(df, meses_futuro=3):
             'pendiente': 0,
             'intercepto': 0,
             'tendencia': 'sin datos',
+            'estacionalidad': False,
         }
 
-    # Agrupar ventas por mes
-    df_temp = df.copy()
-    df_temp['mes'] = df_temp['fecha'].dt.to_period('M')
-    mensual = df_temp.groupby('mes')['total'].sum()
-
     if len(mensual) < 2:
         return {
             'historico': [],
@@ -540,38 +2681,24 @@ def calcular_prediccion(df, meses_futuro=3):
             'pendiente': 0,
             'intercepto': 0,
             'tendencia': 'insuficientes datos',
+            'estacionalidad': False,
         }
 
-    # Preparar datos para regresion
-    # x = numeros consecutivos (0, 1, 2, ..., n-1)
-    # y = total de ventas por mes
-    x = np.arange(len(mensual))
-    y = mensual.values.astype(float)
-
-    # scipy.stats.linregress() calcula la regresion lineal
-    slope, intercept, r_value, p_value, std_err = linregress(x, y)
+    # Una matriz de una sola fila: la serie mensual
+    resultado = pronosticar(mensual.to_frame().T, meses_futuro, estacionalidad)
+    slope = float(resultado['pendiente'][0])
 
     # Datos historicos para el grafico
-    historico = []
-    for i, (periodo, valor) in enumerate(mensual.items()):
-        historico.append({
-            'mes': str(periodo),
-            'real': round(valor, 2),
-            'modelo': round(slope * i + intercept, 2),
-        })
+    historico = [
+        {'mes': str(periodo), 'real': round(float(real), 2), 'modelo': round(float(modelo), 2)}
+        for periodo, real, modelo in zip(mensual.index, mensual.values, resultado['ajuste'][0])
+    ]
 
     # Predicciones futuras
-    predicciones = []
-    ultimo_periodo = mensual.index[-1]
-    for j in range(1, meses_futuro + 1):
-        idx = len(mensual) + j - 1
-        valor_pred = slope * idx + intercept
-        # Calcular el mes futuro
-        mes_futuro = ultimo_periodo + j
-        predicciones.append({
-            'mes': str(mes_futuro),
-            'prediccion': round(max(valor_pred, 0), 2),
-        })
+    predicciones = [
+        {'mes': str(mes), 'prediccion': round(float(valor), 2)}
+        for mes, valor in zip(resultado['meses_futuro'], resultado['predicciones'][0])
+    ]
 
     # Determinar tendencia
     if slope > 50:
@@ -586,10 +2713,11 @@ def calcular_prediccion(df, meses_futuro=3):
     return {
         'historico': historico,
         'predicciones': predicciones,
-        'r_cuadrado': round(r_value ** 2, 4),
+        'r_cuadrado': round(float(resultado['r_cuadrado'][0]), 4),
         'pendiente': round(slope, 2),
-        'intercepto': round(intercept, 2),
+        'intercepto': round(float(resultado['intercepto'][0]), 2),
         'tendencia': tendencia,
+        'estacionalidad': resultado['estacionalidad'],
     }
 
 
@@ -597,6 +2725,7 @@ def calcular_prediccion(df, meses_futuro=3):
 # FUNCIONES DE GENERACION DE GRAFICOS
 # ============================================================================
 # Cada funcion genera un grafico con matplotlib y lo devuelve como bytes PNG.
+# Reciben los datos ya agregados (Series de ventas_mensuales / totales_por).
 #
 # Patron comun:
 # 1. Crear figura: fig, ax = plt.subplots()
@@ -612,15 +2741,12 @@ COLORES = ['#6366f1', '#8b5cf6', '#a78bfa', '#c4b5fd', '#ddd6fe',
            '#818cf8', '#6d28d9', '#7c3aed', '#5b21b6', '#4c1d95']
 
 
-def generar_grafico_ventas_mensual(df):
+@medido('graficos')
+def generar_grafico_ventas_mensual(mensual):
     """Grafico de lineas: evolucion de ventas mensuales."""
-    if df.empty:
+    if mensual.empty:
         return _grafico_vacio('Sin datos de ventas mensuales')
 
-    df_temp = df.copy()
-    df_temp['mes'] = df_temp['fecha'].dt.to_period('M')
-    mensual = df_temp.groupby('mes')['total'].sum()
-
     fig, ax = plt.subplots(figsize=(10, 5))
 
     x_labels = [str(p) for p in mensual.index]
@@ -644,12 +2770,13 @@ def generar_grafico_ventas_mensual(df):
     return _fig_a_bytes(fig)
 
 
-def generar_grafico_por_categoria(df):
+@medido('graficos')
+def generar_grafico_por_categoria(por_categoria):
     """Grafico de barras: ventas totales por categoria."""
-    if df.empty:
+    if por_categoria.empty:
         return _grafico_vacio('Sin datos por categoria')
 
-    por_cat = df.groupby('categoria')['total'].sum().sort_values(ascending=True)
+    por_cat = por_categoria.sort_values(ascending=True)
 
     fig, ax = plt.subplots(figsize=(8, 5))
 
@@ -671,13 +2798,12 @@ def generar_grafico_por_categoria(df):
     return _fig_a_bytes(fig)
 
 
-def generar_grafico_por_region(df):
+@medido('graficos')
+def generar_grafico_por_region(por_region):
     """Grafico de pastel: distribucion de ventas por region."""
-    if df.empty:
+    if por_region.empty:
         return _grafico_vacio('Sin datos por region')
 
-    por_region = df.groupby('region')['total'].sum()
-
     fig, ax = plt.subplots(figsize=(7, 5))
 
     wedges, texts, autotexts = ax.pie(
@@ -700,12 +2826,13 @@ def generar_grafico_por_region(df):
     return _fig_a_bytes(fig)
 
 
-def generar_grafico_top_productos(df, top_n=10):
+@medido('graficos')
+def generar_grafico_top_productos(por_producto, top_n=10):
     """Grafico de barras: top N productos mas vendidos."""
-    if df.empty:
+    if por_producto.empty:
         return _grafico_vacio('Sin datos de productos')
 
-    top = df.groupby('producto')['total'].sum().nlargest(top_n).sort_values()
+    top = por_producto.nlargest(top_n).sort_values()
 
     fig, ax = plt.subplots(figsize=(9, 5))
 
@@ -726,12 +2853,13 @@ def generar_grafico_top_productos(df, top_n=10):
     return _fig_a_bytes(fig)
 
 
-def generar_grafico_top_clientes(df, top_n=10):
+@medido('graficos')
+def generar_grafico_top_clientes(por_cliente, top_n=10):
     """Grafico de barras: top N clientes por gasto total."""
-    if df.empty:
+    if por_cliente.empty:
         return _grafico_vacio('Sin datos de clientes')
 
-    top = df.groupby('cliente')['total'].sum().nlargest(top_n).sort_values()
+    top = por_cliente.nlargest(top_n).sort_values()
 
     fig, ax = plt.subplots(figsize=(9, 5))
 
@@ -752,9 +2880,10 @@ def generar_grafico_top_clientes(df, top_n=10):
     return _fig_a_bytes(fig)
 
 
-def generar_grafico_prediccion(df, meses_futuro=3):
+@medido('graficos')
+def generar_grafico_prediccion(mensual, meses_futuro=3, estacionalidad=False):
     """Grafico de lineas: historico + prediccion con regresion lineal."""
-    pred = calcular_prediccion(df, meses_futuro)
+    pred = calcular_prediccion(mensual, meses_futuro, estacionalidad)
 
     if not pred['historico']:
         return _grafico_vacio('Datos insuficientes para prediccion')
@@ -809,6 +2938,73 @@ def generar_grafico_prediccion(df, meses_futuro=3):
     return _fig_a_bytes(fig)
 
 
+# ----------------------------------------------------------------------------
+# Cache de graficos renderizados
+# ----------------------------------------------------------------------------
+# Renderizar un grafico cuesta 100-300 ms de CPU. Los PNG se guardan en una
+# cache LRU por (tipo de grafico, filtros, parametros) que se invalida con la
+# version de ds_ventas, igual que la cache de DataFrames.
+#
+# Cada respuesta lleva:
+# - ETag: hash del contenido del PNG
+# - Last-Modified: cuando se renderizo
+# - Cache-Control: private, no-cache → el navegador guarda la imagen pero
+#   pregunta antes de usarla. Si no cambio, el servidor responde
+#   304 Not Modified sin cuerpo.
+#
+# Mientras la entrada de la cache esta vigente, el 304 sale sin renderizar.
+# Una entrada vencida se renderiza de nuevo antes de comparar: el
+# vencimiento es lo unico que detecta los cambios de otros procesos (ver
+# CACHE DE DATAFRAMES). Si el grafico salio igual, la respuesta sigue
+# siendo 304.
+#   Es 'private' porque los graficos requieren sesion iniciada.
+# ----------------------------------------------------------------------------
+
+CACHE_GRAFICOS_MB = int(os.environ.get('VENTAS_CACHE_GRAFICOS_MB', 64))
+
+cache_graficos = CacheLRU(
+    CACHE_GRAFICOS_MB * 1024 * 1024,
+    CACHE_DATAFRAMES_TTL,
+    medir=lambda grafico: len(grafico[0]),
+)
+
+
+def responder_grafico(tipo, filtros, generar, *parametros):
+    """
+    Responde un grafico PNG desde la cache, con ETag y Last-Modified.
+
+    Parametros:
+        tipo: Nombre del grafico (parte de la clave de cache)
+        filtros: Filtros aplicados a los datos del grafico
+        generar: Funcion sin argumentos que retorna los bytes del PNG
+        parametros: Otros valores que cambian el grafico (ej: meses)
+    """
+    clave = (tipo, normalizar_filtros(filtros), parametros)
+    return _respuesta_cacheada(clave, generar, 'image/png')
+
+
+def _respuesta_cacheada(clave, generar, mimetype):
+    """Respuesta con el contenido cacheado en cache_graficos, ETag y 304."""
+    def renderizar():
+        contenido = generar()
+        return contenido, hashlib.sha1(contenido).hexdigest(), datetime.utcnow()
+
+    # La entrada vigente trae su ETag: no se renderiza nada para compararla
+    contenido, etag, fecha = cache_graficos.obtener(clave, renderizar)
+
+    respuesta = Response(mimetype=mimetype)
+    respuesta.set_etag(etag)
+    respuesta.last_modified = fecha
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = True
+    if not is_resource_modified(request.environ, etag=etag, last_modified=fecha):
+        respuesta.status_code = 304
+        return respuesta
+
+    respuesta.set_data(contenido)
+    return respuesta
+
+
 def _fig_a_bytes(fig):
     """Convierte una figura matplotlib a bytes PNG."""
     buf = BytesIO()
@@ -831,6 +3027,330 @@ def _grafico_vacio(mensaje):
     return _fig_a_bytes(fig)
 
 
+# ============================================================================
+# RENDERIZADO DE GRAFICOS EN PROCESOS
+# ============================================================================
+# matplotlib usa CPU en codigo Python y no libera el GIL: con hilos, los
+# graficos de varias peticiones se dibujan de a uno aunque haya varios
+# nucleos. Por eso los graficos se renderizan en un pool de procesos
+# (ProcessPoolExecutor), cada uno con su propio interprete y su propio GIL.
+#
+# - Los procesos se crean una sola vez y quedan "calientes": al iniciar
+#   importan este modulo (matplotlib con backend Agg) y dibujan una figura
+#   de prueba, asi el primer grafico real no paga la carga de fuentes.
+# - A los procesos solo viajan los datos agregados (Series pequenas) y
+#   vuelven los bytes del PNG.
+# - renderizar_graficos() envia un lote de graficos y espera todos: los
+#   graficos de un reporte se dibujan en paralelo.
+#
+# VENTAS_PROCESOS_GRAFICOS=0 desactiva el pool (se dibuja en el mismo hilo).
+# ============================================================================
+
+PROCESOS_GRAFICOS = int(os.environ.get('VENTAS_PROCESOS_GRAFICOS',
+                                       min(4, os.cpu_count() or 1)))
+
+GENERADORES_GRAFICOS = {
+    'mensual': generar_grafico_ventas_mensual,
+    'categoria': generar_grafico_por_categoria,
+    'region': generar_grafico_por_region,
+    'top_productos': generar_grafico_top_productos,
+    'top_clientes': generar_grafico_top_clientes,
+    'prediccion': generar_grafico_prediccion,
+}
+
+_pool_graficos = None
+_candado_pool_graficos = threading.Lock()
+
+
+def _iniciar_proceso_graficos():
+    """Inicializador de cada proceso del pool: calienta matplotlib."""
+    _grafico_vacio('Calentando')
+
+
+def _renderizar(tipo, argumentos):
+    """Dibuja un grafico (se ejecuta dentro del proceso del pool)."""
+    return GENERADORES_GRAFICOS[tipo](*argumentos)
+
+
+def pool_graficos():
+    """
+    Pool de procesos para graficos. Se crea al primer uso, asi importar
+    este modulo (por ejemplo, desde los mismos procesos) no lanza procesos.
+
+    Se usa 'spawn' en todos los sistemas: los procesos arrancan limpios en
+    lugar de copiar (fork) un servidor que ya tiene hilos y conexiones.
+    """
+    global _pool_graficos
+    with _candado_pool_graficos:
+        if _pool_graficos is None:
+            _pool_graficos = ProcessPoolExecutor(
+                max_workers=PROCESOS_GRAFICOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_iniciar_proceso_graficos,
+            )
+        return _pool_graficos
+
+
+@medido('graficos')
+def renderizar_graficos(trabajos):
+    """
+    Renderiza un lote de graficos en paralelo.
+
+    Parametros:
+        trabajos: Lista de (tipo, argumentos), ej: [('mensual', (serie,))]
+
+    Retorna:
+        Lista con los bytes PNG de cada grafico, en el mismo orden
+    """
+    global _pool_graficos
+    trabajos = [(tipo, tuple(argumentos)) for tipo, argumentos in trabajos]
+
+    if PROCESOS_GRAFICOS > 0:
+        pool = pool_graficos()
+        try:
+            futuros = [pool.submit(_renderizar, tipo, argumentos) for tipo, argumentos in trabajos]
+            return [futuro.result() for futuro in futuros]
+        except BrokenProcessPool:
+            # Un proceso murio (ej: sin memoria). Se descarta el pool, el
+            # proximo lote crea uno nuevo, y este lote se dibuja aqui.
+            print('[ERROR] El pool de graficos se detuvo; se crea uno nuevo.')
+            with _candado_pool_graficos:
+                if _pool_graficos is pool:
+                    _pool_graficos = None
+            pool.shutdown(wait=False)
+
+    return [_renderizar(tipo, argumentos) for tipo, argumentos in trabajos]
+
+
+def renderizar_grafico(tipo, *argumentos):
+    """Renderiza un solo grafico en el pool de procesos."""
+    return renderizar_graficos([(tipo, argumentos)])[0]
+
+
+# ============================================================================
+# REPORTES EN SEGUNDO PLANO
+# ============================================================================
+# Un reporte (KPIs + estadisticas + graficos) puede tardar varios segundos
+# con muchas ventas. generar_reporte() solo guarda el Reporte y encola un
+# trabajo en un pool de hilos local. El trabajo calcula todo una vez y lo
+# guarda en un archivo JSON (snapshot) cuyo nombre queda en
+# Reporte.ruta_archivo, con los graficos como PNG en base64.
+#
+# Abrir un reporte es leer ese archivo: los datos quedan "congelados" al
+# momento de generarlo, como un reporte impreso.
+#
+# Estados de un trabajo: pendiente → procesando → listo | error
+# El estado se consulta en /reportes/<id>/estado (JSON).
+# ============================================================================
+
+CARPETA_REPORTES = os.environ.get('VENTAS_CARPETA_REPORTES',
+                                  os.path.join(BASE_DIR, 'reportes_generados'))
+TRABAJADORES_REPORTES = int(os.environ.get('VENTAS_TRABAJADORES_REPORTES', 2))
+
+pool_reportes = ThreadPoolExecutor(max_workers=TRABAJADORES_REPORTES,
+                                   thread_name_prefix='reporte')
+
+# id del reporte → {'estado': ..., 'error': ...} (solo trabajos de este proceso)
+_trabajos_reportes = {}
+_candado_trabajos = threading.Lock()
+
+
+def _a_json(valor):
+    """Convierte los tipos de numpy/pandas que json no sabe guardar."""
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (datetime, pd.Timestamp)):
+        return valor.isoformat()
+    raise TypeError(f'{type(valor).__name__} no se puede guardar en JSON')
+
+
+def _graficos_reporte(tipo, filtros):
+    """Renderiza los graficos del reporte como lista de {titulo, png (base64)}."""
+    mensual = ventas_mensuales(filtros)
+    graficos = [
+        ('Ventas Mensuales', ('mensual', (mensual,))),
+        ('Por Categoria', ('categoria', (totales_por('categoria', filtros),))),
+        ('Distribucion por Region', ('region', (totales_por('region', filtros),))),
+        ('Top Productos', ('top_productos', (totales_por('producto', filtros),))),
+    ]
+    if tipo == 'prediccion':
+        graficos.append(('Prediccion de Ventas', ('prediccion', (mensual,))))
+
+    # Todos los graficos del reporte en un solo lote
+    pngs = renderizar_graficos([trabajo for _, trabajo in graficos])
+    return [{'titulo': titulo, 'png': base64.b64encode(png).decode('ascii')}
+            for (titulo, _), png in zip(graficos, pngs)]
+
+
+def construir_snapshot(reporte_id, tipo, filtros):
+    """
+    Calcula KPIs, estadisticas y graficos del reporte y los guarda en
+    CARPETA_REPORTES. Retorna el nombre del archivo.
+
+    Se escribe en un archivo temporal y luego se renombra, asi nunca
+    queda un snapshot a medio escribir.
+    """
+    df = obtener_dataframe(filtros, columnas=['cantidad', 'precio_unitario', 'total',
+                                              'categoria', 'region'])
+    snapshot = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'filtros': filtros or {},
+        'kpis': calcular_kpis(filtros),
+        'estadisticas': calcular_estadisticas(df),
+        'graficos': _graficos_reporte(tipo, filtros),
+    }
+
+    os.makedirs(CARPETA_REPORTES, exist_ok=True)
+    nombre = f'reporte_{reporte_id}.json'
+    ruta = os.path.join(CARPETA_REPORTES, nombre)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, default=_a_json)
+    os.replace(ruta + '.tmp', ruta)
+    return nombre
+
+
+def _marcar_trabajo(reporte_id, estado, error=''):
+    with _candado_trabajos:
+        _trabajos_reportes[reporte_id] = {'estado': estado, 'error': error}
+
+
+def _ejecutar_trabajo_reporte(reporte_id, tipo, filtros):
+    """Trabajo del pool: construye el snapshot y lo asocia al Reporte."""
+    _marcar_trabajo(reporte_id, 'procesando')
+    try:
+        nombre = construir_snapshot(reporte_id, tipo, filtros)
+        db = Session()
+        try:
+            db.query(Reporte).filter_by(id=reporte_id).update({'ruta_archivo': nombre})
+            db.commit()
+        finally:
+            db.close()
+        _marcar_trabajo(reporte_id, 'listo')
+    except Exception as e:
+        print(f'[ERROR] No se pudo generar el reporte {reporte_id}: {e}')
+        _marcar_trabajo(reporte_id, 'error', str(e))
+
+
+def encolar_reporte(reporte):
+    """Encola la generacion del snapshot, salvo que ya este en curso."""
+    with _candado_trabajos:
+        trabajo = _trabajos_reportes.get(reporte.id)
+        if trabajo and trabajo['estado'] in ('pendiente', 'procesando'):
+            return
+        _trabajos_reportes[reporte.id] = {'estado': 'pendiente', 'error': ''}
+    pool_reportes.submit(_ejecutar_trabajo_reporte, reporte.id, reporte.tipo,
+                         reporte.parametros or None)
+
+
+def ruta_snapshot(reporte):
+    """Ruta completa del snapshot del reporte ('' si no tiene)."""
+    if not reporte.ruta_archivo:
+        return ''
+    return os.path.join(CARPETA_REPORTES, reporte.ruta_archivo)
+
+
+def estado_reporte(reporte):
+    """
+    Estado del snapshot de un reporte.
+
+    'listo' si el archivo existe; si no, el del trabajo en este proceso, o
+    'sin_snapshot' (reportes anteriores, o trabajos perdidos al reiniciar).
+    """
+    ruta = ruta_snapshot(reporte)
+    if ruta and os.path.exists(ruta):
+        return {'estado': 'listo', 'error': ''}
+    with _candado_trabajos:
+        trabajo = _trabajos_reportes.get(reporte.id)
+    return dict(trabajo) if trabajo else {'estado': 'sin_snapshot', 'error': ''}
+
+
+def leer_snapshot(reporte):
+    """Lee el snapshot JSON de un reporte."""
+    with open(ruta_snapshot(reporte), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ----------------------------------------------------------------------------
+# Valores exactos del analisis en segundo plano
+# ----------------------------------------------------------------------------
+# En modo aproximado, /analisis/filtros responde con la estimacion y encola
+# el calculo exacto en el pool de reportes. La pagina consulta
+# /analisis/filtros/estado y ofrece los valores exactos cuando estan
+# listos; abrirlos entonces no vuelve a calcular nada.
+#
+# En modo exacto se calculan en la misma peticion y se guardan igual, asi
+# cambiar de pagina de la tabla tampoco los recalcula.
+# ----------------------------------------------------------------------------
+
+COLUMNAS_ESTADISTICAS = ['cantidad', 'precio_unitario', 'total', 'categoria', 'region']
+MAX_RESULTADOS_EXACTOS = 32
+
+# (filtros normalizados, version de los datos) → Future con (kpis, estadisticas)
+_resultados_exactos = OrderedDict()
+_candado_exactos = threading.Lock()
+
+
+def calcular_analisis_exacto(filtros=None):
+    """KPIs y estadisticas exactos de /analisis/filtros."""
+    kpis = calcular_kpis(filtros)
+    estadisticas = calcular_estadisticas(obtener_dataframe(filtros, columnas=COLUMNAS_ESTADISTICAS))
+    return kpis, estadisticas
+
+
+def resultado_exacto(filtros=None, encolar=True):
+    """
+    Future del calculo exacto para estos filtros y la version actual de
+    los datos. Con encolar=True lo encola si aun no existe; si no,
+    retorna None.
+    """
+    clave = (normalizar_filtros(filtros), version_ventas())
+    with _candado_exactos:
+        futuro = _resultados_exactos.get(clave)
+        if futuro is not None:
+            _resultados_exactos.move_to_end(clave)
+        elif encolar:
+            futuro = pool_reportes.submit(calcular_analisis_exacto, filtros)
+            _guardar_resultado_exacto(clave, futuro)
+        return futuro
+
+
+def _guardar_resultado_exacto(clave, futuro):
+    """Guarda el Future y descarta los mas viejos (con _candado_exactos tomado)."""
+    _resultados_exactos[clave] = futuro
+    _resultados_exactos.move_to_end(clave)
+    while len(_resultados_exactos) > MAX_RESULTADOS_EXACTOS:
+        _resultados_exactos.popitem(last=False)
+
+
+def analisis_exacto(filtros=None):
+    """
+    (kpis, estadisticas) exactos para estos filtros y la version actual de
+    los datos. Si ya estan calculados (o calculandose) se esperan; si no,
+    se calculan en este hilo y quedan guardados como un Future terminado.
+
+    Un calculo que seguia en la cola del pool se cancela y se hace aqui:
+    la peticion no espera detras de los reportes.
+    """
+    clave = (normalizar_filtros(filtros), version_ventas())
+    with _candado_exactos:
+        futuro = _resultados_exactos.get(clave)
+        propio = (futuro is None or futuro.cancel()
+                  or (futuro.done() and futuro.exception() is not None))
+        if propio:
+            futuro = Future()
+            futuro.set_running_or_notify_cancel()
+            _guardar_resultado_exacto(clave, futuro)
+        else:
+            _resultados_exactos.move_to_end(clave)
+
+    if propio:
+        try:
+            futuro.set_result(calcular_analisis_exacto(filtros))
+        except Exception as error:
+            futuro.set_exception(error)
+    return futuro.result()
+
+
 # ============================================================================
 # RUTAS - AUTENTICACION
 # ============================================================================
@@ -920,20 +3440,17 @@ def index():
     2. Graficos embebidos como <img src="/chart/...">
     3. Resumen rapido de datos
     """
-    df = obtener_dataframe()
-    kpis = calcular_kpis(df)
+    kpis = calcular_kpis()
 
     # Obtener lista de categorias y regiones para los filtros rapidos
-    db = Session()
-    categorias = [r[0] for r in db.query(Venta.categoria).distinct().all()]
-    regiones = [r[0] for r in db.query(Venta.region).distinct().all()]
-    db.close()
+    categorias = valores_distintos('categoria')
+    regiones = valores_distintos('region')
 
     return render_template('index.html',
                            kpis=kpis,
                            categorias=categorias,
                            regiones=regiones,
-                           total_registros=len(df))
+                           total_registros=kpis['num_transacciones'])
 
 
 # ============================================================================
@@ -943,6 +3460,8 @@ def index():
 # En los templates se usan como: <img src="/chart/mensual">
 #
 # El header Content-Type: image/png le dice al navegador que es una imagen.
+# responder_grafico() guarda los PNG en cache y maneja ETag / 304.
+# Los datos se agregan aqui y el dibujo se hace en el pool de procesos.
 # ============================================================================
 
 @app.route('/chart/mensual')
@@ -950,9 +3469,8 @@ def index():
 def chart_mensual():
     """Grafico de ventas mensuales."""
     filtros = _extraer_filtros_query()
-    df = obtener_dataframe(filtros)
-    png = generar_grafico_ventas_mensual(df)
-    return Response(png, mimetype='image/png')
+    return responder_grafico('mensual', filtros,
+                             lambda: renderizar_grafico('mensual', ventas_mensuales(filtros)))
 
 
 @app.route('/chart/categoria')
@@ -960,9 +3478,8 @@ def chart_mensual():
 def chart_categoria():
     """Grafico de ventas por categoria."""
     filtros = _extraer_filtros_query()
-    df = obtener_dataframe(filtros)
-    png = generar_grafico_por_categoria(df)
-    return Response(png, mimetype='image/png')
+    return responder_grafico('categoria', filtros,
+                             lambda: renderizar_grafico('categoria', totales_por('categoria', filtros)))
 
 
 @app.route('/chart/region')
@@ -970,9 +3487,8 @@ def chart_categoria():
 def chart_region():
     """Grafico de ventas por region."""
     filtros = _extraer_filtros_query()
-    df = obtener_dataframe(filtros)
-    png = generar_grafico_por_region(df)
-    return Response(png, mimetype='image/png')
+    return responder_grafico('region', filtros,
+                             lambda: renderizar_grafico('region', totales_por('region', filtros)))
 
 
 @app.route('/chart/top_productos')
@@ -980,9 +3496,8 @@ def chart_region():
 def chart_top_productos():
     """Grafico de top productos."""
     filtros = _extraer_filtros_query()
-    df = obtener_dataframe(filtros)
-    png = generar_grafico_top_productos(df)
-    return Response(png, mimetype='image/png')
+    return responder_grafico('top_productos', filtros,
+                             lambda: renderizar_grafico('top_productos', totales_por('producto', filtros)))
 
 
 @app.route('/chart/top_clientes')
@@ -990,9 +3505,8 @@ def chart_top_productos():
 def chart_top_clientes():
     """Grafico de top clientes."""
     filtros = _extraer_filtros_query()
-    df = obtener_dataframe(filtros)
-    png = generar_grafico_top_clientes(df)
-    return Response(png, mimetype='image/png')
+    return responder_grafico('top_clientes', filtros,
+                             lambda: renderizar_grafico('top_clientes', totales_por('cliente', filtros)))
 
 
 @app.route('/chart/prediccion')
@@ -1000,9 +3514,155 @@ def chart_top_clientes():
 def chart_prediccion():
     """Grafico de prediccion."""
     meses = request.args.get('meses', 3, type=int)
-    df = obtener_dataframe()
-    png = generar_grafico_prediccion(df, meses)
-    return Response(png, mimetype='image/png')
+    estacionalidad = request.args.get('estacionalidad') == '1'
+    return responder_grafico('prediccion', None,
+                             lambda: renderizar_grafico('prediccion', ventas_mensuales(), meses,
+                                                        estacionalidad),
+                             meses, estacionalidad)
+
+
+# ============================================================================
+# API - DATOS DE GRAFICOS (JSON)
+# ============================================================================
+# Alternativa a los PNG: /api/graficos/<tipo> devuelve solo las series
+# agregadas y el navegador dibuja el grafico (static/js/graficos.js, SVG).
+# El servidor se ahorra matplotlib y la respuesta pesa unos pocos KB en
+# lugar de decenas o cientos de KB de PNG.
+#
+# Formato compacto (sin espacios), una lista por eje:
+#   {"tipo": "barras", "titulo": "...", "etiquetas": [...], "valores": [...]}
+#   {"tipo": "lineas", "titulo": "...", "etiquetas": [...],
+#    "series": [{"nombre": "...", "valores": [...]}, ...]}
+#
+# Usa la misma cache, ETag y 304 que los PNG (ver responder_grafico).
+# Parametros: los filtros de siempre, ?top=N (top_productos / top_clientes)
+# y ?meses=N / ?estacionalidad=1 (prediccion).
+# ============================================================================
+
+def _redondear(valores):
+    """Lista de floats con 2 decimales; None para los huecos (NaN)."""
+    return [None if pd.isna(v) else round(float(v), 2) for v in valores]
+
+
+def datos_grafico_barras(tipo, titulo, serie):
+    """Datos de un grafico de barras o de pastel a partir de una Serie."""
+    return {
+        'tipo': tipo,
+        'titulo': titulo,
+        'etiquetas': [str(etiqueta) for etiqueta in serie.index],
+        'valores': _redondear(serie.values),
+    }
+
+
+def datos_grafico_mensual(mensual):
+    """Datos del grafico de ventas mensuales."""
+    return {
+        'tipo': 'lineas',
+        'titulo': 'Ventas Mensuales',
+        'etiquetas': [str(periodo) for periodo in mensual.index],
+        'series': [{'nombre': 'Ventas', 'valores': _redondear(mensual.values)}],
+    }
+
+
+def datos_grafico_prediccion(mensual, meses_futuro=3, estacionalidad=False):
+    """
+    Datos del grafico de prediccion: ventas reales, linea del modelo y
+    prediccion. Cada serie tiene un valor por etiqueta (None donde no
+    aplica); la prediccion arranca en el ultimo mes real para que la
+    linea quede unida.
+    """
+    pred = calcular_prediccion(mensual, meses_futuro, estacionalidad)
+    historico, futuro = pred['historico'], pred['predicciones']
+    vacios_futuro = [None] * len(futuro)
+    prediccion = [None] * len(historico) + [p['prediccion'] for p in futuro]
+    if historico:
+        prediccion[len(historico) - 1] = historico[-1]['real']
+
+    return {
+        'tipo': 'lineas',
+        'titulo': 'Historico + Prediccion',
+        'etiquetas': [h['mes'] for h in historico] + [p['mes'] for p in futuro],
+        'series': [
+            {'nombre': 'Ventas reales', 'valores': [h['real'] for h in historico] + vacios_futuro},
+            {'nombre': 'Modelo', 'valores': [h['modelo'] for h in historico] + vacios_futuro,
+             'discontinua': True},
+            {'nombre': 'Prediccion', 'valores': prediccion, 'discontinua': True},
+        ],
+        'r_cuadrado': pred['r_cuadrado'],
+        'tendencia': pred['tendencia'],
+    }
+
+
+def _parametro_entero(nombre, defecto, minimo, maximo):
+    """Lee un entero de la query string, limitado a [minimo, maximo]."""
+    return min(max(request.args.get(nombre, defecto, type=int), minimo), maximo)
+
+
+@app.route('/api/graficos/<tipo>')
+@login_requerido
+def api_grafico(tipo):
+    """Series agregadas de un grafico del dashboard, en JSON."""
+    filtros = _extraer_filtros_query()
+    top = _parametro_entero('top', 10, 1, 50)
+    meses = _parametro_entero('meses', 3, 1, 12)
+    estacionalidad = request.args.get('estacionalidad') == '1'
+
+    generadores = {
+        'mensual': lambda: datos_grafico_mensual(ventas_mensuales(filtros)),
+        'categoria': lambda: datos_grafico_barras(
+            'barras', 'Ventas por Categoria',
+            totales_por('categoria', filtros).sort_values(ascending=False)),
+        'region': lambda: datos_grafico_barras(
+            'pastel', 'Distribucion por Region', totales_por('region', filtros)),
+        'top_productos': lambda: datos_grafico_barras(
+            'barras', f'Top {top} Productos por Ventas', totales_por('producto', filtros).nlargest(top)),
+        'top_clientes': lambda: datos_grafico_barras(
+            'barras', f'Top {top} Clientes por Gasto', totales_por('cliente', filtros).nlargest(top)),
+        # Como /chart/prediccion, la prediccion usa todas las ventas
+        'prediccion': lambda: datos_grafico_prediccion(ventas_mensuales(), meses, estacionalidad),
+    }
+    if tipo not in generadores:
+        return jsonify({'error': f'Grafico desconocido: {tipo}'}), 404
+
+    # Solo los parametros que cambian el resultado forman parte de la clave
+    parametros = {'top_productos': (top,), 'top_clientes': (top,),
+                  'prediccion': (meses, estacionalidad)}
+    if tipo == 'prediccion':
+        filtros = None
+
+    def generar():
+        datos = generadores[tipo]()
+        return json.dumps(datos, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    clave = ('json', tipo, normalizar_filtros(filtros), parametros.get(tipo, ()))
+    return _respuesta_cacheada(clave, generar, 'application/json')
+
+
+@app.route('/api/prediccion/<segmento>')
+@login_requerido
+def api_prediccion_segmentos(segmento):
+    """
+    Pronostico de cada categoria, region, producto o cliente (JSON).
+
+    Parametros: los filtros de siempre, ?meses=N, ?estacionalidad=1 y
+    ?top=N (segmentos con mayor venta predicha, por defecto 50).
+    """
+    if segmento not in SEGMENTOS_PRONOSTICO:
+        return jsonify({'error': f'Segmento desconocido: {segmento}'}), 404
+
+    filtros = _extraer_filtros_query()
+    meses = _parametro_entero('meses', 3, 1, 12)
+    top = _parametro_entero('top', 50, 1, 1000)
+    estacionalidad = request.args.get('estacionalidad') == '1'
+
+    def generar():
+        datos = pronostico_por_segmento(segmento, filtros, meses, estacionalidad, top)
+        datos['segmento'] = segmento
+        return json.dumps(datos, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    clave = ('json', 'prediccion_' + segmento, normalizar_filtros(filtros),
+             (meses, top, estacionalidad))
+    return _respuesta_cacheada(clave, generar, 'application/json')
 
 
 def _extraer_filtros_query():
@@ -1030,17 +3690,25 @@ def analisis_filtros():
     Pagina de filtros avanzados.
     Permite al usuario filtrar datos por fecha, categoria y region,
     y ver los resultados con estadisticas y graficos filtrados.
+
+    Con aproximado=1 las estadisticas se estiman (ver MODO APROXIMADO).
     """
-    db = Session()
-    categorias = [r[0] for r in db.query(Venta.categoria).distinct().all()]
-    regiones = [r[0] for r in db.query(Venta.region).distinct().all()]
-    db.close()
+    categorias = valores_distintos('categoria')
+    regiones = valores_distintos('region')
 
     filtros = {}
-    resultados = None
+    pagina = None
+    parametros_tabla = {}
     kpis = None
     estadisticas = None
+    aproximacion = None
+    url_exacto = None
     query_params = ''
+    aproximado = request.values.get('aproximado') == '1'
+    orden = request.args.get('orden', 'fecha')
+    if orden not in COLUMNAS_VENTAS:
+        orden = 'fecha'
+    descendente = request.args.get('dir', 'desc') != 'asc'
 
     if request.method == 'POST' or request.args.get('aplicar'):
         # Obtener filtros del formulario o query string
@@ -1062,9 +3730,24 @@ def analisis_filtros():
         # Limpiar filtros vacios
         filtros_limpios = {k: v for k, v in filtros.items() if v}
 
-        df = obtener_dataframe(filtros_limpios if filtros_limpios else None)
-        kpis = calcular_kpis(df)
-        estadisticas = calcular_estadisticas(df)
+        # Modo aproximado: estimacion al instante y el calculo exacto en
+        # segundo plano. Si las ventas filtradas son pocas o la muestra no
+        # alcanza, se calcula exacto (es igual de rapido).
+        if aproximado and int(resumen_ventas(None, filtros_limpios or None).iloc[0]['num_ventas']) \
+                > motor_aproximado.tamano_estrato:
+            aproximacion = estadisticas_aproximadas(filtros_limpios or None)
+
+        if aproximacion:
+            kpis = calcular_kpis(filtros_limpios or None, mediana=aproximacion['ticket_mediana'])
+            estadisticas = aproximacion['estadisticas']
+            resultado_exacto(filtros_limpios or None)
+            url_exacto = url_for('analisis_filtros', aplicar=1, **filtros_limpios)
+        else:
+            # KPIs (incluye el total de filas, desde los resumenes) y
+            # estadisticas: se guardan por filtros y version de los datos,
+            # asi cambiar de pagina no vuelve a calcularlos. Si el calculo
+            # exacto ya se hizo (o se esta haciendo) en segundo plano, se usa.
+            kpis, estadisticas = analisis_exacto(filtros_limpios or None)
 
         # Construir query params para los graficos
         params = []
@@ -1073,48 +3756,151 @@ def analisis_filtros():
                 params.append(f'{k}={v}')
         query_params = '&'.join(params)
 
-        # Primeras 50 filas como tabla
-        if not df.empty:
-            resultados = df.head(50).to_dict('records')
-            for r in resultados:
-                r['fecha'] = r['fecha'].strftime('%d/%m/%Y')
-                r['total'] = f"${r['total']:,.2f}"
-                r['precio_unitario'] = f"${r['precio_unitario']:,.2f}"
+        # Tabla: una pagina leida con SQL (paginacion por clave)
+        pagina = pagina_ventas(filtros_limpios or None, orden, descendente,
+                               despues=request.args.get('despues'),
+                               antes=request.args.get('antes'))
+        # Parametros de los enlaces de orden y paginacion (GET)
+        parametros_tabla = dict(filtros_limpios, aplicar=1)
+        if aproximado:
+            parametros_tabla['aproximado'] = 1
 
     return render_template('analisis/filtros.html',
                            categorias=categorias,
                            regiones=regiones,
                            filtros=filtros,
-                           resultados=resultados,
+                           resultados=pagina['filas'] if pagina else None,
+                           pagina=pagina,
+                           parametros_tabla=parametros_tabla,
+                           orden=orden,
+                           descendente=descendente,
                            kpis=kpis,
                            estadisticas=estadisticas,
+                           aproximado=aproximado,
+                           aproximacion=aproximacion,
+                           url_exacto=url_exacto,
                            query_params=query_params)
 
 
+@app.route('/analisis/filtros/estado')
+@login_requerido
+def analisis_filtros_estado():
+    """Indica (JSON) si los valores exactos de estos filtros ya se calcularon."""
+    futuro = resultado_exacto(_extraer_filtros_query(), encolar=False)
+    listo = futuro is not None and futuro.done() and futuro.exception() is None
+    return jsonify({'listo': listo})
+
+
 @app.route('/analisis/prediccion')
 @login_requerido
 def analisis_prediccion():
     """
     Pagina de prediccion de ventas usando regresion lineal.
-    Muestra el grafico de prediccion y las metricas del modelo.
+    Muestra el grafico de prediccion, las metricas del modelo y el
+    pronostico de cada segmento (categoria, region, ...).
     """
     meses = request.args.get('meses', 3, type=int)
     if meses < 1:
         meses = 1
     if meses > 12:
         meses = 12
+    estacionalidad = request.args.get('estacionalidad') == '1'
+    segmento = request.args.get('segmento', 'categoria')
+    if segmento not in SEGMENTOS_PRONOSTICO:
+        segmento = 'categoria'
 
-    df = obtener_dataframe()
-    prediccion = calcular_prediccion(df, meses)
+    prediccion = calcular_prediccion(ventas_mensuales(), meses, estacionalidad)
+    por_segmento = pronostico_por_segmento(segmento, None, meses, estacionalidad, top_n=20)
 
     return render_template('analisis/prediccion.html',
                            prediccion=prediccion,
+                           por_segmento=por_segmento,
+                           segmento=segmento,
+                           segmentos=SEGMENTOS_PRONOSTICO,
+                           estacionalidad=estacionalidad,
                            meses=meses)
 
 
 # ============================================================================
 # RUTAS - EXPORTAR CSV
 # ============================================================================
+# La exportacion se envia en streaming: las ventas se leen de la base por
+# bloques y cada bloque se escribe y se envia antes de leer el siguiente,
+# asi la memoria usada no depende de la cantidad de filas.
+#
+# Parametros de la URL (ademas de los filtros):
+#   ?gzip=1             → CSV comprimido (.csv.gz)
+#   ?formato=parquet    → Parquet (requiere pyarrow)
+#   ?formato=feather    → Feather / Arrow (requiere pyarrow)
+# ============================================================================
+
+def generar_csv(filtros=None):
+    """Generador de texto CSV, un trozo por bloque de filas."""
+    salida = StringIO()
+    escritor = csv.writer(salida, lineterminator='\n')
+    escritor.writerow(COLUMNAS_VENTAS)
+    for filas in bloques_de_filas(consulta_ventas(filtros)):
+        # fecha es la primera columna de COLUMNAS_VENTAS
+        escritor.writerows((fila[0].strftime('%Y-%m-%d'),) + tuple(fila[1:]) for fila in filas)
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate(0)
+    if salida.tell():
+        yield salida.getvalue()
+
+
+def comprimir_gzip(trozos):
+    """Comprime en formato gzip un flujo de trozos de texto, sin juntarlos."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+ → gzip
+    for trozo in trozos:
+        datos = compresor.compress(trozo.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def exportar_arrow(filtros, formato):
+    """
+    Escribe las ventas en Parquet o Feather bloque a bloque en un archivo
+    temporal y retorna un generador que lo envia por partes.
+
+    Lanza ImportError si pyarrow no esta instalado (es opcional).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([
+        ('fecha', pa.timestamp('us')),
+        ('producto', pa.string()),
+        ('categoria', pa.string()),
+        ('cantidad', pa.int64()),
+        ('precio_unitario', pa.float64()),
+        ('total', pa.float64()),
+        ('region', pa.string()),
+        ('cliente', pa.string()),
+    ])
+
+    archivo = tempfile.TemporaryFile()
+    if formato == 'parquet':
+        escritor = pq.ParquetWriter(archivo, esquema)
+    else:
+        escritor = pa.ipc.new_file(archivo, esquema)
+    for filas in bloques_de_filas(consulta_ventas(filtros)):
+        columnas = {nombre: list(valores) for nombre, valores in zip(COLUMNAS_VENTAS, zip(*filas))}
+        escritor.write_table(pa.Table.from_pydict(columnas, schema=esquema))
+    escritor.close()
+
+    def enviar():
+        with archivo:
+            archivo.seek(0)
+            while True:
+                datos = archivo.read(1024 * 1024)
+                if not datos:
+                    break
+                yield datos
+
+    return enviar()
+
 
 @app.route('/exportar/csv')
 @login_requerido
@@ -1122,30 +3908,42 @@ def exportar_csv():
     """
     Exporta datos de ventas a un archivo CSV descargable.
 
-    Usa pandas DataFrame.to_csv() para generar el contenido CSV.
-    Los headers HTTP Content-Disposition y Content-Type le dicen
-    al navegador que debe descargar el archivo.
+    El archivo se genera y se envia por partes (streaming) con un
+    generador. Los headers HTTP Content-Disposition y Content-Type le
+    dicen al navegador que debe descargar el archivo.
     """
     filtros = _extraer_filtros_query()
-    df = obtener_dataframe(filtros)
 
-    if df.empty:
+    with engine.connect() as conexion:
+        hay_datos = conexion.execute(consulta_ventas(filtros, ['id']).limit(1)).first()
+    if not hay_datos:
         flash('No hay datos para exportar.', 'warning')
         return redirect(url_for('analisis_filtros'))
 
-    # Formatear fecha para el CSV
-    df_export = df.copy()
-    df_export['fecha'] = df_export['fecha'].dt.strftime('%Y-%m-%d')
-
-    # Generar CSV en memoria
-    csv_content = df_export.to_csv(index=False)
-
-    # Crear respuesta con headers de descarga
-    response = make_response(csv_content)
-    response.headers['Content-Type'] = 'text/csv; charset=utf-8'
     fecha_hoy = datetime.now().strftime('%Y%m%d_%H%M%S')
-    response.headers['Content-Disposition'] = f'attachment; filename=ventas_{fecha_hoy}.csv'
+    formato = request.args.get('formato', 'csv')
+
+    if formato in ('parquet', 'feather'):
+        try:
+            contenido = exportar_arrow(filtros, formato)
+        except ImportError:
+            flash(f'Para exportar en formato {formato} instala pyarrow (pip install pyarrow).', 'warning')
+            return redirect(url_for('analisis_filtros'))
+        tipo = ('application/vnd.apache.parquet' if formato == 'parquet'
+                else 'application/vnd.apache.arrow.file')
+        nombre = f'ventas_{fecha_hoy}.{formato}'
+    elif request.args.get('gzip'):
+        contenido = comprimir_gzip(generar_csv(filtros))
+        tipo = 'application/gzip'
+        nombre = f'ventas_{fecha_hoy}.csv.gz'
+    else:
+        contenido = (trozo.encode('utf-8') for trozo in generar_csv(filtros))
+        tipo = 'text/csv; charset=utf-8'
+        nombre = f'ventas_{fecha_hoy}.csv'
 
+    # Response con un generador: Flask envia cada trozo apenas se produce
+    response = Response(stream_with_context(contenido), content_type=tipo)
+    response.headers['Content-Disposition'] = f'attachment; filename={nombre}'
     return response
 
 
@@ -1175,26 +3973,51 @@ def reporte_detalle(id):
         flash('Reporte no encontrado.', 'danger')
         return redirect(url_for('reportes_lista'))
 
-    # Recalcular datos del reporte
-    filtros = reporte.parametros
-    df = obtener_dataframe(filtros if filtros else None)
-    kpis = calcular_kpis(df)
-    estadisticas = calcular_estadisticas(df)
-
-    # Construir query params para graficos
+    # Construir query params para exportar con los mismos filtros
     params = []
-    for k, v in (filtros or {}).items():
+    for k, v in (reporte.parametros or {}).items():
         if v:
             params.append(f'{k}={v}')
     query_params = '&'.join(params)
 
+    estado = estado_reporte(reporte)
+    if estado['estado'] == 'sin_snapshot':
+        encolar_reporte(reporte)
+        estado = estado_reporte(reporte)
+
+    if estado['estado'] != 'listo':
+        # La pagina consulta /reportes/<id>/estado y se recarga al terminar
+        return render_template('reportes/detalle.html',
+                               reporte=reporte,
+                               estado=estado,
+                               query_params=query_params)
+
+    # Los datos salen del snapshot, sin recalcular nada
+    snapshot = leer_snapshot(reporte)
     return render_template('reportes/detalle.html',
                            reporte=reporte,
-                           kpis=kpis,
-                           estadisticas=estadisticas,
+                           estado=estado,
+                           kpis=snapshot['kpis'],
+                           estadisticas=snapshot['estadisticas'],
+                           graficos=snapshot['graficos'],
                            query_params=query_params)
 
 
+@app.route('/reportes/<int:id>/estado')
+@login_requerido
+def reporte_estado(id):
+    """Estado de la generacion del reporte (JSON)."""
+    db = Session()
+    reporte = db.query(Reporte).get(id)
+    db.close()
+
+    if not reporte:
+        return jsonify({'error': 'Reporte no encontrado'}), 404
+
+    estado = estado_reporte(reporte)
+    return jsonify({'id': id, **estado})
+
+
 @app.route('/reportes/generar', methods=['POST'])
 @login_requerido
 def generar_reporte():
@@ -1223,12 +4046,24 @@ def generar_reporte():
     db.add(reporte)
     db.commit()
     reporte_id = reporte.id
+    encolar_reporte(reporte)
     db.close()
 
-    flash(f'Reporte "{titulo}" generado exitosamente.', 'success')
+    flash(f'Reporte "{titulo}" guardado. Se esta generando en segundo plano.', 'success')
     return redirect(url_for('reporte_detalle', id=reporte_id))
 
 
+# ============================================================================
+# RUTAS - ADMINISTRACION
+# ============================================================================
+
+@app.route('/admin/tiempos')
+@admin_requerido
+def admin_tiempos():
+    """Tiempos de respuesta por ruta y por tramo (JSON, ver resumen_tiempos)."""
+    return jsonify(resumen_tiempos())
+
+
 # ============================================================================
 # RUTA - ERROR 404
 # ============================================================================
@@ -1254,6 +4089,8 @@ def error_interno(e):
 if __name__ == '__main__':
     # Generar datos de ejemplo en la primera ejecucion
     generar_datos_ejemplo()
+    asegurar_resumenes()
+    motor_aproximado.precalentar()
 
     print('=' * 60)
     print('  DASHBOARD DE ANALISIS DE VENTAS')
@@ -0,0 +1,159 @@
+# ============================================================================
+# BENCHMARK: FUNCIONES DE ANALISIS A DISTINTAS ESCALAS
+# ============================================================================
+# Mide latencia y memoria pico de las funciones del dashboard con 10 mil,
+# 100 mil, 1 millon y 5 millones de ventas sinteticas:
+#
+#   obtener_dataframe, calcular_kpis (sin y con filtros),
+#   calcular_estadisticas, calcular_prediccion y cada generar_grafico_*
+#
+# Cada tamano se mide en un proceso aparte con su propia base SQLite
+# temporal (app lee la URL de la base al importarse), y se limpian las
+# caches antes de cada medicion. Los resultados se guardan en JSON para
+# comparar entre versiones y detectar regresiones.
+#
+# COMO EJECUTAR:
+#   python benchmark_analisis.py                              # 10k a 5M
+#   python benchmark_analisis.py -t 10000 100000 -r 5 -o antes.json
+# ============================================================================
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+TAMANOS = [10_000, 100_000, 1_000_000, 5_000_000]
+
+
+def operaciones(app):
+    """Funciones a medir: nombre → funcion sin argumentos."""
+    filtro = {'categoria': 'Electronica'}
+
+    def estadisticas():
+        return app.calcular_estadisticas(app.obtener_dataframe())
+
+    def grafico(generar, datos):
+        # Los datos agregados se calculan fuera: solo se mide el dibujo
+        valores = datos()
+        return lambda: generar(valores)
+
+    return {
+        'obtener_dataframe': app.obtener_dataframe,
+        'calcular_kpis': app.calcular_kpis,
+        'calcular_kpis_filtrado': lambda: app.calcular_kpis(filtro),
+        'calcular_estadisticas': estadisticas,
+        'calcular_prediccion': lambda: app.calcular_prediccion(app.ventas_mensuales()),
+        'generar_grafico_ventas_mensual': grafico(app.generar_grafico_ventas_mensual,
+                                                  app.ventas_mensuales),
+        'generar_grafico_por_categoria': grafico(app.generar_grafico_por_categoria,
+                                                 lambda: app.totales_por('categoria')),
+        'generar_grafico_por_region': grafico(app.generar_grafico_por_region,
+                                              lambda: app.totales_por('region')),
+        'generar_grafico_top_productos': grafico(app.generar_grafico_top_productos,
+                                                 lambda: app.totales_por('producto')),
+        'generar_grafico_top_clientes': grafico(app.generar_grafico_top_clientes,
+                                                lambda: app.totales_por('cliente')),
+        'generar_grafico_prediccion': grafico(app.generar_grafico_prediccion,
+                                              app.ventas_mensuales),
+    }
+
+
+def limpiar_caches(app):
+    """Cada medicion parte sin resultados previos en memoria."""
+    app.cache_dataframes.limpiar()
+    app.cache_graficos.limpiar()
+    app.motor_kpis.invalidar()
+
+
+def medir(app, funcion, repeticiones):
+    """Mediana de segundos y memoria pico (MB, de la repeticion mas alta)."""
+    tiempos, picos = [], []
+    for _ in range(repeticiones):
+        limpiar_caches(app)
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'segundos': round(statistics.median(tiempos), 4),
+        'segundos_min': round(min(tiempos), 4),
+        'pico_mb': round(max(picos) / 2**20, 2),
+    }
+
+
+def medir_tamano(filas, repeticiones, sesgo):
+    """Mide todas las operaciones con `filas` ventas (en este proceso)."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.environ['VENTAS_DATABASE_URL'] = f"sqlite:///{os.path.join(carpeta, 'benchmark.db')}"
+        import app
+
+        inicio = time.perf_counter()
+        app.generar_ventas_masivas(filas, sesgo=sesgo)
+        resultado = {'generacion_segundos': round(time.perf_counter() - inicio, 2),
+                     'operaciones': {}}
+
+        for nombre, funcion in operaciones(app).items():
+            resultado['operaciones'][nombre] = medir(app, funcion, repeticiones)
+        app.engine.dispose()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las funciones de analisis')
+    parser.add_argument('-t', '--tamanos', type=int, nargs='+', default=TAMANOS,
+                        help='Cantidades de ventas a medir (por defecto 10k 100k 1M 5M)')
+    parser.add_argument('-r', '--repeticiones', type=int, default=3,
+                        help='Repeticiones por operacion (por defecto 3)')
+    parser.add_argument('--sesgo', type=float, default=1.0,
+                        help='Sesgo de los datos sinteticos (ver generar_datos.py)')
+    parser.add_argument('-o', '--salida', default='benchmark_resultados.json',
+                        help='Archivo JSON de resultados')
+    parser.add_argument('--un-tamano', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.un_tamano:
+        # Proceso hijo: imprime el resultado de un tamano como JSON
+        print(json.dumps(medir_tamano(args.un_tamano, args.repeticiones, args.sesgo)))
+        return
+
+    resultados = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'sesgo': args.sesgo,
+        'tamanos': {},
+    }
+    for filas in args.tamanos:
+        print(f'Midiendo con {filas:,} ventas...', flush=True)
+        proceso = subprocess.run(
+            [sys.executable, __file__, '--un-tamano', str(filas),
+             '-r', str(args.repeticiones), '--sesgo', str(args.sesgo)],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        # La ultima linea es el JSON (antes puede haber mensajes de app)
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        resultados['tamanos'][str(filas)] = resultado
+
+        print(f"  generacion: {resultado['generacion_segundos']:.1f} s")
+        for nombre, medicion in resultado['operaciones'].items():
+            print(f"  {nombre:<32} {medicion['segundos'] * 1000:>10.1f} ms"
+                  f"   pico {medicion['pico_mb']:>8.1f} MB")
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2)
+    print(f'\nResultados guardados en {args.salida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# ============================================================================
+# BENCHMARK: CARGA DE VENTAS A DATAFRAME
+# ============================================================================
+# Compara la carga anterior de obtener_dataframe (objetos ORM -> lista de
+# diccionarios -> DataFrame) con la carga por columnas actual, cargar_dataframe
+# (SELECT de columnas + fetchmany + arrays tipados y Categorical).
+#
+# Crea una base SQLite temporal con N ventas sinteticas, asi que no toca
+# ventas.db.
+#
+# COMO EJECUTAR:
+#   python benchmark_carga.py                 # 100.000 filas
+#   python benchmark_carga.py -n 1000000      # 1 millon de filas
+# ============================================================================
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+
+def preparar_base(ruta, filas):
+    """Crea la base temporal y la llena con `filas` ventas sinteticas."""
+    # La URL se define antes de importar app para que use la base temporal
+    os.environ['VENTAS_DATABASE_URL'] = f'sqlite:///{ruta}'
+    import app
+
+    app.generar_ventas_masivas(filas, num_clientes=500)
+    return app
+
+
+def cargar_con_orm(app):
+    """Carga anterior: query.all() y un diccionario por venta."""
+    import pandas as pd
+
+    db = app.Session()
+    ventas = db.query(app.Venta).all()
+    db.close()
+    datos = [{
+        'fecha': v.fecha,
+        'producto': v.producto,
+        'categoria': v.categoria,
+        'cantidad': v.cantidad,
+        'precio_unitario': v.precio_unitario,
+        'total': v.total,
+        'region': v.region,
+        'cliente': v.cliente,
+    } for v in ventas]
+    df = pd.DataFrame(datos)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+def medir(nombre, funcion):
+    """Ejecuta la funcion midiendo tiempo, memoria pico y tamano del DataFrame."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    df = funcion()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tamano = df.memory_usage(deep=True).sum()
+    print(f'  {nombre:<22} {segundos:>8.2f} s   pico {pico / 2**20:>8.1f} MB'
+          f'   DataFrame {tamano / 2**20:>7.1f} MB')
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga de ventas')
+    parser.add_argument('-n', '--filas', type=int, default=100_000,
+                        help='Cantidad de ventas sinteticas (por defecto 100000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f'Generando {args.filas:,} ventas...')
+        app = preparar_base(os.path.join(carpeta, 'benchmark.db'), args.filas)
+
+        print('\nResultados:')
+        df_orm = medir('ORM + diccionarios', lambda: cargar_con_orm(app))
+        df_columnas = medir('Columnas + fetchmany', app.cargar_dataframe)
+
+        # Ambas cargas deben producir los mismos datos
+        assert len(df_orm) == len(df_columnas)
+        assert abs(df_orm['total'].sum() - df_columnas['total'].sum()) < 1e-6 * len(df_orm)
+        app.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
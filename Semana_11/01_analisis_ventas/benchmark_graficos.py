@@ -0,0 +1,100 @@
+# ============================================================================
+# BENCHMARK: RENDERIZADO DE GRAFICOS SECUENCIAL VS POOL DE PROCESOS
+# ============================================================================
+# Simula varios usuarios concurrentes abriendo el dashboard. Cada vista
+# dibuja los seis graficos (mensual, categoria, region, top productos,
+# top clientes y prediccion) de dos formas:
+#
+# - secuencial: cada usuario (un hilo) dibuja sus graficos de a uno en el
+#   proceso del servidor; los hilos compiten por el GIL.
+# - pool: cada usuario envia sus graficos en un lote a renderizar_graficos()
+#   y los procesos del pool los dibujan en paralelo.
+#
+# Los datos agregados se calculan una vez antes de medir, asi solo se mide
+# el dibujo. Usa una base SQLite temporal (ver benchmark_carga.py).
+#
+# COMO EJECUTAR:
+#   python benchmark_graficos.py                     # 8 usuarios, 3 vistas c/u
+#   python benchmark_graficos.py -u 16 -v 5 -p 8     # 16 usuarios, 8 procesos
+# ============================================================================
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def trabajos_dashboard(app):
+    """Los seis graficos de una vista del dashboard, con sus datos."""
+    mensual = app.ventas_mensuales()
+    return [
+        ('mensual', (mensual,)),
+        ('categoria', (app.totales_por('categoria'),)),
+        ('region', (app.totales_por('region'),)),
+        ('top_productos', (app.totales_por('producto'),)),
+        ('top_clientes', (app.totales_por('cliente'),)),
+        ('prediccion', (mensual,)),
+    ]
+
+
+def medir(nombre, vista, usuarios, vistas):
+    """Ejecuta `vistas` vistas por usuario con `usuarios` hilos concurrentes."""
+    def usuario(_):
+        latencias = []
+        for _ in range(vistas):
+            inicio = time.perf_counter()
+            vista()
+            latencias.append(time.perf_counter() - inicio)
+        return latencias
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=usuarios) as hilos:
+        latencias = [l for lista in hilos.map(usuario, range(usuarios)) for l in lista]
+    segundos = time.perf_counter() - inicio
+
+    latencias.sort()
+    p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+    print(f'  {nombre:<12} mediana {statistics.median(latencias) * 1000:>8.0f} ms'
+          f'   p95 {p95 * 1000:>8.0f} ms'
+          f'   {len(latencias) / segundos:>6.2f} vistas/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de renderizado de graficos')
+    parser.add_argument('-n', '--filas', type=int, default=100_000,
+                        help='Cantidad de ventas sinteticas (por defecto 100000)')
+    parser.add_argument('-u', '--usuarios', type=int, default=8,
+                        help='Usuarios concurrentes (por defecto 8)')
+    parser.add_argument('-v', '--vistas', type=int, default=3,
+                        help='Vistas del dashboard por usuario (por defecto 3)')
+    parser.add_argument('-p', '--procesos', type=int, default=os.cpu_count() or 1,
+                        help='Procesos del pool de graficos (por defecto, uno por nucleo)')
+    args = parser.parse_args()
+
+    # Debe definirse antes de importar app (lo lee al importarse)
+    os.environ['VENTAS_PROCESOS_GRAFICOS'] = str(args.procesos)
+    from benchmark_carga import preparar_base
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f'Generando {args.filas:,} ventas...')
+        app = preparar_base(os.path.join(carpeta, 'benchmark.db'), args.filas)
+        trabajos = trabajos_dashboard(app)
+
+        # Arrancar los procesos antes de medir (quedan calientes)
+        app.renderizar_graficos(trabajos)
+
+        print(f'\n{args.usuarios} usuarios x {args.vistas} vistas, '
+              f'{len(trabajos)} graficos por vista, pool de {args.procesos} procesos:')
+        medir('secuencial',
+              lambda: [app._renderizar(tipo, argumentos) for tipo, argumentos in trabajos],
+              args.usuarios, args.vistas)
+        medir('pool', lambda: app.renderizar_graficos(trabajos), args.usuarios, args.vistas)
+
+        app.pool_graficos().shutdown()
+        app.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
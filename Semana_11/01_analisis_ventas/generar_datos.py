@@ -0,0 +1,48 @@
+# ============================================================================
+# GENERADOR DE VENTAS SINTETICAS A GRAN ESCALA
+# ============================================================================
+# Llena la base de datos con millones de ventas realistas usando inserts
+# masivos (ver generar_ventas_masivas en app.py). Sirve para probar el
+# dashboard con volumenes grandes.
+#
+# Por defecto usa ventas.db; con --base se elige otra base (igual que la
+# variable de entorno VENTAS_DATABASE_URL).
+#
+# COMO EJECUTAR:
+#   python generar_datos.py -n 1000000
+#   python generar_datos.py -n 5000000 --sesgo 1.3 --base sqlite:///grande.db
+# ============================================================================
+
+import argparse
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera ventas sinteticas masivas')
+    parser.add_argument('-n', '--filas', type=int, default=1_000_000,
+                        help='Cantidad de ventas a generar (por defecto 1000000)')
+    parser.add_argument('--semilla', type=int, default=42,
+                        help='Semilla aleatoria (por defecto 42)')
+    parser.add_argument('--sesgo', type=float, default=1.0,
+                        help='Concentracion de ventas en pocos productos/clientes (0 = uniforme)')
+    parser.add_argument('--clientes', type=int, default=5_000,
+                        help='Cantidad de clientes distintos (por defecto 5000)')
+    parser.add_argument('--base', help='URL de la base de datos (SQLAlchemy)')
+    args = parser.parse_args()
+
+    # La URL se define antes de importar app
+    if args.base:
+        os.environ['VENTAS_DATABASE_URL'] = args.base
+    import app
+
+    inicio = time.perf_counter()
+    app.generar_ventas_masivas(args.filas, semilla=args.semilla, sesgo=args.sesgo,
+                               num_clientes=args.clientes)
+    segundos = time.perf_counter() - inicio
+    print(f'[INFO] Se generaron {args.filas:,} ventas en {segundos:.1f} s '
+          f'({args.filas / segundos:,.0f} ventas/s).')
+
+
+if __name__ == '__main__':
+    main()
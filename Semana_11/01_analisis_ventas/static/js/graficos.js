@@ -0,0 +1,187 @@
+// ============================================================================
+// GRAFICOS EN EL NAVEGADOR
+// ============================================================================
+// Dibuja como SVG los graficos cuyos datos entrega /api/graficos/<tipo>.
+// Cada contenedor indica la URL de sus datos:
+//
+//   <div class="chart-svg" data-grafico="/api/graficos/mensual"></div>
+//
+// Tipos de grafico (campo "tipo" del JSON): lineas, barras, pastel.
+// Sin librerias externas: solo elementos SVG.
+// ============================================================================
+
+(function () {
+    'use strict';
+
+    // Misma paleta que los graficos de matplotlib (COLORES en app.py)
+    var COLORES = ['#6366f1', '#8b5cf6', '#a78bfa', '#c4b5fd', '#ddd6fe',
+                   '#818cf8', '#6d28d9', '#7c3aed', '#5b21b6', '#4c1d95'];
+    var SVG_NS = 'http://www.w3.org/2000/svg';
+
+    function crear(nombre, atributos, padre) {
+        var elemento = document.createElementNS(SVG_NS, nombre);
+        Object.keys(atributos || {}).forEach(function (clave) {
+            elemento.setAttribute(clave, atributos[clave]);
+        });
+        if (padre) {
+            padre.appendChild(elemento);
+        }
+        return elemento;
+    }
+
+    function texto(padre, x, y, contenido, atributos) {
+        var attrs = Object.assign({x: x, y: y, 'font-size': 12, fill: '#374151'}, atributos || {});
+        crear('text', attrs, padre).textContent = contenido;
+    }
+
+    function moneda(valor) {
+        return '$' + Math.round(valor).toLocaleString('es');
+    }
+
+    function lienzo(contenedor, ancho, alto) {
+        contenedor.innerHTML = '';
+        return crear('svg', {viewBox: '0 0 ' + ancho + ' ' + alto, role: 'img'}, contenedor);
+    }
+
+    function vacio(contenedor, mensaje) {
+        var svg = lienzo(contenedor, 600, 200);
+        texto(svg, 300, 100, mensaje, {'text-anchor': 'middle', 'font-size': 16, fill: '#9ca3af'});
+    }
+
+    // --- Lineas: una o varias series sobre las mismas etiquetas ---
+    function dibujarLineas(contenedor, datos) {
+        var ancho = 800, alto = 340, izq = 80, der = 20, arriba = 20, abajo = 70;
+        var svg = lienzo(contenedor, ancho, alto);
+        var n = datos.etiquetas.length;
+        var maximo = 0;
+        datos.series.forEach(function (serie) {
+            serie.valores.forEach(function (v) { if (v !== null && v > maximo) { maximo = v; } });
+        });
+        maximo = maximo || 1;
+
+        var x = function (i) { return izq + (n > 1 ? i * (ancho - izq - der) / (n - 1) : (ancho - izq - der) / 2); };
+        var y = function (v) { return alto - abajo - v / maximo * (alto - arriba - abajo); };
+
+        // Cuadricula y eje Y
+        for (var k = 0; k <= 4; k++) {
+            var valor = maximo * k / 4;
+            crear('line', {x1: izq, x2: ancho - der, y1: y(valor), y2: y(valor), stroke: '#e5e7eb'}, svg);
+            texto(svg, izq - 8, y(valor) + 4, moneda(valor), {'text-anchor': 'end', 'font-size': 11});
+        }
+
+        // Eje X: como mucho ~12 etiquetas
+        var paso = Math.max(1, Math.ceil(n / 12));
+        datos.etiquetas.forEach(function (etiqueta, i) {
+            if (i % paso === 0) {
+                texto(svg, x(i), alto - abajo + 16, etiqueta, {
+                    'text-anchor': 'end', 'font-size': 10,
+                    transform: 'rotate(-45 ' + x(i) + ' ' + (alto - abajo + 16) + ')'
+                });
+            }
+        });
+
+        datos.series.forEach(function (serie, s) {
+            var color = COLORES[(s * 3) % COLORES.length];
+            var ruta = '', levantar = true;
+            serie.valores.forEach(function (v, i) {
+                if (v === null) { levantar = true; return; }
+                ruta += (levantar ? 'M' : 'L') + x(i).toFixed(1) + ' ' + y(v).toFixed(1);
+                levantar = false;
+            });
+            crear('path', {
+                d: ruta, fill: 'none', stroke: color, 'stroke-width': 2.5,
+                'stroke-dasharray': serie.discontinua ? '6 4' : 'none'
+            }, svg);
+            if (!serie.discontinua) {
+                serie.valores.forEach(function (v, i) {
+                    if (v === null) { return; }
+                    var punto = crear('circle', {cx: x(i), cy: y(v), r: 4, fill: 'white', stroke: color, 'stroke-width': 2}, svg);
+                    crear('title', {}, punto).textContent = datos.etiquetas[i] + ': ' + moneda(v);
+                });
+            }
+            // Leyenda
+            if (datos.series.length > 1) {
+                crear('rect', {x: izq + 10 + s * 150, y: arriba, width: 12, height: 12, fill: color}, svg);
+                texto(svg, izq + 28 + s * 150, arriba + 11, serie.nombre, {'font-size': 11});
+            }
+        });
+    }
+
+    // --- Barras horizontales, la mayor arriba ---
+    function dibujarBarras(contenedor, datos) {
+        var n = datos.valores.length;
+        var ancho = 600, alturaBarra = 28, izq = 150, der = 90;
+        var alto = n * alturaBarra + 20;
+        var svg = lienzo(contenedor, ancho, alto);
+        var maximo = Math.max.apply(null, datos.valores) || 1;
+
+        datos.valores.forEach(function (v, i) {
+            var largo = v / maximo * (ancho - izq - der);
+            var yBarra = 10 + i * alturaBarra;
+            var barra = crear('rect', {
+                x: izq, y: yBarra + 4, width: Math.max(largo, 1), height: alturaBarra - 8,
+                rx: 3, fill: COLORES[i % COLORES.length]
+            }, svg);
+            crear('title', {}, barra).textContent = datos.etiquetas[i] + ': ' + moneda(v);
+            texto(svg, izq - 8, yBarra + alturaBarra / 2 + 4, datos.etiquetas[i], {'text-anchor': 'end'});
+            texto(svg, izq + largo + 6, yBarra + alturaBarra / 2 + 4, moneda(v), {'font-size': 11, fill: COLORES[0]});
+        });
+    }
+
+    // --- Pastel con porcentajes en la leyenda ---
+    function dibujarPastel(contenedor, datos) {
+        var svg = lienzo(contenedor, 560, 300);
+        var cx = 150, cy = 150, radio = 130;
+        var total = datos.valores.reduce(function (a, b) { return a + b; }, 0) || 1;
+        var angulo = -Math.PI / 2;
+
+        datos.valores.forEach(function (v, i) {
+            var fraccion = v / total;
+            var fin = angulo + fraccion * 2 * Math.PI;
+            var color = COLORES[i % COLORES.length];
+            var porcion;
+            if (fraccion >= 0.9999) {
+                porcion = crear('circle', {cx: cx, cy: cy, r: radio, fill: color}, svg);
+            } else {
+                var grande = fin - angulo > Math.PI ? 1 : 0;
+                porcion = crear('path', {
+                    d: 'M' + cx + ' ' + cy +
+                       'L' + (cx + radio * Math.cos(angulo)) + ' ' + (cy + radio * Math.sin(angulo)) +
+                       'A' + radio + ' ' + radio + ' 0 ' + grande + ' 1 ' +
+                       (cx + radio * Math.cos(fin)) + ' ' + (cy + radio * Math.sin(fin)) + 'Z',
+                    fill: color, stroke: 'white', 'stroke-width': 2
+                }, svg);
+            }
+            crear('title', {}, porcion).textContent = datos.etiquetas[i] + ': ' + moneda(v);
+
+            var yLeyenda = 40 + i * 26;
+            crear('rect', {x: 320, y: yLeyenda - 11, width: 14, height: 14, rx: 2, fill: color}, svg);
+            texto(svg, 342, yLeyenda, datos.etiquetas[i] + '  ' + (fraccion * 100).toFixed(1) + '%');
+            angulo = fin;
+        });
+    }
+
+    var DIBUJANTES = {lineas: dibujarLineas, barras: dibujarBarras, pastel: dibujarPastel};
+
+    function cargar(contenedor) {
+        fetch(contenedor.dataset.grafico, {credentials: 'same-origin'})
+            .then(function (respuesta) {
+                if (!respuesta.ok) { throw new Error(respuesta.status); }
+                return respuesta.json();
+            })
+            .then(function (datos) {
+                if (!datos.etiquetas.length) {
+                    vacio(contenedor, 'Sin datos');
+                } else {
+                    DIBUJANTES[datos.tipo](contenedor, datos);
+                }
+            })
+            .catch(function () {
+                vacio(contenedor, 'No se pudo cargar el grafico');
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-grafico]').forEach(cargar);
+    });
+})();
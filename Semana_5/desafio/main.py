@@ -75,7 +75,6 @@ def main():
         fecha_registro="2025-01-15",
         cedula="1-123-456-7"
     )
-    sistema.agregar_miembro(miembro1)
 
     miembro2 = Miembro(
         id=2,
@@ -87,7 +86,6 @@ def main():
         fecha_registro="2025-01-20",
         cedula="2-234-567-8"
     )
-    sistema.agregar_miembro(miembro2)
 
     miembro3 = Miembro(
         id=3,
@@ -99,7 +97,6 @@ def main():
         fecha_registro="2025-02-01",
         cedula="3-345-678-9"
     )
-    sistema.agregar_miembro(miembro3)
 
     miembro4 = Miembro(
         id=4,
@@ -111,7 +108,9 @@ def main():
         fecha_registro="2024-12-10",
         cedula="4-456-789-0"
     )
-    sistema.agregar_miembro(miembro4)
+
+    # Se registran todos juntos: una sola escritura del archivo JSON
+    sistema.agregar_miembros([miembro1, miembro2, miembro3, miembro4])
 
     # ══════════════════════════════════════════════════════════════
     # PASO 2 - Agregar ENTRENADORES de ejemplo
@@ -129,7 +128,6 @@ def main():
         email="roberto.m@gym.com",
         disponible=True
     )
-    sistema.agregar_entrenador(entrenador1)
 
     entrenador2 = Entrenador(
         id=2,
@@ -140,7 +138,6 @@ def main():
         email="patricia.h@gym.com",
         disponible=True
     )
-    sistema.agregar_entrenador(entrenador2)
 
     entrenador3 = Entrenador(
         id=3,
@@ -151,7 +148,6 @@ def main():
         email="miguel.t@gym.com",
         disponible=False  # Este entrenador no está disponible actualmente
     )
-    sistema.agregar_entrenador(entrenador3)
 
     entrenador4 = Entrenador(
         id=4,
@@ -162,7 +158,8 @@ def main():
         email="laura.s@gym.com",
         disponible=True
     )
-    sistema.agregar_entrenador(entrenador4)
+
+    sistema.agregar_entrenadores([entrenador1, entrenador2, entrenador3, entrenador4])
 
     # ══════════════════════════════════════════════════════════════
     # PASO 3 - PROGRAMAR CLASES (¡Aquí relacionamos las entidades!)
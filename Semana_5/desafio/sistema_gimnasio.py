@@ -48,23 +48,34 @@ class SistemaGimnasio(SistemaGestion):
     def __init__(self):
         super().__init__("gimnasio")
 
-        # Crear los tres repositorios para cada entidad
+        # Crear los tres repositorios para cada entidad.
+        # Los reportes listan las clases y buscan su miembro y su entrenador
+        # una y otra vez, así que las entidades se guardan en caché. Es
+        # seguro porque aquí una entidad solo se modifica para pasarla
+        # enseguida a actualizar(), que descarta su entrada de la caché.
         self.miembros = RepositorioJSON(
             "miembros",
             Miembro,
-            self.directorio_datos
+            self.directorio_datos,
+            cache_entidades=True
         )
 
         self.entrenadores = RepositorioJSON(
             "entrenadores",
             Entrenador,
-            self.directorio_datos
+            self.directorio_datos,
+            cache_entidades=True
         )
 
+        # Las clases se consultan por miembro, por entrenador y por fecha
+        # desde los reportes, así que esos campos llevan índice
         self.clases = RepositorioJSON(
             "clases",
             Clase,
-            self.directorio_datos
+            self.directorio_datos,
+            campos_indexados=["miembro_id", "entrenador_id"],
+            campos_ordenados=["fecha"],
+            cache_entidades=True
         )
 
     # ══════════════════════════════════════════════════════════════
@@ -89,6 +100,23 @@ class SistemaGimnasio(SistemaGestion):
             print(f"✅ Miembro {miembro.nombre} registrado exitosamente (ID: {miembro.id})")
         return resultado
 
+    def agregar_miembros(self, miembros: List[Miembro]) -> int:
+        """
+        Agrega varios miembros con una sola escritura en disco.
+
+        Si algún miembro no es válido no se agrega ninguno.
+
+        Args:
+            miembros: Lista de miembros a registrar
+
+        Returns:
+            Cantidad de miembros agregados
+        """
+        if not all(miembro.validar() for miembro in miembros):
+            return 0
+
+        return self.miembros.insertar_muchos(miembros)
+
     def listar_miembros(self) -> List[Miembro]:
         """Retorna todos los miembros registrados."""
         return self.miembros.consultar_todos()
@@ -159,6 +187,23 @@ class SistemaGimnasio(SistemaGestion):
             print(f"✅ Entrenador {entrenador.nombre} registrado exitosamente (ID: {entrenador.id})")
         return resultado
 
+    def agregar_entrenadores(self, entrenadores: List[Entrenador]) -> int:
+        """
+        Agrega varios entrenadores con una sola escritura en disco.
+
+        Si algún entrenador no es válido no se agrega ninguno.
+
+        Args:
+            entrenadores: Lista de entrenadores a registrar
+
+        Returns:
+            Cantidad de entrenadores agregados
+        """
+        if not all(entrenador.validar() for entrenador in entrenadores):
+            return 0
+
+        return self.entrenadores.insertar_muchos(entrenadores)
+
     def listar_entrenadores(self) -> List[Entrenador]:
         """Retorna todos los entrenadores registrados."""
         return self.entrenadores.consultar_todos()
@@ -174,7 +219,7 @@ class SistemaGimnasio(SistemaGestion):
         Returns:
             Lista de entrenadores con disponible=True
         """
-        return [e for e in self.listar_entrenadores() if e.disponible]
+        return self.entrenadores.consulta().donde("disponible", "==", True).todos()
 
     def cambiar_disponibilidad_entrenador(self, entrenador_id: int, disponible: bool) -> bool:
         """
@@ -359,11 +404,11 @@ class SistemaGimnasio(SistemaGestion):
 
         # Estadísticas de miembros
         total_miembros = self.miembros.contar()
-        miembros_activos = sum(1 for m in self.listar_miembros() if m.membresia_activa)
+        miembros_activos = sum(1 for m in self.miembros.iterar() if m.membresia_activa)
 
         # Estadísticas de entrenadores
         total_entrenadores = self.entrenadores.contar()
-        entrenadores_disponibles = sum(1 for e in self.listar_entrenadores() if e.disponible)
+        entrenadores_disponibles = sum(1 for e in self.entrenadores.iterar() if e.disponible)
 
         # Estadísticas de clases
         clases = self.listar_clases()
@@ -389,7 +434,7 @@ class SistemaGimnasio(SistemaGestion):
         Returns:
             Lista de clases del miembro
         """
-        return [c for c in self.listar_clases() if c.miembro_id == miembro_id]
+        return self.clases.consultar_por_campo("miembro_id", miembro_id)
 
     def obtener_clases_de_entrenador(self, entrenador_id: int) -> List[Clase]:
         """
@@ -401,7 +446,7 @@ class SistemaGimnasio(SistemaGestion):
         Returns:
             Lista de clases del entrenador
         """
-        return [c for c in self.listar_clases() if c.entrenador_id == entrenador_id]
+        return self.clases.consultar_por_campo("entrenador_id", entrenador_id)
 
     def mostrar_clases_con_detalles(self) -> None:
         """
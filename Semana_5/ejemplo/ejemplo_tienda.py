@@ -169,10 +169,24 @@ class SistemaTienda(SistemaGestion):
         # Inicializa el sistema con nombre "tienda_ejemplo"
         super().__init__("tienda_ejemplo")
 
-        # Crea los tres repositorios
-        self.productos = RepositorioJSON("productos", Producto, self.directorio_datos)
-        self.clientes = RepositorioJSON("clientes", Cliente, self.directorio_datos)
-        self.ventas = RepositorioJSON("ventas", Venta, self.directorio_datos)
+        # Crea los tres repositorios. Con cache_entidades los listados
+        # repetidos reutilizan las entidades ya construidas; es seguro porque
+        # un producto solo se modifica para pasarlo enseguida a actualizar(),
+        # y clientes y ventas no se modifican nunca.
+        self.productos = RepositorioJSON(
+            "productos", Producto, self.directorio_datos,
+            campos_indexados=["categoria"], campos_ordenados=["precio"],
+            cache_entidades=True
+        )
+        self.clientes = RepositorioJSON(
+            "clientes", Cliente, self.directorio_datos,
+            campos_indexados=["ciudad"], cache_entidades=True
+        )
+        self.ventas = RepositorioJSON(
+            "ventas", Venta, self.directorio_datos,
+            campos_indexados=["cliente_id"], campos_ordenados=["fecha"],
+            cache_entidades=True
+        )
 
     # ==================== OPERACIONES DE PRODUCTOS ====================
 
@@ -319,8 +333,12 @@ class SistemaTienda(SistemaGestion):
 
     def mostrar_inventario_bajo(self, limite: int = 5) -> None:
         """Muestra productos con stock bajo."""
-        productos = self.listar_productos()
-        productos_bajos = [p for p in productos if p.stock <= limite]
+        productos_bajos = (
+            self.productos.consulta()
+            .donde("stock", "<=", limite)
+            .ordenar_por("stock")
+            .todos()
+        )
 
         if productos_bajos:
             print(f"\n⚠️  ALERTA: Productos con stock bajo (≤ {limite}):")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de formatos de archivo
+================================
+Compara el tiempo de guardado y de carga de una colección sintética con
+cada serializador de RepositorioJSON, tomando como referencia el JSON con
+indent=2 que se usa por defecto.
+
+Uso:
+    python benchmark_serializadores.py            # 100.000 registros
+    python benchmark_serializadores.py -n 500000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from database_framework import (
+    Serializador,
+    SerializadorColumnar,
+    SerializadorJSON,
+)
+
+
+def generar_registros(cantidad: int) -> List[Dict[str, Any]]:
+    """Genera registros parecidos a las ventas de la tienda de ejemplo."""
+    generador = random.Random(42)
+    ciudades = ["Panamá", "Colón", "David", "Santiago", "Chitré", "La Chorrera"]
+    return [
+        {
+            "id": i,
+            "producto_id": generador.randint(1, 500),
+            "cliente_id": generador.randint(1, 5000),
+            "cantidad": generador.randint(1, 10),
+            "total": round(generador.uniform(1, 2000), 2),
+            "fecha": f"2025-{generador.randint(1, 12):02d}-{generador.randint(1, 28):02d}",
+            "ciudad": generador.choice(ciudades),
+            "pagada": generador.random() < 0.9,
+        }
+        for i in range(1, cantidad + 1)
+    ]
+
+
+def medir(serializador: Serializador, registros: List[Dict[str, Any]], ruta: Path) -> Dict[str, float]:
+    """Mide guardar (serializar + escribir) y cargar (leer + deserializar)."""
+    inicio = time.perf_counter()
+    ruta.write_bytes(serializador.serializar(registros))
+    guardado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cargados = serializador.deserializar(ruta.read_bytes())
+    carga = time.perf_counter() - inicio
+
+    assert cargados == registros, "El formato no reconstruyó los mismos registros"
+    return {"guardar": guardado, "cargar": carga, "bytes": ruta.stat().st_size}
+
+
+def main() -> None:
+    """Ejecuta el benchmark e imprime una tabla comparativa."""
+    parser = argparse.ArgumentParser(description="Benchmark de serializadores")
+    parser.add_argument("-n", "--registros", type=int, default=100_000)
+    args = parser.parse_args()
+
+    registros = generar_registros(args.registros)
+    formatos = {
+        "JSON indent=2": SerializadorJSON(),
+        "JSON compacto": SerializadorJSON(compacto=True),
+        "Columnar .rjc": SerializadorColumnar(),
+    }
+
+    print(f"\n📊 Benchmark con {len(registros):,} registros")
+    print(f"{'Formato':<16}{'Guardar (s)':>14}{'Cargar (s)':>14}{'Tamaño (MB)':>14}{'Carga vs base':>16}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        base = None
+        for nombre, serializador in formatos.items():
+            ruta = Path(directorio) / f"coleccion{serializador.extension}"
+            resultado = medir(serializador, registros, ruta)
+            base = base or resultado
+            print(
+                f"{nombre:<16}{resultado['guardar']:>14.3f}{resultado['cargar']:>14.3f}"
+                f"{resultado['bytes'] / 1_048_576:>14.2f}"
+                f"{base['cargar'] / resultado['cargar']:>15.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversor de formatos de colecciones
+====================================
+Convierte el archivo de datos de una colección entre los formatos que
+entiende RepositorioJSON. El formato se deduce de la extensión:
+
+    .json  → JSON con indentación (o compacto con --compacto)
+    .rjc   → Formato binario por columnas (SerializadorColumnar)
+
+Si la colección se usa en modo LOG, primero hay que compactarla
+(repositorio.compactar()): los cambios que siguen en su log no están en
+el archivo de datos y el conversor se niega a continuar.
+
+Uso:
+    python convertir_formato.py datos/gimnasio/miembros.json datos/gimnasio/miembros.rjc
+    python convertir_formato.py miembros.rjc miembros.json --compacto
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from database_framework import _escribir_atomico, log_pendiente, serializador_para_ruta
+
+
+def convertir(origen: Path, destino: Path, compacto: bool = False) -> int:
+    """
+    Lee la colección de `origen` y la escribe en `destino` (de forma
+    atómica, como el resto del framework).
+
+    Raises:
+        ValueError: Si el origen o el destino tienen un log con cambios
+            pendientes (el del origen se perdería en la conversión y el del
+            destino se aplicaría sobre datos que no son los suyos)
+
+    Returns:
+        Cantidad de registros convertidos
+    """
+    for ruta in (origen, destino):
+        log = log_pendiente(ruta)
+        if log is not None:
+            raise ValueError(
+                f"{log} tiene cambios pendientes: abre la colección y compáctala "
+                f"(repositorio.compactar()) antes de convertir"
+            )
+    registros = serializador_para_ruta(origen).deserializar(origen.read_bytes())
+    _escribir_atomico(destino, serializador_para_ruta(destino, compacto).serializar(registros))
+    return len(registros)
+
+
+def main() -> None:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Convierte colecciones entre .json y .rjc")
+    parser.add_argument("origen", type=Path, help="Archivo de datos a leer")
+    parser.add_argument("destino", type=Path, help="Archivo de datos a escribir")
+    parser.add_argument("--compacto", action="store_true",
+                        help="Si el destino es .json, escribirlo sin indentación")
+    args = parser.parse_args()
+
+    try:
+        cantidad = convertir(args.origen, args.destino, args.compacto)
+    except ValueError as error:
+        parser.error(str(error))
+    tamano_origen = args.origen.stat().st_size
+    tamano_destino = args.destino.stat().st_size
+    print(f"✅ {cantidad} registros convertidos: {args.origen} → {args.destino}")
+    print(f"   Tamaño: {tamano_origen:,} bytes → {tamano_destino:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
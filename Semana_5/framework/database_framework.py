@@ -12,12 +12,30 @@ Solo importa las clases y úsalas en tu proyecto.
 
 from __future__ import annotations
 
+import atexit
+import bisect
+import heapq
 import json
+import operator
+import os
+import struct
+import sys
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict, field
 from datetime import datetime, timezone
+from functools import wraps
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypeVar, Generic, Type
+from typing import (
+    Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence,
+    Set, Tuple, TypeVar, Generic, Type
+)
 from enum import Enum
 
 
@@ -28,6 +46,498 @@ class TipoOperacion(Enum):
     ACTUALIZAR = "UPDATE"
     ELIMINAR = "DELETE"
     CONSULTAR = "QUERY"
+    TRANSACCION = "TRANSACTION"
+
+
+class ModoAlmacenamiento(Enum):
+    """Estrategias de persistencia disponibles para RepositorioJSON."""
+    SNAPSHOT = "snapshot"  # Reescribe el archivo completo en cada cambio
+    LOG = "log"            # Agrega cada cambio a un log y compacta periódicamente
+
+
+class RegistroLecturas(Enum):
+    """Qué lecturas (READ / QUERY) se registran en la bitácora."""
+    NINGUNA = "off"        # Las lecturas no se auditan
+    MUESTREO = "sampled"   # Se registra una de cada N lecturas
+    TODAS = "full"         # Se registran todas las lecturas
+
+
+# ==================== FORMATOS DE ARCHIVO ====================
+
+class Serializador(ABC):
+    """
+    Convierte la lista de registros de una colección a bytes y viceversa.
+
+    RepositorioJSON usa un serializador para su archivo de datos; la
+    extensión del archivo depende del formato elegido.
+    """
+
+    extension: str = ""
+
+    @abstractmethod
+    def serializar(self, registros: List[Dict[str, Any]]) -> bytes:
+        """Convierte los registros al contenido del archivo."""
+        pass
+
+    @abstractmethod
+    def deserializar(self, contenido: bytes) -> List[Dict[str, Any]]:
+        """Reconstruye los registros desde el contenido del archivo."""
+        pass
+
+
+class SerializadorJSON(Serializador):
+    """
+    Formato JSON. Por defecto con indentación (legible, como siempre);
+    con compacto=True se omiten espacios y saltos de línea, lo que reduce
+    el tamaño y acelera tanto la escritura como la lectura.
+    """
+
+    extension = ".json"
+
+    def __init__(self, compacto: bool = False):
+        self.compacto = compacto
+
+    def serializar(self, registros: List[Dict[str, Any]]) -> bytes:
+        if self.compacto:
+            texto = json.dumps(registros, ensure_ascii=False, separators=(",", ":"))
+        else:
+            texto = json.dumps(registros, ensure_ascii=False, indent=2)
+        return texto.encode("utf-8")
+
+    def deserializar(self, contenido: bytes) -> List[Dict[str, Any]]:
+        return json.loads(contenido)
+
+
+class SerializadorColumnar(Serializador):
+    """
+    Formato binario por columnas (extensión .rjc).
+
+    En lugar de guardar cada registro como un objeto, guarda cada campo
+    como una columna:
+    - int / float / bool: arreglos empaquetados con `array` (8, 8 y 1 bytes
+      por valor), que se leen de una sola vez con frombytes.
+    - str: índices a una tabla de cadenas sin repetir (los valores
+      repetidos como categorías o ciudades se guardan una sola vez).
+    - Cualquier otro caso (None, listas, tipos mezclados, campos que
+      faltan en algunos registros): cada valor como texto JSON en la tabla.
+
+    Estructura del archivo:
+        b"RJC1" | largo del encabezado (uint32) | encabezado JSON |
+        tabla de cadenas | columnas, en el orden del encabezado
+    """
+
+    extension = ".rjc"
+    MAGICO = b"RJC1"
+    _FALTA = 0xFFFFFFFF  # Índice de la tabla que indica "campo ausente"
+
+    def serializar(self, registros: List[Dict[str, Any]]) -> bytes:
+        nombres: Dict[str, None] = {}
+        for registro in registros:
+            nombres.update(dict.fromkeys(registro))
+
+        cadenas: Dict[str, int] = {}
+        columnas: List[Tuple[str, str, bytes]] = []
+        for nombre in nombres:
+            valores = [registro.get(nombre, _AUSENTE) for registro in registros]
+            tipo = self._tipo_columna(valores)
+            if tipo == "s":
+                arreglo = array("I", (cadenas.setdefault(v, len(cadenas)) for v in valores))
+            elif tipo == "j":
+                arreglo = array("I", (
+                    self._FALTA if v is _AUSENTE
+                    else cadenas.setdefault(json.dumps(v, ensure_ascii=False), len(cadenas))
+                    for v in valores
+                ))
+            else:
+                arreglo = array({"i": "q", "f": "d", "b": "B"}[tipo], valores)
+            columnas.append((nombre, tipo, _a_little_endian(arreglo).tobytes()))
+
+        tabla = list(cadenas)
+        texto_tabla = "".join(tabla).encode("utf-8")
+        largos = _a_little_endian(array("I", (len(cadena) for cadena in tabla))).tobytes()
+
+        encabezado = json.dumps({
+            "filas": len(registros),
+            "cadenas": len(tabla),
+            "bytes_cadenas": len(texto_tabla),
+            "columnas": [[nombre, tipo, len(datos)] for nombre, tipo, datos in columnas],
+        }, ensure_ascii=False).encode("utf-8")
+
+        partes = [self.MAGICO, struct.pack("<I", len(encabezado)), encabezado, largos, texto_tabla]
+        partes.extend(datos for _, _, datos in columnas)
+        return b"".join(partes)
+
+    def deserializar(self, contenido: bytes) -> List[Dict[str, Any]]:
+        if contenido[:4] != self.MAGICO:
+            raise ValueError("El archivo no tiene formato columnar RJC1")
+
+        vista = memoryview(contenido)
+        (largo_encabezado,) = struct.unpack_from("<I", contenido, 4)
+        posicion = 8 + largo_encabezado
+        encabezado = json.loads(bytes(vista[8:posicion]))
+
+        largos = _leer_arreglo("I", vista[posicion:posicion + 4 * encabezado["cadenas"]])
+        posicion += 4 * encabezado["cadenas"]
+        texto_tabla = bytes(vista[posicion:posicion + encabezado["bytes_cadenas"]]).decode("utf-8")
+        posicion += encabezado["bytes_cadenas"]
+
+        tabla: List[str] = []
+        inicio = 0
+        for largo in largos:
+            tabla.append(texto_tabla[inicio:inicio + largo])
+            inicio += largo
+
+        nombres: List[str] = []
+        columnas: List[List[Any]] = []
+        hay_ausentes = False
+        for nombre, tipo, cantidad_bytes in encabezado["columnas"]:
+            datos = vista[posicion:posicion + cantidad_bytes]
+            posicion += cantidad_bytes
+            if tipo == "s":
+                valores: List[Any] = [tabla[i] for i in _leer_arreglo("I", datos)]
+            elif tipo == "j":
+                valores = [
+                    _AUSENTE if i == self._FALTA else json.loads(tabla[i])
+                    for i in _leer_arreglo("I", datos)
+                ]
+                hay_ausentes = hay_ausentes or _AUSENTE in valores
+            elif tipo == "b":
+                valores = [bool(v) for v in _leer_arreglo("B", datos)]
+            else:
+                valores = _leer_arreglo("q" if tipo == "i" else "d", datos).tolist()
+            nombres.append(nombre)
+            columnas.append(valores)
+
+        registros = [dict(zip(nombres, fila)) for fila in zip(*columnas)]
+        if not columnas:
+            registros = [{} for _ in range(encabezado["filas"])]
+        if hay_ausentes:
+            for registro in registros:
+                for nombre in [n for n, v in registro.items() if v is _AUSENTE]:
+                    del registro[nombre]
+        return registros
+
+    @staticmethod
+    def _tipo_columna(valores: List[Any]) -> str:
+        """Elige cómo guardar una columna según los tipos de sus valores."""
+        tipos = {type(valor) for valor in valores}
+        if tipos == {bool}:
+            return "b"
+        if tipos == {int} and all(-2**63 <= v < 2**63 for v in valores):
+            return "i"
+        if tipos == {float}:
+            return "f"
+        if tipos == {str}:
+            return "s"
+        return "j"
+
+
+_AUSENTE = object()  # Marca interna: el registro no tiene ese campo
+
+
+def _a_little_endian(arreglo: array) -> array:
+    """Asegura orden de bytes little-endian para que el archivo sea portable."""
+    if sys.byteorder == "big":
+        arreglo.byteswap()
+    return arreglo
+
+
+def _leer_arreglo(codigo: str, datos: Any) -> array:
+    """Reconstruye un arreglo little-endian guardado con _a_little_endian."""
+    arreglo = array(codigo)
+    arreglo.frombytes(datos)
+    if sys.byteorder == "big":
+        arreglo.byteswap()
+    return arreglo
+
+
+def serializador_para_ruta(ruta: Path, compacto: bool = False) -> Serializador:
+    """
+    Elige el serializador según la extensión del archivo.
+
+    Args:
+        ruta: Archivo de datos (.json o .rjc)
+        compacto: Para .json, usar JSON sin indentación
+
+    Ejemplo:
+        serializador = serializador_para_ruta(Path("productos.rjc"))
+    """
+    if ruta.suffix == SerializadorColumnar.extension:
+        return SerializadorColumnar()
+    if ruta.suffix == SerializadorJSON.extension:
+        return SerializadorJSON(compacto=compacto)
+    raise ValueError(f"Formato de archivo no soportado: {ruta.suffix}")
+
+
+# ==================== PERSISTENCIA EN DISCO ====================
+
+def ruta_log_de(ruta_datos: Path) -> Path:
+    """
+    Log de escritura del archivo de datos dado (modo LOG).
+
+    El nombre incluye la extensión de los datos (productos.json.log,
+    productos.rjc.log): las entradas del log solo valen sobre el snapshot
+    al que pertenecen, así que cada formato tiene el suyo.
+    """
+    return ruta_datos.with_name(ruta_datos.name + ".log")
+
+
+def log_pendiente(ruta_datos: Path) -> Optional[Path]:
+    """
+    Log con cambios aún no volcados en el archivo de datos, o None.
+
+    También considera el log de versiones anteriores (<coleccion>.log),
+    que no indicaba a qué formato pertenecía.
+    """
+    legado = ruta_datos.with_suffix(".log")
+    for candidato in (ruta_log_de(ruta_datos), legado):
+        if candidato.exists() and candidato.stat().st_size > 0:
+            return candidato
+    return None
+
+
+def _escribir_atomico(ruta: Path, contenido: bytes) -> None:
+    """
+    Escribe un archivo en disco sin dejar nunca un archivo a medio escribir.
+
+    1. Se escribe en <ruta>.tmp y se fuerza a disco con fsync.
+    2. La versión actual se conserva como <ruta>.bak (copia anterior buena).
+    3. El temporal reemplaza al archivo con un rename atómico.
+
+    Si el proceso se corta en cualquier punto, en disco queda el archivo
+    anterior completo o el nuevo completo (o, como mínimo, el .bak).
+    """
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    respaldo = ruta.with_name(ruta.name + ".bak")
+
+    with temporal.open("wb") as archivo:
+        archivo.write(contenido)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+    if ruta.exists():
+        os.replace(ruta, respaldo)
+    os.replace(temporal, ruta)
+
+    # En POSIX el rename solo es durable tras sincronizar el directorio;
+    # en Windows no se pueden abrir directorios y se omite.
+    try:
+        descriptor = os.open(ruta.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _leer_con_respaldo(ruta: Path, serializador: Serializador, por_defecto: Any) -> Any:
+    """
+    Lee un archivo escrito con _escribir_atomico.
+
+    Si el archivo falta o está dañado se recupera la copia anterior
+    (<ruta>.bak). Si tampoco existe, retorna `por_defecto`.
+    """
+    respaldo = ruta.with_name(ruta.name + ".bak")
+    for candidato in (ruta, respaldo):
+        if not candidato.exists():
+            continue
+        try:
+            datos = serializador.deserializar(candidato.read_bytes())
+        except (ValueError, struct.error, IndexError, KeyError):
+            print(f"⚠️  Archivo dañado: {candidato}")
+            continue
+        if candidato is respaldo:
+            print(f"♻️  Se recuperó la copia anterior de {ruta.name}")
+        return datos
+    return por_defecto
+
+
+# ==================== CONCURRENCIA ====================
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _firma_archivo(ruta: Path) -> Optional[Tuple[int, int, int]]:
+    """
+    Identifica la versión de un archivo en disco: (inodo, mtime, tamaño).
+
+    Cada escritura atómica crea un archivo nuevo (cambia el inodo) y cada
+    línea agregada al log cambia su tamaño, así que comparar firmas basta
+    para saber si otro proceso escribió, sin leer el contenido.
+    """
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+
+
+class CandadoArchivo:
+    """
+    Candado entre procesos sobre un archivo <coleccion>.lock.
+
+    Es un candado consultivo (advisory): solo coordina a los procesos que
+    lo usan, como todos los RepositorioJSON sobre la misma carpeta. Usa
+    fcntl.flock en Linux/macOS y msvcrt.locking en Windows (donde no hay
+    candado compartido y toda adquisición es exclusiva).
+
+    Es reentrante dentro del mismo hilo: si ya está adquirido, adquirirlo
+    de nuevo no hace nada. No es seguro entre hilos por sí solo; el
+    repositorio lo usa siempre con su candado de escritura tomado.
+    """
+
+    def __init__(self, ruta: Path):
+        self.ruta = ruta
+        self._archivo = None
+        self._profundidad = 0
+
+    @contextmanager
+    def adquirir(self, exclusivo: bool = True) -> Iterator[None]:
+        """Bloquea el archivo (exclusivo para escribir, compartido para leer)."""
+        if self._profundidad:
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+            return
+
+        if self._archivo is None:
+            self._archivo = self.ruta.open("a+b")
+        if fcntl is not None:
+            fcntl.flock(self._archivo.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        else:
+            self._bloquear_windows()
+        self._profundidad = 1
+        try:
+            yield
+        finally:
+            self._profundidad = 0
+            if fcntl is not None:
+                fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+            else:
+                self._archivo.seek(0)
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _bloquear_windows(self) -> None:
+        """Bloquea el primer byte del archivo esperando lo que haga falta."""
+        self._archivo.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK se rinde tras 10 intentos de un segundo
+                continue
+
+    def cerrar(self) -> None:
+        """Cierra el archivo del candado (se reabre al volver a adquirirlo)."""
+        if self._archivo is not None and not self._profundidad:
+            self._archivo.close()
+            self._archivo = None
+
+
+class CandadoLecturaEscritura:
+    """
+    Candado para hilos: varias lecturas a la vez o una sola escritura.
+
+    - Las lecturas esperan si hay una escritura en curso o esperando
+      (así un flujo continuo de lecturas no deja sin turno a los escritores).
+    - El hilo que escribe puede volver a escribir o leer sin bloquearse,
+      y una lectura dentro de otra lectura del mismo hilo tampoco espera.
+    - Pasar de lectura a escritura en el mismo hilo no está permitido.
+
+    Ejemplo:
+        candado = CandadoLecturaEscritura()
+        with candado.lectura():
+            total = len(datos)
+        with candado.escritura():
+            datos.append(nuevo)
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition(threading.Lock())
+        self._lectores = 0
+        self._escritores_esperando = 0
+        self._escritor: Optional[int] = None
+        self._local = threading.local()
+
+    def es_escritor(self) -> bool:
+        """Indica si el hilo actual tiene tomada la escritura."""
+        return self._escritor == threading.get_ident()
+
+    def es_lector(self) -> bool:
+        """Indica si el hilo actual tiene tomada una lectura."""
+        return getattr(self._local, "lecturas", 0) > 0
+
+    @contextmanager
+    def lectura(self) -> Iterator[None]:
+        """Toma el candado en modo lectura (compartido)."""
+        if self.es_escritor():
+            yield
+            return
+
+        profundidad = getattr(self._local, "lecturas", 0)
+        if profundidad == 0:
+            with self._condicion:
+                while self._escritor is not None or self._escritores_esperando:
+                    self._condicion.wait()
+                self._lectores += 1
+        self._local.lecturas = profundidad + 1
+        try:
+            yield
+        finally:
+            self._local.lecturas = profundidad
+            if profundidad == 0:
+                with self._condicion:
+                    self._lectores -= 1
+                    if self._lectores == 0:
+                        self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self) -> Iterator[None]:
+        """Toma el candado en modo escritura (exclusivo)."""
+        if self.es_escritor():
+            yield
+            return
+        if self.es_lector():
+            raise RuntimeError("No se puede escribir mientras el mismo hilo está leyendo")
+
+        with self._condicion:
+            self._escritores_esperando += 1
+            while self._escritor is not None or self._lectores:
+                self._condicion.wait()
+            self._escritores_esperando -= 1
+            self._escritor = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._escritor = None
+                self._condicion.notify_all()
+
+
+def _operacion_lectura(metodo: Callable) -> Callable:
+    """Ejecuta un método del repositorio con el candado de lectura tomado."""
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._lectura():
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
+
+def _operacion_escritura(metodo: Callable) -> Callable:
+    """Ejecuta un método del repositorio con el candado de escritura tomado."""
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._escritura():
+            return metodo(self, *args, **kwargs)
+    return envoltura
 
 
 @dataclass
@@ -69,6 +579,460 @@ class Entidad(ABC):
 T = TypeVar('T', bound=Entidad)
 
 
+class Bitacora:
+    """
+    Bitácora de auditoría en formato JSON Lines (un evento por línea).
+
+    Los eventos se acumulan en memoria y se agregan al final del archivo
+    en lotes, así registrar una operación nunca reescribe el historial.
+    Cuando el archivo supera un tamaño o una antigüedad se rota: se renombra
+    con un sello de tiempo y se empieza uno nuevo.
+
+    Parámetros:
+        ruta: Archivo .jsonl de la bitácora
+        tamano_lote: Eventos acumulados antes de escribir en disco
+        tamano_maximo: Bytes a partir de los cuales se rota el archivo
+        antiguedad_maxima: Segundos a partir de los cuales se rota el
+            archivo (None para no rotar por tiempo)
+        archivos_rotados: Cuántos archivos rotados se conservan
+        eventos_en_memoria: Últimos eventos disponibles para mostrarlos
+    """
+
+    def __init__(
+        self,
+        ruta: Path,
+        tamano_lote: int = 50,
+        tamano_maximo: int = 5 * 1024 * 1024,
+        antiguedad_maxima: Optional[float] = None,
+        archivos_rotados: int = 5,
+        eventos_en_memoria: int = 1000
+    ):
+        self.ruta = ruta
+        self.tamano_lote = tamano_lote
+        self.tamano_maximo = tamano_maximo
+        self.antiguedad_maxima = antiguedad_maxima
+        self.archivos_rotados = archivos_rotados
+
+        self.total = 0
+        self._pendientes: List[Dict[str, Any]] = []
+        self._recientes: Deque[Dict[str, Any]] = deque(maxlen=eventos_en_memoria)
+        self._inicio: Optional[float] = None  # Primer evento del archivo actual
+        # Las lecturas auditadas pueden llegar desde varios hilos a la vez
+        self._candado = threading.RLock()
+        self._cargar()
+
+    def _cargar(self) -> None:
+        """Lee el archivo actual para conocer los últimos eventos y su antigüedad."""
+        if not self.ruta.exists():
+            return
+
+        with self.ruta.open("r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    evento = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if self._inicio is None:
+                    self._inicio = datetime.fromisoformat(evento["timestamp"]).timestamp()
+                self._recientes.append(evento)
+                self.total += 1
+
+    def _debe_rotar(self) -> bool:
+        """Indica si el archivo actual superó el tamaño o la antigüedad máxima."""
+        if not self.ruta.exists():
+            return False
+        if self.ruta.stat().st_size >= self.tamano_maximo:
+            return True
+        return (
+            self.antiguedad_maxima is not None
+            and self._inicio is not None
+            and time.time() - self._inicio >= self.antiguedad_maxima
+        )
+
+    def registrar(self, evento: Dict[str, Any]) -> None:
+        """Agrega un evento; se escribe en disco al completar el lote."""
+        with self._candado:
+            self._pendientes.append(evento)
+            self._recientes.append(evento)
+            self.total += 1
+            if len(self._pendientes) >= self.tamano_lote:
+                self.vaciar()
+
+    def vaciar(self) -> None:
+        """Escribe en disco los eventos pendientes, rotando antes si corresponde."""
+        with self._candado:
+            if not self._pendientes:
+                return
+
+            if self._debe_rotar():
+                self.rotar()
+
+            with self.ruta.open("a", encoding="utf-8") as archivo:
+                archivo.writelines(
+                    json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n"
+                    for evento in self._pendientes
+                )
+            if self._inicio is None:
+                self._inicio = time.time()
+            self._pendientes = []
+
+    def rotar(self) -> None:
+        """Renombra el archivo actual con un sello de tiempo y descarta los más viejos."""
+        if not self.ruta.exists():
+            return
+
+        sello = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self.ruta.rename(self.ruta.with_name(f"{self.ruta.stem}.{sello}{self.ruta.suffix}"))
+        self._inicio = None
+
+        rotados = sorted(self.ruta.parent.glob(f"{self.ruta.stem}.*{self.ruta.suffix}"))
+        sobrantes = len(rotados) - self.archivos_rotados
+        for archivo_viejo in rotados[:max(sobrantes, 0)]:
+            archivo_viejo.unlink()
+
+    def ultimos(self, cantidad: int) -> List[Dict[str, Any]]:
+        """Retorna los últimos eventos registrados (incluye los pendientes)."""
+        return list(self._recientes)[-cantidad:]
+
+    def limpiar(self) -> None:
+        """Descarta todos los eventos y elimina el archivo actual."""
+        self._pendientes = []
+        self._recientes.clear()
+        self.total = 0
+        self._inicio = None
+        if self.ruta.exists():
+            self.ruta.unlink()
+
+
+# ==================== CONSULTAS ====================
+
+OPERADORES: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda valor, opciones: valor in opciones,
+    "contiene": lambda valor, parte: parte in valor,
+}
+
+
+class Predicado(ABC):
+    """
+    Base de las condiciones de una consulta.
+
+    Las condiciones se combinan con & (Y) y | (O):
+        (Condicion("stock", "<=", 5) & Condicion("categoria", "==", "Ropa"))
+        | Condicion("precio", ">", 100)
+    """
+
+    @abstractmethod
+    def evaluar(self, dato: Dict[str, Any]) -> bool:
+        """Indica si el registro cumple la condición."""
+        pass
+
+    def __and__(self, otro: Predicado) -> Predicado:
+        return CondicionCompuesta("Y", [self, otro])
+
+    def __or__(self, otro: Predicado) -> Predicado:
+        return CondicionCompuesta("O", [self, otro])
+
+
+class Condicion(Predicado):
+    """
+    Compara un campo del registro con un valor.
+
+    Operadores: ==, !=, <, <=, >, >=, in (valor dentro de una lista)
+    y contiene (texto o lista que contiene el valor).
+
+    Los registros sin valor en el campo (None) solo cumplen == y != ; un
+    valor que no se puede comparar (ej: texto contra número) no cumple.
+    """
+
+    def __init__(self, campo: str, operador: str, valor: Any):
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador no soportado: {operador}")
+        self.campo = campo
+        self.operador = operador
+        self.valor = valor
+
+    def evaluar(self, dato: Dict[str, Any]) -> bool:
+        valor = dato.get(self.campo)
+        if valor is None and self.operador not in ("==", "!="):
+            return False
+        try:
+            return OPERADORES[self.operador](valor, self.valor)
+        except TypeError:
+            return False
+
+    def __repr__(self) -> str:
+        return f"{self.campo} {self.operador} {self.valor!r}"
+
+
+class CondicionCompuesta(Predicado):
+    """Varias condiciones unidas con Y (todas) u O (alguna)."""
+
+    def __init__(self, conector: str, partes: List[Predicado]):
+        self.conector = conector
+        self.partes: List[Predicado] = []
+        for parte in partes:
+            if isinstance(parte, CondicionCompuesta) and parte.conector == conector:
+                self.partes.extend(parte.partes)
+            else:
+                self.partes.append(parte)
+
+    def evaluar(self, dato: Dict[str, Any]) -> bool:
+        if self.conector == "Y":
+            return all(parte.evaluar(dato) for parte in self.partes)
+        return any(parte.evaluar(dato) for parte in self.partes)
+
+    def __repr__(self) -> str:
+        return "(" + f" {self.conector} ".join(repr(parte) for parte in self.partes) + ")"
+
+
+class Consulta(Generic[T]):
+    """
+    Consulta sobre un RepositorioJSON con filtros, orden, paginación y
+    proyección de campos. Se crea con `repositorio.consulta()` y se
+    ejecuta en una sola pasada al pedir los resultados.
+
+    Si alguna condición usa un campo indexado (== o in sobre un índice
+    hash, comparaciones sobre un índice ordenado) solo se revisan los
+    registros candidatos del índice en lugar de toda la colección.
+
+    Ejemplo:
+        pagina = (
+            repositorio.consulta()
+            .donde("categoria", "==", "Ropa")
+            .donde(Condicion("stock", "<=", 5) | Condicion("precio", ">", 100))
+            .ordenar_por("precio", descendente=True)
+            .limite(20)
+            .desplazamiento(40)
+            .todos()
+        )
+    """
+
+    def __init__(self, repositorio: RepositorioJSON[T]):
+        self._repositorio = repositorio
+        self._predicado: Optional[Predicado] = None
+        self._orden: List[Tuple[str, bool]] = []
+        self._limite: Optional[int] = None
+        self._desplazamiento = 0
+        self._campos: Optional[Tuple[str, ...]] = None
+
+    # ---------- Construcción ----------
+
+    def donde(self, campo: Any, operador: Optional[str] = None, valor: Any = None) -> Consulta[T]:
+        """
+        Agrega una condición (se une con Y a las anteriores).
+
+        Acepta un campo, un operador y un valor, o un Predicado ya armado.
+        """
+        predicado = campo if isinstance(campo, Predicado) else Condicion(campo, operador, valor)
+        self._predicado = predicado if self._predicado is None else self._predicado & predicado
+        return self
+
+    def ordenar_por(self, campo: str, descendente: bool = False) -> Consulta[T]:
+        """Ordena por un campo; se puede llamar varias veces para desempatar."""
+        self._orden.append((campo, descendente))
+        return self
+
+    def limite(self, cantidad: int) -> Consulta[T]:
+        """Devuelve como máximo `cantidad` resultados."""
+        self._limite = cantidad
+        return self
+
+    def desplazamiento(self, cantidad: int) -> Consulta[T]:
+        """Salta los primeros `cantidad` resultados (para paginar)."""
+        self._desplazamiento = cantidad
+        return self
+
+    def campos(self, *nombres: str) -> Consulta[T]:
+        """Devuelve diccionarios solo con esos campos en lugar de entidades."""
+        self._campos = nombres
+        return self
+
+    # ---------- Ejecución ----------
+
+    def todos(self) -> List[Any]:
+        """Ejecuta la consulta y retorna la lista de resultados."""
+        with self._repositorio._lectura():
+            return self._resultados()
+
+    def _resultados(self, limite: Optional[int] = None) -> List[Any]:
+        """
+        Ejecuta la consulta (con el candado de lectura ya tomado). `limite`
+        reemplaza al de la consulta solo en esta ejecución.
+        """
+        repositorio = self._repositorio
+        if limite is None:
+            limite = self._limite
+        pares = self._ejecutar(limite)
+
+        repositorio._registrar_lectura(
+            TipoOperacion.CONSULTAR,
+            "CONSULTA",
+            {"condicion": repr(self._predicado), "orden": self._orden,
+             "limite": limite, "desplazamiento": self._desplazamiento},
+            f"Consulta: {self._predicado!r} ({len(pares)} resultados)"
+        )
+
+        if self._campos is not None:
+            return [
+                {campo: repositorio._datos[posicion].get(campo) for campo in self._campos}
+                for _, posicion in pares
+            ]
+        return [repositorio._materializar(entidad_id, posicion) for entidad_id, posicion in pares]
+
+    def primero(self) -> Optional[Any]:
+        """Ejecuta la consulta y retorna el primer resultado (o None)."""
+        limite = 1 if self._limite is None else min(self._limite, 1)
+        with self._repositorio._lectura():
+            resultados = self._resultados(limite)
+        return resultados[0] if resultados else None
+
+    def contar(self) -> int:
+        """Cuenta los registros que cumplen las condiciones sin construir entidades."""
+        with self._repositorio._lectura():
+            return sum(1 for _ in self._filtrar())
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.todos())
+
+    def _filtrar(self) -> Iterator[Tuple[Any, int]]:
+        """Recorre los pares (ID, posición) que cumplen el predicado."""
+        repositorio = self._repositorio
+        candidatos = self._candidatos(self._predicado) if self._predicado is not None else None
+
+        if candidatos is None:
+            pares: Iterable[Tuple[Any, int]] = repositorio._indice_ids.items()
+        else:
+            pares = sorted(
+                ((entidad_id, repositorio._indice_ids[entidad_id]) for entidad_id in candidatos),
+                key=operator.itemgetter(1)
+            )
+
+        if self._predicado is None:
+            yield from pares
+            return
+        for entidad_id, posicion in pares:
+            if self._predicado.evaluar(repositorio._datos[posicion]):
+                yield entidad_id, posicion
+
+    def _ejecutar(self, limite: Optional[int]) -> List[Tuple[Any, int]]:
+        """Filtra, ordena y pagina; retorna los pares (ID, posición) finales."""
+        inicio = self._desplazamiento
+        fin = None if limite is None else inicio + limite
+
+        if not self._orden:
+            return list(islice(self._filtrar(), inicio, fin))
+
+        datos = self._repositorio._datos
+
+        def clave(campo: str) -> Callable[[Tuple[Any, int]], Any]:
+            # Los valores None van al final en orden ascendente
+            return lambda par: (datos[par[1]].get(campo) is None, datos[par[1]].get(campo))
+
+        direcciones = {descendente for _, descendente in self._orden}
+        if len(direcciones) == 1:
+            campos = [campo for campo, _ in self._orden]
+            descendente = direcciones.pop()
+
+            def clave_total(par: Tuple[Any, int]) -> Tuple[Any, ...]:
+                return tuple(clave(campo)(par) for campo in campos)
+
+            if fin is not None:
+                seleccion = heapq.nlargest if descendente else heapq.nsmallest
+                return seleccion(fin, self._filtrar(), key=clave_total)[inicio:]
+            return sorted(self._filtrar(), key=clave_total, reverse=descendente)[inicio:]
+
+        # Direcciones mezcladas: ordenamientos estables del último criterio al primero
+        resultado = list(self._filtrar())
+        for campo, descendente in reversed(self._orden):
+            resultado.sort(key=clave(campo), reverse=descendente)
+        return resultado[inicio:fin]
+
+    def _candidatos(self, predicado: Predicado) -> Optional[Set[Any]]:
+        """
+        IDs que podrían cumplir el predicado según los índices, o None si
+        hay que revisar toda la colección.
+        """
+        repositorio = self._repositorio
+
+        if isinstance(predicado, CondicionCompuesta):
+            conjuntos = [self._candidatos(parte) for parte in predicado.partes]
+            if predicado.conector == "Y":
+                conocidos = [conjunto for conjunto in conjuntos if conjunto is not None]
+                return min(conocidos, key=len) if conocidos else None
+            if any(conjunto is None for conjunto in conjuntos):
+                return None
+            return set().union(*conjuntos)
+
+        if not isinstance(predicado, Condicion):
+            return None
+
+        indice_hash = repositorio._indices_hash.get(predicado.campo)
+        if indice_hash is not None:
+            if predicado.operador == "==":
+                return set(indice_hash.get(predicado.valor, ()))
+            if predicado.operador == "in":
+                return set().union(*(indice_hash.get(valor, ()) for valor in predicado.valor))
+
+        ordenado = repositorio._indices_ordenados.get(predicado.campo)
+        if ordenado is not None and predicado.operador in ("==", "<", "<=", ">", ">="):
+            if predicado.valor is None:
+                return None
+            inicio, fin = 0, len(ordenado)
+            try:
+                if predicado.operador in ("==", ">="):
+                    inicio = _buscar_valor(ordenado, predicado.valor)
+                elif predicado.operador == ">":
+                    inicio = _buscar_valor(ordenado, predicado.valor, despues=True)
+                if predicado.operador in ("==", "<="):
+                    fin = _buscar_valor(ordenado, predicado.valor, despues=True)
+                elif predicado.operador == "<":
+                    fin = _buscar_valor(ordenado, predicado.valor)
+            except TypeError:
+                return None
+            return {entidad_id for _, entidad_id in ordenado[inicio:fin]}
+
+        return None
+
+
+def _buscar_valor(ordenado: List[Tuple[Any, Any]], valor: Any, despues: bool = False) -> int:
+    """
+    Posición de `valor` en un índice ordenado de pares (valor, ID),
+    comparando solo el valor: la primera con valor >= `valor`, o con
+    `despues=True` la primera con valor > `valor`.
+
+    Es bisect_left/bisect_right con key=, que recién existe desde
+    Python 3.10.
+    """
+    inicio, fin = 0, len(ordenado)
+    while inicio < fin:
+        medio = (inicio + fin) // 2
+        actual = ordenado[medio][0]
+        if actual < valor or (despues and not valor < actual):
+            inicio = medio + 1
+        else:
+            fin = medio
+    return inicio
+
+
+# Repositorios abiertos, para cerrarlos (y sincronizar su log) al terminar
+# el proceso. Son referencias débiles: no impiden liberar un repositorio
+# que ya nadie usa, y cerrar() lo quita del conjunto.
+_repositorios_abiertos: "weakref.WeakSet[RepositorioJSON]" = weakref.WeakSet()
+
+
+@atexit.register
+def _cerrar_repositorios_abiertos() -> None:
+    """Cierra los repositorios que siguen abiertos al salir del intérprete."""
+    for repositorio in list(_repositorios_abiertos):
+        repositorio.cerrar()
+
+
 class RepositorioJSON(Generic[T]):
     """
     Repositorio genérico que maneja el almacenamiento de entidades en JSON.
@@ -83,59 +1047,474 @@ class RepositorioJSON(Generic[T]):
         nombre_coleccion: Nombre del archivo JSON (sin extensión)
         tipo_entidad: La clase de la entidad que se va a almacenar
         directorio_datos: Carpeta donde se guardarán los archivos
+        campos_indexados: Campos con índice hash para acelerar
+            consultar_por_campo (ej: ["cliente_id"])
+        campos_ordenados: Campos con índice ordenado para consultas por
+            rango con consultar_por_rango (ej: ["fecha", "precio"])
+        registro_lecturas: Qué lecturas se auditan en la bitácora
+            (TODAS por defecto, MUESTREO o NINGUNA)
+        muestreo_lecturas: En modo MUESTREO, se registra una de cada N lecturas
+        tamano_lote_bitacora: Eventos acumulados antes de escribir la bitácora
+        tamano_maximo_bitacora: Bytes a partir de los cuales se rota la bitácora
+        antiguedad_maxima_bitacora: Segundos a partir de los cuales se rota
+            la bitácora (None para no rotar por tiempo)
+        modo: Estrategia de persistencia (SNAPSHOT por defecto, o LOG)
+        serializador: Formato del archivo de datos (SerializadorJSON con
+            indentación por defecto; ver también SerializadorColumnar)
+        cache_entidades: Conservar en memoria las entidades ya construidas
+            (por ID) para no reconstruirlas en cada consulta (desactivado
+            por defecto). Con la caché, las entidades devueltas se comparten
+            entre consultas: modificar una cambia lo que ven las consultas
+            siguientes aunque nunca se llame a actualizar(), o aunque
+            actualizar() falle o la transacción se revierta. Úsala solo si
+            las entidades consultadas no se modifican en el lugar
+        intervalo_guardado: En modo SNAPSHOT, segundos entre guardados en
+            segundo plano. Con None (por defecto) cada cambio se guarda al
+            instante; con un número, los cambios solo marcan el repositorio
+            como pendiente y un hilo lo guarda cada `intervalo_guardado`
+        tamano_grupo_fsync: En modo LOG, cada cuántos cambios se fuerza
+            el log a disco con fsync
+        limite_compactacion: En modo LOG, cantidad de entradas del log a
+            partir de la cual se vuelca todo al snapshot y se vacía el log
+        detectar_cambios_externos: Antes de cada operación, comprobar si
+            otro proceso escribió la colección y recargarla. Desactivarlo
+            ahorra una consulta al sistema de archivos por operación cuando
+            un solo proceso usa la carpeta de datos
+
+    Concurrencia:
+        Varios procesos (por ejemplo la GUI y la consola) pueden usar la
+        misma carpeta de datos. Cada escritura toma un candado de archivo
+        exclusivo (<coleccion>.lock), recarga primero lo que otros procesos
+        hayan escrito y recién después valida y aplica el cambio. Para saber
+        si hay que recargar solo se compara la firma (inodo, fecha de
+        modificación y tamaño) de los archivos de datos y de log; en modo
+        LOG, si solo creció el log, se aplican únicamente las líneas nuevas.
+        Dentro de un proceso, los hilos comparten el repositorio con un
+        candado de lectura/escritura. Con `intervalo_guardado`, mientras
+        haya cambios sin guardar no se recarga: al guardar, gana la versión
+        de este proceso.
 
     Ejemplo:
         repositorio = RepositorioJSON("productos", Producto, Path("datos"))
         repositorio.insertar(producto1)
         productos = repositorio.consultar_todos()
+
+        # Índices secundarios para búsquedas por campo y por rango
+        repositorio = RepositorioJSON(
+            "ventas", Venta, Path("datos"),
+            campos_indexados=["cliente_id"],
+            campos_ordenados=["fecha"]
+        )
+
+        # Para cargas masivas: cada cambio es una línea agregada al log
+        repositorio = RepositorioJSON(
+            "productos", Producto, Path("datos"),
+            modo=ModoAlmacenamiento.LOG
+        )
     """
 
     def __init__(
         self,
         nombre_coleccion: str,
         tipo_entidad: Type[T],
-        directorio_datos: Path
+        directorio_datos: Path,
+        campos_indexados: Sequence[str] = (),
+        campos_ordenados: Sequence[str] = (),
+        registro_lecturas: RegistroLecturas = RegistroLecturas.TODAS,
+        muestreo_lecturas: int = 10,
+        tamano_lote_bitacora: int = 50,
+        tamano_maximo_bitacora: int = 5 * 1024 * 1024,
+        antiguedad_maxima_bitacora: Optional[float] = None,
+        modo: ModoAlmacenamiento = ModoAlmacenamiento.SNAPSHOT,
+        tamano_grupo_fsync: int = 100,
+        limite_compactacion: int = 10_000,
+        intervalo_guardado: Optional[float] = None,
+        serializador: Optional[Serializador] = None,
+        cache_entidades: bool = False,
+        detectar_cambios_externos: bool = True
     ):
         self.nombre_coleccion = nombre_coleccion
         self.tipo_entidad = tipo_entidad
         self.directorio_datos = directorio_datos
         self.directorio_datos.mkdir(parents=True, exist_ok=True)
-
-        self.ruta_datos = self.directorio_datos / f"{nombre_coleccion}.json"
-        self.ruta_bitacora = self.directorio_datos / f"{nombre_coleccion}_bitacora.json"
-
-        self._datos: List[Dict[str, Any]] = self._cargar_datos()
-        self._bitacora: List[Dict[str, Any]] = self._cargar_bitacora()
+        self.modo = modo
+        self.tamano_grupo_fsync = tamano_grupo_fsync
+        self.limite_compactacion = limite_compactacion
+        self.registro_lecturas = registro_lecturas
+        self.muestreo_lecturas = muestreo_lecturas
+        self._contador_lecturas = 0
+
+        # Guardado del snapshot en segundo plano (ver `intervalo_guardado`)
+        self.intervalo_guardado = intervalo_guardado
+        self._pendiente_guardar = False
+        self._detener_guardado = threading.Event()
+        self._hilo_guardado: Optional[threading.Thread] = None
+
+        self.serializador = serializador if serializador is not None else SerializadorJSON()
+        self.ruta_datos = self.directorio_datos / f"{nombre_coleccion}{self.serializador.extension}"
+        self.ruta_bitacora = self.directorio_datos / f"{nombre_coleccion}_bitacora.jsonl"
+        self.ruta_log = ruta_log_de(self.ruta_datos)
+
+        # Acceso concurrente: candado de lectura/escritura entre hilos y
+        # candado de archivo entre procesos. _firma es la versión de los
+        # archivos en disco que refleja la memoria (ver _refrescar).
+        self.detectar_cambios_externos = detectar_cambios_externos
+        self._candado = CandadoLecturaEscritura()
+        self._candado_archivo = CandadoArchivo(self.directorio_datos / f"{nombre_coleccion}.lock")
+        self._firma: Tuple[Any, Any] = (None, None)
+
+        # Estado del log de escritura (solo se usa en modo LOG).
+        # _posicion_log: bytes del log ya aplicados en memoria.
+        self._archivo_log = None
+        self._pendientes_fsync = 0
+        self._posicion_log = 0
+
+        # Cambios acumulados por una transacción abierta (None si no hay)
+        self._cambios_transaccion: Optional[List[Dict[str, Any]]] = None
+
+        # Entidades ya construidas, por ID. Cualquier cambio en un registro
+        # descarta su entrada para que la próxima consulta la reconstruya.
+        self.cache_entidades = cache_entidades
+        self._cache: Dict[Any, T] = {}
+
+        # Índices secundarios. Se llenan después de reaplicar el log para
+        # construirlos una sola vez sobre el estado final.
+        #   _indices_hash:      campo -> valor -> IDs con ese valor
+        #   _indices_ordenados: campo -> lista ordenada de (valor, ID)
+        self._indices_hash: Dict[str, Dict[Any, Set[Any]]] = {}
+        self._indices_ordenados: Dict[str, List[Tuple[Any, Any]]] = {}
+
+        with self._candado_archivo.adquirir(exclusivo=True):
+            self._adoptar_log_legado()
+            self._datos: List[Dict[str, Any]] = self._cargar_datos()
+            self._migrar_bitacora_legada()
+            self._bitacora = Bitacora(
+                self.ruta_bitacora,
+                tamano_lote=tamano_lote_bitacora,
+                tamano_maximo=tamano_maximo_bitacora,
+                antiguedad_maxima=antiguedad_maxima_bitacora
+            )
+
+            # Índice en memoria: ID -> posición del registro dentro de _datos.
+            # Se construye una sola vez y cada operación que modifica los datos
+            # lo mantiene sincronizado, así las búsquedas por ID son O(1).
+            self._indice_ids: Dict[Any, int] = self._construir_indice_ids()
+
+            # Si quedó un log de una ejecución anterior se reaplica sobre el snapshot
+            self._entradas_log = self._reproducir_log()
+            self._firma = self._firma_disco()
+
+            _repositorios_abiertos.add(self)
+            if self.modo is ModoAlmacenamiento.LOG:
+                if self._entradas_log >= self.limite_compactacion:
+                    self.compactar()
+            elif self._entradas_log:
+                # Un repositorio en modo SNAPSHOT no mantiene el log: se
+                # consolida lo reaplicado y se descarta el archivo.
+                self.compactar()
+
+        self._construir_indices_campo(campos_indexados, campos_ordenados)
+
+        if self.intervalo_guardado is not None and self.modo is ModoAlmacenamiento.SNAPSHOT:
+            self._hilo_guardado = threading.Thread(
+                target=self._guardar_periodicamente,
+                name=f"guardado-{nombre_coleccion}",
+                daemon=True
+            )
+            self._hilo_guardado.start()
 
         print(f"📦 Repositorio '{nombre_coleccion}' inicializado con {len(self._datos)} registros.")
 
     # ==================== MÉTODOS PRIVADOS ====================
 
     def _cargar_datos(self) -> List[Dict[str, Any]]:
-        """Carga los datos desde el archivo JSON."""
-        if not self.ruta_datos.exists():
-            return []
+        """Carga los datos desde el archivo de datos (o desde su copia anterior)."""
+        return _leer_con_respaldo(self.ruta_datos, self.serializador, [])
 
-        with self.ruta_datos.open("r", encoding="utf-8") as archivo:
-            return json.load(archivo)
+    def _adoptar_log_legado(self) -> None:
+        """
+        Renombra el log de versiones anteriores (<coleccion>.log) al nombre
+        actual (ver ruta_log_de).
 
-    def _cargar_bitacora(self) -> List[Dict[str, Any]]:
-        """Carga la bitácora de operaciones desde el archivo JSON."""
-        if not self.ruta_bitacora.exists():
-            return []
+        Ese log no dice sobre qué snapshot se escribió. Se adopta solo si
+        no existe el archivo de datos de otro formato; si existe, aplicarlo
+        aquí perdería esos cambios para el otro formato, así que se rechaza
+        abrir la colección.
+        """
+        legado = self.directorio_datos / f"{self.nombre_coleccion}.log"
+        if not legado.exists() or self.ruta_log.exists():
+            return
+
+        otros_formatos = [
+            ruta for ruta in (
+                self.directorio_datos / f"{self.nombre_coleccion}{extension}"
+                for extension in (SerializadorJSON.extension, SerializadorColumnar.extension)
+            )
+            if ruta != self.ruta_datos and ruta.exists()
+        ]
+        if otros_formatos:
+            raise ValueError(
+                f"{legado.name} tiene cambios pendientes que pueden pertenecer a "
+                f"{otros_formatos[0].name}: abre la colección en ese formato y "
+                f"compáctala antes de usar {self.ruta_datos.name}"
+            )
+        os.replace(legado, self.ruta_log)
+
+    def _migrar_bitacora_legada(self) -> None:
+        """
+        Convierte la bitácora del formato anterior (una lista JSON en
+        <coleccion>_bitacora.json) al formato JSON Lines actual.
+        """
+        ruta_legada = self.directorio_datos / f"{self.nombre_coleccion}_bitacora.json"
+        if not ruta_legada.exists() or self.ruta_bitacora.exists():
+            return
 
-        with self.ruta_bitacora.open("r", encoding="utf-8") as archivo:
-            return json.load(archivo)
+        with ruta_legada.open("r", encoding="utf-8") as archivo:
+            eventos = json.load(archivo)
+        with self.ruta_bitacora.open("w", encoding="utf-8") as archivo:
+            archivo.writelines(
+                json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n"
+                for evento in eventos
+            )
+        ruta_legada.unlink()
 
     def _guardar_datos(self) -> None:
-        """Persiste los datos en el archivo JSON."""
-        with self.ruta_datos.open("w", encoding="utf-8") as archivo:
-            json.dump(self._datos, archivo, ensure_ascii=False, indent=2)
+        """
+        Persiste los datos en el archivo JSON.
 
-    def _guardar_bitacora(self) -> None:
-        """Persiste la bitácora en el archivo JSON."""
-        with self.ruta_bitacora.open("w", encoding="utf-8") as archivo:
-            json.dump(self._bitacora, archivo, ensure_ascii=False, indent=2)
+        Con guardado en segundo plano solo marca el repositorio como
+        pendiente; el hilo de guardado hace la escritura.
+        """
+        if self._hilo_guardado is not None:
+            self._pendiente_guardar = True
+            return
+        self._escribir_snapshot()
+
+    def _escribir_snapshot(self) -> None:
+        """Escribe de forma atómica el estado actual en el archivo de datos."""
+        with self._escritura(refrescar=False):
+            self._pendiente_guardar = False
+            _escribir_atomico(self.ruta_datos, self.serializador.serializar(list(self._datos)))
+
+    def _guardar_periodicamente(self) -> None:
+        """Bucle del hilo de guardado: escribe el snapshot si hay cambios."""
+        while not self._detener_guardado.wait(self.intervalo_guardado):
+            if self._pendiente_guardar:
+                self._escribir_snapshot()
+
+    def _registrar_cambio(
+        self,
+        tipo: TipoOperacion,
+        entidad_id: Any,
+        datos: Dict[str, Any],
+        mensaje: str
+    ) -> None:
+        """
+        Persiste un cambio ya aplicado en memoria y lo registra en la bitácora.
+
+        Si hay una transacción abierta, el cambio solo se acumula; se
+        persiste y se audita junto con los demás al confirmarla.
+        """
+        entrada = {
+            "op": tipo.value,
+            "id": entidad_id,
+            "datos": None if tipo is TipoOperacion.ELIMINAR else datos
+        }
+        if self._cambios_transaccion is not None:
+            self._cambios_transaccion.append(entrada)
+            return
+
+        if self.modo is ModoAlmacenamiento.SNAPSHOT:
+            self._guardar_datos()
+        else:
+            self._escribir_en_log(entrada, cambios=1)
+        self._registrar_operacion(tipo, entidad_id, datos, mensaje)
+
+    def _escribir_en_log(self, entrada: Dict[str, Any], cambios: int) -> None:
+        """Agrega una línea al log (modo LOG) y sincroniza/compacta si corresponde."""
+        if self._archivo_log is None:
+            self._archivo_log = self.ruta_log.open("a", encoding="utf-8")
+        self._archivo_log.write(
+            json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n"
+        )
+        self._entradas_log += cambios
+        self._pendientes_fsync += 1
+
+        if self._pendientes_fsync >= self.tamano_grupo_fsync:
+            self.sincronizar()
+        if self._entradas_log >= self.limite_compactacion:
+            self.compactar()
+
+    def _reproducir_log(self, desde: int = 0) -> int:
+        """
+        Aplica sobre los datos cargados las entradas del log pendientes.
+
+        Reaplicar es idempotente (CREATE de un ID existente lo reemplaza y
+        DELETE de un ID inexistente se ignora), así que un log que ya
+        estaba incluido en el snapshot no altera el resultado.
+
+        Args:
+            desde: Posición (en bytes) desde la que se lee el log; sirve
+                para aplicar solo las líneas que otro proceso agregó
+
+        Returns:
+            Cantidad de entradas aplicadas
+        """
+        self._posicion_log = desde
+        if not self.ruta_log.exists():
+            return 0
+
+        aplicadas = 0
+        with self.ruta_log.open("rb") as archivo:
+            archivo.seek(desde)
+            for linea in archivo:
+                if not linea.endswith(b"\n"):
+                    # Última línea incompleta por un corte durante la escritura
+                    break
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    break
+                self._aplicar_entrada_log(entrada)
+                aplicadas += 1
+                self._posicion_log += len(linea)
+        return aplicadas
+
+    def _aplicar_entrada_log(self, entrada: Dict[str, Any]) -> None:
+        """
+        Aplica en memoria una entrada del log: CREATE, UPDATE, DELETE o
+        TRANSACTION (una sola línea con todos los cambios confirmados).
+        """
+        if entrada["op"] == TipoOperacion.TRANSACCION.value:
+            for cambio in entrada["cambios"]:
+                self._aplicar_entrada_log(cambio)
+            return
+
+        entidad_id = entrada["id"]
+        indice = self._encontrar_indice(entidad_id)
+
+        if entrada["op"] == TipoOperacion.ELIMINAR.value:
+            if indice is not None:
+                self._quitar_registro(indice, entidad_id)
+        elif indice is None:
+            self._agregar_registro(entidad_id, entrada["datos"])
+        else:
+            self._reemplazar_registro(indice, entidad_id, entrada["datos"])
+
+    def _cerrar_log(self, eliminar: bool) -> None:
+        """Cierra el archivo de log abierto y opcionalmente lo elimina."""
+        if self._archivo_log is not None:
+            self._archivo_log.close()
+            self._archivo_log = None
+        if eliminar:
+            if self.ruta_log.exists():
+                self.ruta_log.unlink()
+            self._posicion_log = 0
+        self._pendientes_fsync = 0
+
+    def _recortar_log(self, tamano: int) -> None:
+        """
+        Descarta lo escrito en el log después de `tamano` bytes (al fallar
+        el commit de una transacción). Es lo mejor que se puede hacer: si
+        el disco sigue fallando, el error original es el que se propaga.
+        """
+        archivo, self._archivo_log = self._archivo_log, None
+        self._pendientes_fsync = 0
+        try:
+            if archivo is not None:
+                archivo.close()
+        except OSError:
+            pass
+        try:
+            if self.ruta_log.exists():
+                os.truncate(self.ruta_log, tamano)
+        except OSError:
+            pass
+
+    def _firma_disco(self) -> Tuple[Any, Any]:
+        """Firma actual del archivo de datos y del log."""
+        return (_firma_archivo(self.ruta_datos), _firma_archivo(self.ruta_log))
+
+    def _refrescar(self) -> None:
+        """
+        Incorpora lo que otros procesos escribieron desde la última vez.
+
+        Si las firmas en disco no cambiaron no lee nada. Si solo creció el
+        log (mismo archivo de datos y mismo log) aplica las líneas nuevas;
+        en cualquier otro caso recarga la colección completa.
+        """
+        if not self.detectar_cambios_externos or self._pendiente_guardar:
+            return
+        if self._firma_disco() == self._firma:
+            return
+
+        with self._candado_archivo.adquirir(exclusivo=False):
+            firma = self._firma_disco()
+            datos_previos, log_previo = self._firma
+            datos_actual, log_actual = firma
+            desde = 0 if log_previo is None else self._posicion_log
+            solo_crecio_log = (
+                datos_actual == datos_previos
+                and log_actual is not None
+                and (log_previo is None or log_actual[0] == log_previo[0])
+                and log_actual[2] >= desde
+            )
+            if solo_crecio_log:
+                self._entradas_log += self._reproducir_log(desde=desde)
+            else:
+                self._recargar()
+            self._firma = firma
+
+    def _recargar(self) -> None:
+        """Vuelve a leer la colección desde disco y reconstruye los índices."""
+        campos_indexados = list(self._indices_hash)
+        campos_ordenados = list(self._indices_ordenados)
+        self._cerrar_log(eliminar=False)
+
+        self._datos = self._cargar_datos()
+        self._indice_ids = self._construir_indice_ids()
+        self._indices_hash = {}
+        self._indices_ordenados = {}
+        self._cache.clear()
+        self._entradas_log = self._reproducir_log()
+        self._construir_indices_campo(campos_indexados, campos_ordenados)
+        print(f"🔄 Repositorio '{self.nombre_coleccion}' recargado: otro proceso modificó los datos")
+
+    @contextmanager
+    def _lectura(self) -> Iterator[None]:
+        """Candado de lectura, recargando antes si otro proceso escribió."""
+        if (
+            self.detectar_cambios_externos
+            and not self._candado.es_escritor()
+            and not self._candado.es_lector()
+            and self._firma_disco() != self._firma
+        ):
+            with self._candado.escritura():
+                self._refrescar()
+        with self._candado.lectura():
+            yield
+
+    @contextmanager
+    def _escritura(self, refrescar: bool = True) -> Iterator[None]:
+        """
+        Candado de escritura entre hilos y candado de archivo exclusivo
+        entre procesos. Al entrar recarga los cambios de otros procesos; al
+        salir deja lo escrito visible para ellos y anota la nueva firma.
+        """
+        if self._candado.es_escritor():
+            yield
+            return
+
+        with self._candado.escritura(), self._candado_archivo.adquirir(exclusivo=True):
+            if refrescar:
+                self._refrescar()
+            try:
+                yield
+            finally:
+                if self._archivo_log is not None:
+                    self._archivo_log.flush()
+                    self._posicion_log = os.fstat(self._archivo_log.fileno()).st_size
+                self._firma = self._firma_disco()
 
     def _registrar_operacion(
         self,
@@ -152,25 +1531,154 @@ class RepositorioJSON(Generic[T]):
             "mensaje": mensaje,
             "datos": datos
         }
-        self._bitacora.append(evento)
-        self._guardar_bitacora()
+        self._bitacora.registrar(evento)
+
+    def _registrar_lectura(
+        self,
+        tipo: TipoOperacion,
+        entidad_id: Any,
+        datos: Optional[Dict[str, Any]] = None,
+        mensaje: str = ""
+    ) -> None:
+        """Registra una lectura en la bitácora según `registro_lecturas`."""
+        if self.registro_lecturas is RegistroLecturas.NINGUNA:
+            return
+        if self.registro_lecturas is RegistroLecturas.MUESTREO:
+            self._contador_lecturas += 1
+            if self._contador_lecturas % self.muestreo_lecturas:
+                return
+        self._registrar_operacion(tipo, entidad_id, datos, mensaje)
+
+    def _construir_indice_ids(self) -> Dict[Any, int]:
+        """
+        Construye el índice ID -> posición recorriendo los datos una vez.
+
+        Es el único lugar donde se crea una entidad por registro solo para
+        leer su ID; después el índice se actualiza de forma incremental.
+        """
+        return {
+            self.tipo_entidad.desde_diccionario(dato).obtener_id(): idx
+            for idx, dato in enumerate(self._datos)
+        }
+
+    def _construir_indices_campo(
+        self,
+        campos_indexados: Sequence[str],
+        campos_ordenados: Sequence[str]
+    ) -> None:
+        """Crea los índices secundarios recorriendo los datos una vez."""
+        self._indices_hash = {campo: {} for campo in campos_indexados}
+        self._indices_ordenados = {campo: [] for campo in campos_ordenados}
+
+        for entidad_id, posicion in self._indice_ids.items():
+            self._indexar_campos(self._datos[posicion], entidad_id)
+
+    def _indexar_campos(self, dato: Dict[str, Any], entidad_id: Any) -> None:
+        """
+        Agrega un registro a todos los índices secundarios.
+
+        Primero se calculan las claves y posiciones: si un valor no se puede
+        indexar (no es hashable, o no se puede comparar con los del índice
+        ordenado, ej. int y str en el mismo campo) se lanza TypeError sin
+        haber modificado ningún índice.
+        """
+        claves = [(indice, dato.get(campo)) for campo, indice in self._indices_hash.items()]
+        for _, valor in claves:
+            hash(valor)
+        inserciones = []
+        for campo, ordenado in self._indices_ordenados.items():
+            valor = dato.get(campo)
+            if valor is not None:
+                par = (valor, entidad_id)
+                inserciones.append((ordenado, bisect.bisect_right(ordenado, par), par))
+
+        for indice, valor in claves:
+            indice.setdefault(valor, set()).add(entidad_id)
+        for ordenado, posicion, par in inserciones:
+            ordenado.insert(posicion, par)
+
+    def _desindexar_campos(self, dato: Dict[str, Any], entidad_id: Any) -> None:
+        """Quita un registro de todos los índices secundarios."""
+        for campo, indice in self._indices_hash.items():
+            ids = indice.get(dato.get(campo))
+            if ids is not None:
+                ids.discard(entidad_id)
+                if not ids:
+                    del indice[dato.get(campo)]
+        for campo, ordenado in self._indices_ordenados.items():
+            valor = dato.get(campo)
+            if valor is None:
+                continue
+            posicion = bisect.bisect_left(ordenado, (valor, entidad_id))
+            if posicion < len(ordenado) and ordenado[posicion] == (valor, entidad_id):
+                ordenado.pop(posicion)
+
+    def _materializar(self, entidad_id: Any, posicion: int) -> T:
+        """Retorna la entidad del registro, desde la caché si ya existe."""
+        if not self.cache_entidades:
+            return self.tipo_entidad.desde_diccionario(self._datos[posicion])
+
+        entidad = self._cache.get(entidad_id)
+        if entidad is None:
+            entidad = self.tipo_entidad.desde_diccionario(self._datos[posicion])
+            self._cache[entidad_id] = entidad
+        return entidad
+
+    def _entidades_por_ids(self, ids: Any) -> List[T]:
+        """Construye las entidades de los IDs dados, en el orden de los datos."""
+        pares = sorted((self._indice_ids[entidad_id], entidad_id) for entidad_id in ids)
+        return [self._materializar(entidad_id, posicion) for posicion, entidad_id in pares]
 
     def _existe_id(self, entidad_id: Any) -> bool:
         """Verifica si ya existe una entidad con el ID dado."""
-        return any(
-            self.tipo_entidad.desde_diccionario(dato).obtener_id() == entidad_id
-            for dato in self._datos
-        )
+        return entidad_id in self._indice_ids
 
     def _encontrar_indice(self, entidad_id: Any) -> Optional[int]:
         """Encuentra el índice de una entidad por su ID."""
-        for idx, dato in enumerate(self._datos):
-            if self.tipo_entidad.desde_diccionario(dato).obtener_id() == entidad_id:
-                return idx
-        return None
+        return self._indice_ids.get(entidad_id)
+
+    def _agregar_registro(self, entidad_id: Any, datos: Dict[str, Any]) -> None:
+        """
+        Agrega un registro al final de los datos y a los índices.
+
+        Se indexa primero: si falla (ver _indexar_campos) el registro no
+        queda a medias en los datos.
+        """
+        self._indexar_campos(datos, entidad_id)
+        self._datos.append(datos)
+        self._indice_ids[entidad_id] = len(self._datos) - 1
+
+    def _reemplazar_registro(self, indice: int, entidad_id: Any, datos: Dict[str, Any]) -> None:
+        """Reemplaza el registro de la posición dada y actualiza los índices."""
+        anterior = self._datos[indice]
+        self._desindexar_campos(anterior, entidad_id)
+        try:
+            self._indexar_campos(datos, entidad_id)
+        except TypeError:
+            self._indexar_campos(anterior, entidad_id)
+            raise
+        self._datos[indice] = datos
+        self._cache.pop(entidad_id, None)
+
+    def _quitar_registro(self, indice: int, entidad_id: Any) -> Dict[str, Any]:
+        """
+        Quita el registro de la posición dada y actualiza el índice.
+
+        Los registros posteriores se desplazan una posición hacia atrás
+        en _datos, así que se corrigen sus posiciones (sin crear entidades).
+        """
+        dato_eliminado = self._datos.pop(indice)
+        del self._indice_ids[entidad_id]
+        self._cache.pop(entidad_id, None)
+        self._desindexar_campos(dato_eliminado, entidad_id)
+        for clave, posicion in self._indice_ids.items():
+            if posicion > indice:
+                self._indice_ids[clave] = posicion - 1
+        return dato_eliminado
 
     # ==================== OPERACIONES CRUD ====================
 
+    @_operacion_escritura
     def insertar(self, entidad: T) -> bool:
         """
         Inserta una nueva entidad en el repositorio.
@@ -191,9 +1699,8 @@ class RepositorioJSON(Generic[T]):
             return False
 
         datos_entidad = entidad.a_diccionario()
-        self._datos.append(datos_entidad)
-        self._guardar_datos()
-        self._registrar_operacion(
+        self._agregar_registro(entidad_id, datos_entidad)
+        self._registrar_cambio(
             TipoOperacion.CREAR,
             entidad_id,
             datos_entidad,
@@ -203,6 +1710,7 @@ class RepositorioJSON(Generic[T]):
         print(f"✅ Entidad {entidad_id} insertada correctamente")
         return True
 
+    @_operacion_lectura
     def consultar_por_id(self, entidad_id: Any) -> Optional[T]:
         """
         Busca una entidad por su ID.
@@ -220,14 +1728,15 @@ class RepositorioJSON(Generic[T]):
         if indice is None:
             return None
 
-        self._registrar_operacion(
+        self._registrar_lectura(
             TipoOperacion.LEER,
             entidad_id,
             mensaje=f"Consulta de entidad {entidad_id}"
         )
 
-        return self.tipo_entidad.desde_diccionario(self._datos[indice])
+        return self._materializar(entidad_id, indice)
 
+    @_operacion_lectura
     def consultar_todos(self) -> List[T]:
         """
         Retorna todas las entidades del repositorio.
@@ -238,17 +1747,50 @@ class RepositorioJSON(Generic[T]):
         Ejemplo:
             todos = repositorio.consultar_todos()
         """
-        self._registrar_operacion(
+        self._registrar_lectura(
             TipoOperacion.CONSULTAR,
             "ALL",
             mensaje=f"Consulta de todas las entidades ({len(self._datos)} registros)"
         )
 
         return [
-            self.tipo_entidad.desde_diccionario(dato)
-            for dato in self._datos
+            self._materializar(entidad_id, posicion)
+            for entidad_id, posicion in self._indice_ids.items()
         ]
 
+    def iterar(self) -> Iterator[T]:
+        """
+        Recorre las entidades una a una, sin construir la lista completa.
+
+        Útil para recorrer colecciones grandes o cortar el recorrido antes
+        de llegar al final. Se recorre el estado del repositorio al momento
+        de empezar: lo que se inserte o elimine durante el recorrido no
+        aparece en él.
+
+        Ejemplo:
+            for producto in repositorio.iterar():
+                if producto.stock == 0:
+                    print(producto.nombre)
+        """
+        # Se copian las referencias a los registros (y a las entidades en
+        # caché) con el candado tomado; las entidades que faltan se
+        # construyen fuera, a medida que se piden.
+        with self._lectura():
+            cache = self._cache if self.cache_entidades else {}
+            registros = [
+                (self._datos[posicion], cache.get(entidad_id))
+                for entidad_id, posicion in self._indice_ids.items()
+            ]
+            self._registrar_lectura(
+                TipoOperacion.CONSULTAR,
+                "ALL",
+                mensaje=f"Recorrido de entidades ({len(registros)} registros)"
+            )
+
+        for dato, entidad in registros:
+            yield entidad if entidad is not None else self.tipo_entidad.desde_diccionario(dato)
+
+    @_operacion_lectura
     def consultar_por_campo(self, campo: str, valor: Any) -> List[T]:
         """
         Busca entidades que tengan un valor específico en un campo.
@@ -260,16 +1802,22 @@ class RepositorioJSON(Generic[T]):
         Returns:
             Lista de entidades que cumplen la condición
 
+        Si el campo tiene índice hash (ver `campos_indexados`) solo se
+        construyen las entidades que coinciden, sin recorrer la colección.
+
         Ejemplo:
             productos_caros = repositorio.consultar_por_campo("precio", 100.0)
         """
-        resultados = [
-            self.tipo_entidad.desde_diccionario(dato)
-            for dato in self._datos
-            if dato.get(campo) == valor
-        ]
-
-        self._registrar_operacion(
+        if campo in self._indices_hash:
+            resultados = self._entidades_por_ids(self._indices_hash[campo].get(valor, ()))
+        else:
+            resultados = [
+                self._materializar(entidad_id, posicion)
+                for entidad_id, posicion in self._indice_ids.items()
+                if self._datos[posicion].get(campo) == valor
+            ]
+
+        self._registrar_lectura(
             TipoOperacion.CONSULTAR,
             "FILTRO",
             {"campo": campo, "valor": valor},
@@ -278,6 +1826,74 @@ class RepositorioJSON(Generic[T]):
 
         return resultados
 
+    @_operacion_lectura
+    def consultar_por_rango(
+        self,
+        campo: str,
+        minimo: Any = None,
+        maximo: Any = None
+    ) -> List[T]:
+        """
+        Busca entidades cuyo campo esté entre `minimo` y `maximo` (inclusive).
+
+        El campo debe estar declarado en `campos_ordenados`. Si se omite un
+        extremo, el rango queda abierto por ese lado. Los registros sin
+        valor en el campo no se incluyen.
+
+        Args:
+            campo: Nombre del campo con índice ordenado
+            minimo: Valor mínimo (None para no limitar)
+            maximo: Valor máximo (None para no limitar)
+
+        Returns:
+            Lista de entidades ordenadas por el valor del campo
+
+        Ejemplo:
+            ventas_enero = repositorio.consultar_por_rango(
+                "fecha", "2025-01-01", "2025-01-31T23:59:59"
+            )
+        """
+        if campo not in self._indices_ordenados:
+            raise ValueError(f"El campo '{campo}' no tiene índice ordenado")
+
+        ordenado = self._indices_ordenados[campo]
+        inicio = 0
+        if minimo is not None:
+            inicio = _buscar_valor(ordenado, minimo)
+        fin = len(ordenado)
+        if maximo is not None:
+            fin = _buscar_valor(ordenado, maximo, despues=True)
+
+        resultados = [
+            self._materializar(entidad_id, self._indice_ids[entidad_id])
+            for _, entidad_id in ordenado[inicio:fin]
+        ]
+
+        self._registrar_lectura(
+            TipoOperacion.CONSULTAR,
+            "RANGO",
+            {"campo": campo, "minimo": minimo, "maximo": maximo},
+            f"Consulta por rango: {minimo} <= {campo} <= {maximo} ({len(resultados)} resultados)"
+        )
+
+        return resultados
+
+    def consulta(self) -> Consulta[T]:
+        """
+        Crea una consulta con filtros, orden, paginación y proyección.
+
+        Ejemplo:
+            baratos = (
+                repositorio.consulta()
+                .donde("precio", "<", 20)
+                .ordenar_por("precio")
+                .limite(10)
+                .todos()
+            )
+        """
+        return Consulta(self)
+
+    @_operacion_escritura
     def actualizar(self, entidad: T) -> bool:
         """
         Actualiza una entidad existente.
@@ -300,9 +1916,8 @@ class RepositorioJSON(Generic[T]):
             return False
 
         datos_entidad = entidad.a_diccionario()
-        self._datos[indice] = datos_entidad
-        self._guardar_datos()
-        self._registrar_operacion(
+        self._reemplazar_registro(indice, entidad_id, datos_entidad)
+        self._registrar_cambio(
             TipoOperacion.ACTUALIZAR,
             entidad_id,
             datos_entidad,
@@ -312,6 +1927,7 @@ class RepositorioJSON(Generic[T]):
         print(f"✅ Entidad {entidad_id} actualizada correctamente")
         return True
 
+    @_operacion_escritura
     def eliminar(self, entidad_id: Any) -> bool:
         """
         Elimina una entidad por su ID.
@@ -331,9 +1947,8 @@ class RepositorioJSON(Generic[T]):
             print(f"❌ Error: No existe una entidad con ID {entidad_id}")
             return False
 
-        dato_eliminado = self._datos.pop(indice)
-        self._guardar_datos()
-        self._registrar_operacion(
+        dato_eliminado = self._quitar_registro(indice, entidad_id)
+        self._registrar_cambio(
             TipoOperacion.ELIMINAR,
             entidad_id,
             dato_eliminado,
@@ -343,6 +1958,167 @@ class RepositorioJSON(Generic[T]):
         print(f"✅ Entidad {entidad_id} eliminada correctamente")
         return True
 
+    # ==================== OPERACIONES EN LOTE ====================
+
+    @_operacion_escritura
+    def insertar_muchos(self, entidades: List[T]) -> int:
+        """
+        Inserta varias entidades con una sola escritura en disco.
+
+        Todo el lote se valida antes de modificar nada: si algún ID ya
+        existe (o se repite dentro del lote) no se inserta ninguna entidad.
+
+        Args:
+            entidades: Lista de entidades a insertar
+
+        Returns:
+            Cantidad de entidades insertadas (0 si el lote no es válido)
+
+        Ejemplo:
+            insertados = repositorio.insertar_muchos([producto1, producto2])
+        """
+        lote = [(entidad.obtener_id(), entidad.a_diccionario()) for entidad in entidades]
+
+        ids_lote = set()
+        for entidad_id, _ in lote:
+            if self._existe_id(entidad_id) or entidad_id in ids_lote:
+                print(f"❌ Error: Ya existe una entidad con ID {entidad_id}; no se insertó el lote")
+                return 0
+            ids_lote.add(entidad_id)
+
+        with self.transaccion():
+            for entidad_id, datos_entidad in lote:
+                self._agregar_registro(entidad_id, datos_entidad)
+                self._registrar_cambio(
+                    TipoOperacion.CREAR,
+                    entidad_id,
+                    datos_entidad,
+                    f"Entidad {entidad_id} creada"
+                )
+
+        print(f"✅ {len(lote)} entidades insertadas correctamente")
+        return len(lote)
+
+    @_operacion_escritura
+    def actualizar_muchos(self, entidades: List[T]) -> int:
+        """
+        Actualiza varias entidades existentes con una sola escritura en disco.
+
+        Si alguna entidad no existe no se actualiza ninguna.
+
+        Args:
+            entidades: Lista de entidades con los datos actualizados
+
+        Returns:
+            Cantidad de entidades actualizadas (0 si el lote no es válido)
+
+        Ejemplo:
+            for producto in productos:
+                producto.precio *= 1.1
+            repositorio.actualizar_muchos(productos)
+        """
+        lote = [(entidad.obtener_id(), entidad.a_diccionario()) for entidad in entidades]
+
+        for entidad_id, _ in lote:
+            if not self._existe_id(entidad_id):
+                print(f"❌ Error: No existe una entidad con ID {entidad_id}; no se actualizó el lote")
+                return 0
+
+        with self.transaccion():
+            for entidad_id, datos_entidad in lote:
+                self._reemplazar_registro(self._indice_ids[entidad_id], entidad_id, datos_entidad)
+                self._registrar_cambio(
+                    TipoOperacion.ACTUALIZAR,
+                    entidad_id,
+                    datos_entidad,
+                    f"Entidad {entidad_id} actualizada"
+                )
+
+        print(f"✅ {len(lote)} entidades actualizadas correctamente")
+        return len(lote)
+
+    @contextmanager
+    def transaccion(self) -> Iterator[RepositorioJSON[T]]:
+        """
+        Agrupa varias operaciones en una sola escritura atómica.
+
+        Dentro del bloque, insertar/actualizar/eliminar modifican solo la
+        memoria. Al salir sin errores los cambios se persisten de una vez
+        (una reescritura en modo SNAPSHOT o una línea en modo LOG) con un
+        único evento en la bitácora. Si ocurre una excepción se revierten
+        todos los cambios del bloque y la excepción se propaga.
+
+        Las transacciones anidadas se unen a la transacción exterior.
+        Mientras el bloque está abierto, los demás hilos y procesos esperan
+        para escribir, así que leer y luego modificar dentro de él es seguro.
+
+        Ejemplo:
+            with repositorio.transaccion():
+                repositorio.insertar(producto1)
+                repositorio.eliminar(7)
+        """
+        with self._escritura():
+            if self._cambios_transaccion is not None:
+                yield self
+                return
+            yield from self._ejecutar_transaccion()
+
+    def _ejecutar_transaccion(self) -> Iterator[RepositorioJSON[T]]:
+        """Cuerpo de transaccion(), con el candado de escritura ya tomado."""
+        datos_previos = list(self._datos)
+        indice_previo = dict(self._indice_ids)
+
+        def revertir() -> None:
+            self._datos = datos_previos
+            self._indice_ids = indice_previo
+            self._cache.clear()
+            self._construir_indices_campo(list(self._indices_hash), list(self._indices_ordenados))
+            print(f"↩️  Transacción revertida en '{self.nombre_coleccion}'")
+
+        self._cambios_transaccion = []
+        try:
+            yield self
+        except BaseException:
+            self._cambios_transaccion = None
+            revertir()
+            raise
+
+        cambios = self._cambios_transaccion
+        self._cambios_transaccion = None
+        if not cambios:
+            return
+
+        # Si falla la escritura en disco también se revierte la memoria; en
+        # modo LOG además se descarta lo que haya llegado a escribirse.
+        if self.modo is ModoAlmacenamiento.SNAPSHOT:
+            try:
+                self._guardar_datos()
+            except BaseException:
+                revertir()
+                raise
+        else:
+            if self._archivo_log is not None:
+                self._archivo_log.flush()
+            tamano_log = self.ruta_log.stat().st_size if self.ruta_log.exists() else 0
+            try:
+                self._escribir_en_log(
+                    {"op": TipoOperacion.TRANSACCION.value, "cambios": cambios},
+                    cambios=len(cambios)
+                )
+                self.sincronizar()
+            except BaseException:
+                self._recortar_log(tamano_log)
+                revertir()
+                raise
+
+        self._registrar_operacion(
+            TipoOperacion.TRANSACCION,
+            "LOTE",
+            {"cambios": cambios},
+            f"Transacción confirmada ({len(cambios)} cambios)"
+        )
+
+    @_operacion_lectura
     def contar(self) -> int:
         """
         Retorna el número total de entidades.
@@ -355,6 +2131,7 @@ class RepositorioJSON(Generic[T]):
         """
         return len(self._datos)
 
+    @_operacion_lectura
     def existe(self, entidad_id: Any) -> bool:
         """
         Verifica si existe una entidad con el ID dado.
@@ -373,24 +2150,77 @@ class RepositorioJSON(Generic[T]):
 
     # ==================== MÉTODOS DE UTILIDAD ====================
 
+    @_operacion_escritura
     def limpiar_todo(self) -> None:
         """
         ADVERTENCIA: Elimina TODOS los datos y la bitácora.
         Usar solo para resetear completamente el repositorio.
         """
         self._datos = []
-        self._bitacora = []
-        self._guardar_datos()
-        self._guardar_bitacora()
+        self._indice_ids = {}
+        self._cache.clear()
+        self._indices_hash = {campo: {} for campo in self._indices_hash}
+        self._indices_ordenados = {campo: [] for campo in self._indices_ordenados}
+        self.compactar()
+        self._bitacora.limpiar()
         print(f"🗑️  Repositorio '{self.nombre_coleccion}' limpiado completamente")
 
+    @_operacion_escritura
+    def sincronizar(self) -> None:
+        """
+        Fuerza a disco los cambios pendientes.
+
+        En modo LOG hace flush + fsync del log (se llama automáticamente cada
+        `tamano_grupo_fsync` cambios). Con guardado en segundo plano escribe
+        el snapshot si hay cambios sin guardar. También se llama al cerrar.
+        """
+        if self._pendiente_guardar:
+            self._escribir_snapshot()
+        if self._archivo_log is None or self._pendientes_fsync == 0:
+            return
+        self._archivo_log.flush()
+        os.fsync(self._archivo_log.fileno())
+        self._pendientes_fsync = 0
+
+    @_operacion_escritura
+    def compactar(self) -> None:
+        """
+        Vuelca el estado actual en el snapshot JSON y vacía el log.
+
+        Después de compactar, el archivo de datos contiene todo el estado
+        y la próxima carga no necesita reaplicar ninguna entrada.
+        """
+        self._escribir_snapshot()
+        self._cerrar_log(eliminar=True)
+        self._entradas_log = 0
+
+    def cerrar(self) -> None:
+        """
+        Sincroniza los cambios pendientes del log, escribe los eventos
+        pendientes de la bitácora y libera los archivos.
+        """
+        _repositorios_abiertos.discard(self)
+        # Se espera al hilo de guardado antes de tomar el candado, porque
+        # ese hilo también lo necesita para escribir.
+        if self._hilo_guardado is not None:
+            self._detener_guardado.set()
+            self._hilo_guardado.join()
+            self._hilo_guardado = None
+        with self._escritura(refrescar=False):
+            self.sincronizar()
+            self._cerrar_log(eliminar=False)
+        self._bitacora.vaciar()
+        self._candado_archivo.cerrar()
+
     def mostrar_estadisticas(self) -> None:
         """Muestra estadísticas del repositorio."""
         print(f"\n📊 Estadísticas del repositorio '{self.nombre_coleccion}':")
         print(f"   Total de registros: {len(self._datos)}")
-        print(f"   Total de operaciones: {len(self._bitacora)}")
+        print(f"   Total de operaciones: {self._bitacora.total}")
         print(f"   Archivo de datos: {self.ruta_datos}")
         print(f"   Archivo de bitácora: {self.ruta_bitacora}")
+        if self.modo is ModoAlmacenamiento.LOG:
+            print(f"   Archivo de log: {self.ruta_log} ({self._entradas_log} entradas)")
 
     def mostrar_bitacora(self, ultimas: int = 10) -> None:
         """
@@ -400,7 +2230,7 @@ class RepositorioJSON(Generic[T]):
             ultimas: Número de operaciones a mostrar (por defecto 10)
         """
         print(f"\n📜 Últimas {ultimas} operaciones:")
-        for evento in self._bitacora[-ultimas:]:
+        for evento in self._bitacora.ultimos(ultimas):
             timestamp = evento["timestamp"].split("T")[1][:8]
             print(f"   [{timestamp}] {evento['tipo']:10} | ID: {evento['entidad_id']:10} | {evento['mensaje']}")
 
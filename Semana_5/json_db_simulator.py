@@ -5,6 +5,7 @@
 from __future__ import annotations
 
 import json
+import os
 from dataclasses import dataclass, asdict
 from datetime import datetime, timezone
 from pathlib import Path
@@ -27,9 +28,19 @@ def _leer_json(path: Path) -> Any:
 
 
 def _escribir_json(path: Path, data: Any) -> None:
-    """Serializa datos en disco con indentación y codificación UTF-8."""
-    with path.open("w", encoding="utf-8") as archivo:
+    """
+    Serializa datos en disco con indentación y codificación UTF-8.
+
+    Se escribe primero en un archivo temporal, se fuerza a disco y se
+    renombra sobre el original: un corte a mitad de escritura nunca deja
+    el archivo truncado.
+    """
+    temporal = path.with_name(path.name + ".tmp")
+    with temporal.open("w", encoding="utf-8") as archivo:
         json.dump(data, archivo, ensure_ascii=False, indent=2)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, path)
 
 
 @dataclass
@@ -69,6 +80,25 @@ class JsonDatabase:
         self._persistir()
         print(f"Registro {data['id']} almacenado correctamente.")
 
+    def insertar_registros(self, registros: List[Dict[str, Any]]) -> None:
+        """Inserta varios registros con una sola escritura y un solo evento."""
+        ids_existentes = {reg["id"] for reg in self.registros}
+        for data in registros:
+            if "id" not in data:
+                raise ValueError("Todo registro necesita un 'id' único")
+            if data["id"] in ids_existentes:
+                raise ValueError(f"Ya existe un registro con id {data['id']}")
+            ids_existentes.add(data["id"])
+
+        self.registros.extend(registros)
+        self._registrar_evento(
+            "INSERT_BATCH",
+            [data["id"] for data in registros],
+            {"registros": registros},
+        )
+        self._persistir()
+        print(f"{len(registros)} registros almacenados correctamente.")
+
     def consultar(self, campo: Optional[str] = None, valor: Any = None) -> List[Dict[str, Any]]:
         """Filtra registros en memoria simulando una consulta simple."""
         if campo is None:
@@ -99,8 +129,7 @@ def poblar_base(json_db: JsonDatabase) -> None:
         Cliente(id=103, nombre="María", ciudad="Quito", saldo=120.5),
     ]
 
-    for cliente in clientes:
-        json_db.insertar_registro(cliente.to_record())
+    json_db.insertar_registros([cliente.to_record() for cliente in clientes])
 
 
 def mostrar_consultas(json_db: JsonDatabase) -> None:
@@ -44,8 +44,8 @@ fi
 # Limpiar datos del desafío (todos los subdirectorios excepto los del ejemplo)
 if [ -d "datos" ]; then
     echo "   🗑️  Eliminando datos de tu desafío..."
-    # Eliminar solo los archivos JSON dentro de datos/
-    find datos -name "*.json" -type f -delete
+    # Eliminar solo los archivos de datos (JSON, bitácoras JSONL, logs, copias y candados) dentro de datos/
+    find datos \( -name "*.json" -o -name "*.jsonl" -o -name "*.log" -o -name "*.bak" -o -name "*.tmp" -o -name "*.lock" \) -type f -delete
     archivos_eliminados=$((archivos_eliminados + $(find datos -type f -name "*.json" | wc -l)))
 fi
 